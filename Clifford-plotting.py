@@ -63,7 +63,7 @@ def rand_line(num=1,length=1.0):
 # %%
 def rand_point(num=1,length=1.0):
     '''
-    generates 'num' random (normalized) lines with maximum moment of 'length'.
+    generates 'num' random (normalized) points at most 'length' from the origin.
     length=0 generates ideal points
     '''
     # a normalized point looks like -xe02 + ye01 + e12 
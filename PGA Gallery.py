@@ -38,6 +38,8 @@ from matplotlib.patches import Ellipse
 
 import warnings
 
+from pga2array import classify, kinds
+
 # %% slideshow={"slide_type": "skip"}
 # define 2D PGA
 layout, blades = Cl(2,0,1, firstIdx=0)
@@ -70,7 +72,7 @@ def rand_line(num=1,length=1.0):
 # %% slideshow={"slide_type": "skip"}
 def rand_point(num=1,length=1.0):
     '''
-    generates 'num' random (normalized) lines with maximum moment of 'length'.
+    generates 'num' random (normalized) points at most 'length' from the origin.
     length=0 generates ideal points
     '''
     # a normalized point looks like -xe02 + ye01 + e12 
@@ -102,11 +104,10 @@ def add_to_axes(x,label=None,color='black',axis=None,eps = 1e-6,**kwargs):
     # plot 2D PGA points and lines on a pyplot axis
     # label = point label for drawing
     # axis = axis object to write to, defaults to last used
-    # eps = threshold for rounding to zero during type check
+    # eps = relative tolerance for the type check (see pga2array.classify); x is not modified
     
     # FIXME things are screwy if the object is outside the bounds of the figure
     
-    x.clean(eps=eps)
     if axis==None:
         # get current axis
         axis = plt.gca()
@@ -123,10 +124,10 @@ def add_to_axes(x,label=None,color='black',axis=None,eps = 1e-6,**kwargs):
     # check object type:
     # real point, ideal point
     # line, idea line (how to draw?)
-    grades = x.grades()
-    if grades == set({1}): # it's a line!
+    kind = kinds[classify(x.value, rtol=eps)[0]]
+    if kind in ('real line', 'ideal line'): # it's a line!
         # check for ideal line
-        if (x(e1) == 0) and (x(e2) == 0): # ideal line
+        if kind == 'ideal line': # ideal line
             ellipse = Ellipse([0.5*(xmin+xmax),0.5*(ymin+ymax)],
                              width = xmax-xmin, height = ymax-ymin,
                              facecolor='none',edgecolor=color,ls='--')
@@ -159,9 +160,9 @@ def add_to_axes(x,label=None,color='black',axis=None,eps = 1e-6,**kwargs):
                 **kwargs)
             
 
-    elif grades == set({2}): # it's a point!
+    elif kind in ('real point', 'ideal point'): # it's a point!
         # check if real point or ideal point
-        if x(e12) == 0: # ideal point
+        if kind == 'ideal point': # ideal point
             # ideal point will be drawn as an arrow at center of graph
             # TODO arrow at boundary?
             axis.annotate(
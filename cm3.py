@@ -159,22 +159,79 @@ def dualCircle(c,rho,n): # c:center. rho:radius. n:normal vector
     return(ds^dp)          # A BIvector 
 
 
+# %% [markdown]
+# <h4>*  Versors *</h4>
+#
+# Closed forms of the versors used below, so no call goes through the general `exp`.
+# Each builder returns the pair `(V, Vinv)`; the transformation of `X` is `V*X*Vinv`.
+# The builders are cached, so repeated calls with the same argument reuse the versor.
+
+# %%
+from functools import lru_cache
+
+
+# %%
+@lru_cache(maxsize=None)
+def translator(a3): # a3: 3D vector
+    return(1 - a3*eoo/2, 1 + a3*eoo/2)
+
+
+# %%
+@lru_cache(maxsize=None)
+def rotor(itheta): # itheta: 3D bivector, angle theta = its magnitude
+    theta = sqrt(-(itheta*itheta).scalar())
+    if theta == 0:
+        return(scalar(1), scalar(1))
+    B = itheta/theta  # unit bivector, B*B = -1
+    # exp(-B theta/2) = cos(theta/2) - B sin(theta/2)
+    return(cos(theta/2) - B*sin(theta/2), cos(theta/2) + B*sin(theta/2))
+
+
+# %%
+@lru_cache(maxsize=None)
+def dilator(alpha): # alpha > 0
+    # A Covariant Approach ..., 16: E*E = 1, so
+    # exp(E ln(alpha)/2) = cosh(ln(alpha)/2) + E sinh(ln(alpha)/2)
+    s = 2*sqrt(alpha)
+    return(((1 + alpha) + (alpha - 1)*E)/s, ((1 + alpha) - (alpha - 1)*E)/s)
+
+
+# %%
+@lru_cache(maxsize=None)
+def inverter():   # GACS 513, inversion in the unit sphere
+    return(ep, -ep)
+
+
+# %%
+def compose(*versors):  # first versor in the list is applied first
+    V, Vinv = scalar(1), scalar(1)
+    for (W, Winv) in versors:
+        V, Vinv = W*V, Vinv*Winv
+    return(V, Vinv)
+
+
+# %%
+def sandwich(versor, object):
+    V, Vinv = versor
+    return(V*object*Vinv)
+
+
 # %% [markdown]
 # <h4>*  Geometric operations *</h4>
 
 # %%
 def translate(object,a3): # a3: 3D vector
-    return(1 - a3*eoo/2)*object*(1 + a3*eoo/2)
+    return(sandwich(translator(a3), object))
 
 
 # %%
 def rotate(object,itheta):
-    return(exp(-itheta/2)*object*exp(itheta/2))
+    return(sandwich(rotor(itheta), object))
 
 
 # %%
 def invert(p, norm=False):   # GACS 513
-    ans = -(eo - eoo/2)*p*(eo - eoo/2) 
+    ans = sandwich(inverter(), p)
     if norm:
         ans = normalize(ans)
     return(ans)
@@ -187,9 +244,8 @@ def reflect(p,n):
 
 
 # %%
-# Can be considerably simplified: A Covariant Approach ..., 16 
 def dilate(p, alpha, norm = False):  # Dilate by alpha (> 0)
-    ans = exp(E*ln(alpha)/2)*p*exp(-E*ln(alpha)/2)
+    ans = sandwich(dilator(alpha), p)
     if norm:
         ans = normalize(ans)
     return(ans)
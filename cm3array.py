@@ -0,0 +1,268 @@
+# ---
+# title: Conformal model of R^3 with NumPy arrays
+# jupyter:
+#   jupytext:
+#     cell_metadata_filter: all,-autoscroll,-collapsed,-scrolled,-trusted,-ExecuteTime
+#     notebook_metadata_filter: kernelspec,jupytext,-jupytext.text_representation.jupytext_version
+#     text_representation:
+#       extension: .py
+#       format_name: percent
+#       format_version: '1.3'
+#   kernelspec:
+#     display_name: Python [conda env:galgebra]
+#     language: python
+#     name: conda-env-galgebra-py
+# ---
+
+# %% [markdown]
+# Numerical companion to `cm3.py`: the same conformal model (Amsterdam convention, basis $e_o, e_1, e_2, e_3, e_\infty$) but with plain NumPy coefficient arrays, so that whole point sets can be transformed at once.
+#
+# Every versor $V$ acts on conformal vectors as a linear map $X \mapsto V X V^{-1}$, i.e. a $5\times 5$ matrix.
+# The matrices are written down in closed form (no `exp`), and the action on $k$-blades (circles, lines, spheres, planes in direct representation) is the $k$-th compound matrix, since versors are outermorphisms.
+# A chain of transformations is then just a matrix product that can be computed once and applied to any number of objects.
+#
+# Coefficient arrays have shape `(N, 5)` for vectors, in the order `[o, x, y, z, oo]`, and `(N, C(5,k))` for $k$-blades, in the order of `blades(k)`.
+
+# %%
+import numpy as np
+from functools import lru_cache
+from itertools import combinations
+
+# %%
+basis = ('o', 'e_1', 'e_2', 'e_3', 'oo')
+# metric, same as cm3g
+metric = np.array([[ 0, 0, 0, 0,-1],
+                   [ 0, 1, 0, 0, 0],
+                   [ 0, 0, 1, 0, 0],
+                   [ 0, 0, 0, 1, 0],
+                   [-1, 0, 0, 0, 0]], dtype=float)
+
+
+# %%
+def blades(k):
+    # basis k-blades as index tuples into `basis`, e.g. (0,1) is o^e_1
+    return list(combinations(range(5), k))
+
+
+# %%
+def _frozen(M):
+    # cached matrices are shared between callers, so make them read-only
+    M.setflags(write=False)
+    return M
+
+
+# %% [markdown]
+# <h4>* Versor matrices *</h4>
+#
+# Each function returns the $5\times 5$ matrix of $X \mapsto V X V^{-1}$ for the versor of the same name in `cm3.py`.
+# The arguments are converted to tuples so the results can be cached.
+
+# %%
+def translator(a3): # a3: 3D vector
+    return _translator(tuple(float(t) for t in a3))
+
+@lru_cache(maxsize=None)
+def _translator(t):
+    t = np.array(t)
+    M = np.eye(5)
+    M[1:4,0] = t           # x' = x + o t
+    M[4,1:4] = t           # oo' = oo + t.x + o |t|^2/2
+    M[4,0] = 0.5*t.dot(t)
+    return _frozen(M)
+
+
+# %%
+def rotor(theta): # theta: 3D rotation vector (axis times angle), itheta = I3*theta in cm3
+    return _rotor(tuple(float(t) for t in theta))
+
+@lru_cache(maxsize=None)
+def _rotor(theta):
+    theta = np.array(theta)
+    angle = np.sqrt(theta.dot(theta))
+    M = np.eye(5)
+    if angle == 0:
+        return _frozen(M)
+    n = theta/angle
+    K = np.array([[    0,-n[2], n[1]],
+                  [ n[2],    0,-n[0]],
+                  [-n[1], n[0],    0]])
+    # Rodrigues' formula
+    M[1:4,1:4] = np.eye(3) + np.sin(angle)*K + (1 - np.cos(angle))*K.dot(K)
+    return _frozen(M)
+
+
+# %%
+@lru_cache(maxsize=None)
+def dilator(alpha): # alpha > 0, unnormalized like cm3.dilate
+    return _frozen(np.diag([1/alpha, 1., 1., 1., alpha]))
+
+
+# %%
+@lru_cache(maxsize=None)
+def inverter(): # inversion in the unit sphere, swaps o and oo/2
+    M = np.eye(5)
+    M[0,0] = M[4,4] = 0
+    M[0,4] = 2.
+    M[4,0] = 0.5
+    return _frozen(M)
+
+
+# %%
+def reflector(n): # reflection in the plane through the origin with normal n
+    return _reflector(tuple(float(t) for t in n))
+
+@lru_cache(maxsize=None)
+def _reflector(n):
+    n = np.array(n)
+    M = np.eye(5)
+    M[1:4,1:4] -= 2*np.outer(n, n)/n.dot(n)
+    return _frozen(M)
+
+
+# %%
+def compose(*maps):  # first map in the list is applied first
+    M = np.eye(5)
+    for A in maps:
+        M = A.dot(M)
+    return M
+
+
+# %% [markdown]
+# <h4>* Action on $k$-blades *</h4>
+#
+# The compound matrix $C_k(M)$ has the $k\times k$ minors of $M$ as entries.
+# It maps the coefficients of $x_1\wedge\cdots\wedge x_k$ to those of $Mx_1\wedge\cdots\wedge Mx_k$.
+#
+# Note: for the odd versors (inversion, reflection) this is the outermorphism, which can differ in overall sign from `cm3.invert` on even grades.  The sign does not change the geometric object.
+
+# %%
+def compound(M, k):
+    return _compound(np.ascontiguousarray(M, dtype=float).tobytes(), k)
+
+@lru_cache(maxsize=256)
+def _compound(key, k):
+    M = np.frombuffer(key).reshape(5,5)
+    if k == 0:
+        return _frozen(np.ones((1,1)))
+    idx = np.array(blades(k))
+    # all k x k minors in one batched determinant
+    sub = M[idx[:,None,:,None], idx[None,:,None,:]]
+    return _frozen(np.linalg.det(sub))
+
+
+# %%
+def apply(M, X, grade=1):
+    # apply a versor matrix to an array of grade-k coefficients, shape (..., C(5,k))
+    X = np.asarray(X, dtype=float)
+    if grade == 1:
+        return X.dot(M.T)
+    return X.dot(compound(M, grade).T)
+
+
+# %%
+def wedge(a, b):
+    # outer product of two arrays of vectors, (..., 5) ^ (..., 5) --> (..., 10) in blades(2) order
+    a = np.asarray(a, dtype=float)
+    b = np.asarray(b, dtype=float)
+    i, j = np.array(blades(2)).T
+    return a[...,i]*b[...,j] - a[...,j]*b[...,i]
+
+
+# %% [markdown]
+# <h4>* Points in and out of the model *</h4>
+#
+# Array versions of `pt`, `tp` and `normalize` from `cm3.py`.
+# They work on a whole `(N, 3)` or `(N, 5)` array at once and accept an `out=` array, so the result can be written straight into a preallocated (or memory-mapped) buffer.
+
+# %%
+def pt(x, out=None): # (N,3) 3D points --> (N,5) conformal points
+    x = np.asarray(x, dtype=float)
+    if out is None:
+        out = np.empty(x.shape[:-1] + (5,))
+    out[...,0] = 1.
+    out[...,1:4] = x
+    out[...,4] = 0.5*np.einsum('...i,...i->...', x, x)
+    return out
+
+
+# %%
+def tp(X, out=None): # (N,5) conformal points --> (N,3) 3D part, like cm3.tp
+    X = np.asarray(X, dtype=float)
+    if out is None:
+        out = np.empty(X.shape[:-1] + (3,))
+    out[...] = X[...,1:4]
+    return out
+
+
+# %%
+def normalize(X, out=None):
+    X = np.asarray(X, dtype=float)
+    if X.shape[-1] == 3:  # Normalize 3D vectors
+        scale = np.sqrt(np.einsum('...i,...i->...', X, X))
+    else:                 # Normalize conformal vectors: set o coeff to 1.
+        scale = X[...,0].copy()
+    return np.divide(X, scale[...,None], out=out)
+
+
+# %% [markdown]
+# Point clouds that do not fit in memory can be streamed through any of these functions in chunks.
+# `src` and `dst` can be arrays or paths to `.npy` files; files are opened memory-mapped, so only one chunk is in RAM at a time.
+
+# %%
+def map_chunks(func, src, dst=None, ncols=None, chunk=1<<18):
+    # apply func(rows) -> rows to src chunk by chunk, writing into dst
+    if isinstance(src, str):
+        src = np.load(src, mmap_mode='r')
+    if ncols is None:
+        ncols = func(src[:1]).shape[-1]
+    if dst is None:
+        dst = np.empty((len(src), ncols))
+    elif isinstance(dst, str):
+        dst = np.lib.format.open_memmap(dst, mode='w+', dtype=float, shape=(len(src), ncols))
+    for start in range(0, len(src), chunk):
+        stop = min(start + chunk, len(src))
+        dst[start:stop] = func(src[start:stop])
+    if isinstance(dst, np.memmap):
+        dst.flush()
+    return dst
+
+
+# %% [markdown]
+# <h4>* Play *</h4>
+
+# %%
+# a chain of transformations, computed once
+chain = compose(translator([1,0,0]), rotor([0,0,np.pi/2]), dilator(2.))
+chain
+
+# %%
+# random points
+rng = np.random.default_rng(0)
+X = pt(rng.random((1000,3)))
+
+# %%
+Y = normalize(apply(chain, X))
+tp(Y[:3])
+
+# %%
+# the result is still a set of null vectors (points)
+np.abs(np.einsum('ni,ij,nj->n', Y, metric, Y)).max()
+
+# %%
+# circles through triples of the points transform by the 3rd compound of the same chain
+from math import comb
+comb(5,3), compound(chain, 3).shape
+
+# %% [markdown]
+# A larger cloud, round trip through the model.
+
+# %%
+x = rng.random((10**6,3))
+# %time x2 = tp(normalize(apply(chain, pt(x))))
+
+# %%
+# the same thing streamed in chunks, e.g. for a memory-mapped scan
+# np.save('cloud.npy', x)
+# map_chunks(lambda c: tp(normalize(apply(chain, pt(c)))), 'cloud.npy', 'cloud_out.npy')
+y = map_chunks(lambda c: tp(normalize(apply(chain, pt(c)))), x)
+y[:3]
@@ -0,0 +1,266 @@
+# ---
+# title: Fitting spheres, circles and planes in the conformal model
+# jupyter:
+#   jupytext:
+#     cell_metadata_filter: all,-autoscroll,-collapsed,-scrolled,-trusted,-ExecuteTime
+#     notebook_metadata_filter: kernelspec,jupytext,-jupytext.text_representation.jupytext_version
+#     text_representation:
+#       extension: .py
+#       format_name: percent
+#       format_version: '1.3'
+#   kernelspec:
+#     display_name: Python [conda env:galgebra]
+#     language: python
+#     name: conda-env-galgebra-py
+# ---
+
+# %% [markdown]
+# `cm3.py` constructs a sphere exactly through four points and a plane through three.
+# For noisy data we want the best fit instead.
+#
+# A point $X$ lies on the dual sphere $S$ when $X\cdot S = 0$, so the least squares sphere minimizes
+# $$ \sum_i (X_i\cdot S)^2 = S^T B S, \qquad B = \sum_i (G X_i)(G X_i)^T $$
+# over conformal vectors $S$, with $G$ the metric.
+# To rule out the trivial solution we fix $S\cdot S = S^T G S = 1$ (this is the Pratt constraint; for a normalized dual sphere $S\cdot S = \rho^2$).
+# The minimizer is the eigenvector of the generalized problem $B S = \lambda G S$ with the smallest $\lambda \geq 0$.
+# Since $G^2 = 1$ here this is an ordinary $5\times 5$ eigenproblem for $GB$, and `np.linalg.eig` solves a whole stack of them at once.
+#
+# Planes are dual vectors without an $e_o$ part, $\Pi = \mathbf{n} + d\,e_\infty$; the fit is the usual total least squares plane.
+# Circles are the meet of a fitted plane and a sphere centered in that plane, $C = S\wedge\Pi$ as in `cm3.dualCircle`.
+#
+# All of the conformal vectors use the array conventions of `cm3array.py`.
+
+# %%
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from cm3array import pt, metric, wedge
+
+
+# %%
+def _pratt(X, G):
+    # X: (..., N, k) conformal points, G: (k, k) metric with G*G = 1
+    # returns the dual spheres minimizing sum (X.S)^2 with S.S = 1, normalized to o coefficient 1
+    D = X.dot(G)
+    B = np.einsum('...ni,...nj->...ij', D, D)
+    lam, V = np.linalg.eig(np.einsum('ij,...jk->...ik', G, B))
+    lam, V = lam.real, V.real
+    SGS = np.einsum('...ik,ij,...jk->...k', V, G, V)
+    lam = np.where(SGS > 0, lam, np.inf)
+    k = np.argmin(lam, axis=-1)
+    S = np.take_along_axis(V, k[...,None,None], axis=-1)[...,0]
+    return S/S[...,:1]
+
+
+# %%
+def _center(x):
+    # translation and scale that bring points to the origin with unit rms radius
+    m = x.mean(axis=-2, keepdims=True)
+    s = np.sqrt(((x - m)**2).sum(axis=-1).mean(axis=-1))[...,None,None]
+    return m, s
+
+
+# %% [markdown]
+# <h4>* Least squares fits *</h4>
+#
+# The fits take points with shape `(..., N, 3)` and return one conformal vector per stack entry.
+# The data is centered and scaled before the eigenproblem for conditioning; the answer is moved back by the translation and dilation versors of `cm3array`, written out for a whole stack.
+
+# %%
+def _uncenter(S, m, s):
+    # apply compose(dilator(s), translator(m)) to a stack of dual spheres, one (m, s) per entry
+    S = S*np.stack([1/s, np.ones_like(s), np.ones_like(s), np.ones_like(s), s], axis=-1)
+    out = S.copy()
+    out[...,1:4] += S[...,:1]*m
+    out[...,4] += np.einsum('...i,...i->...', m, S[...,1:4]) + 0.5*S[...,0]*np.einsum('...i,...i->...', m, m)
+    return out/out[...,:1]
+
+
+# %%
+def fit_sphere(x): # best fit dual sphere, o coefficient 1
+    x = np.asarray(x, dtype=float)
+    m, s = _center(x)
+    S = _pratt(pt((x - m)/s), metric)
+    return _uncenter(S, m[...,0,:], s[...,0,0])
+
+
+# %%
+def fit_plane(x): # best fit dual plane n + d oo, |n| = 1
+    x = np.asarray(x, dtype=float)
+    m = x.mean(axis=-2, keepdims=True)
+    y = x - m
+    w, V = np.linalg.eigh(np.einsum('...ni,...nj->...ij', y, y))
+    n = V[...,:,0]  # direction of least spread
+    P = np.zeros(n.shape[:-1] + (5,))
+    P[...,1:4] = n
+    P[...,4] = np.einsum('...i,...i->...', n, m[...,0,:])
+    return P
+
+
+# %%
+def _plane_basis(n):
+    # orthonormal u, v spanning the plane with unit normal n
+    a = np.zeros_like(n)
+    use_y = np.abs(n[...,0]) > 0.9
+    a[...,0] = ~use_y
+    a[...,1] = use_y
+    u = np.cross(n, a)
+    u /= np.linalg.norm(u, axis=-1, keepdims=True)
+    return u, np.cross(n, u)
+
+
+# %%
+# 2D conformal model (o, e_1, e_2, oo), used for circles in their own plane
+metric2 = np.array([[ 0, 0, 0,-1],
+                    [ 0, 1, 0, 0],
+                    [ 0, 0, 1, 0],
+                    [-1, 0, 0, 0]], dtype=float)
+
+
+# %%
+def fit_circle(x): # best fit circle, returned as (dual sphere, dual plane); the dual circle is wedge(S, P)
+    x = np.asarray(x, dtype=float)
+    P = fit_plane(x)
+    u, v = _plane_basis(P[...,1:4])
+    m, s = _center(x)
+    y = x - m
+    uv = np.stack([np.einsum('...ni,...i->...n', y, u),
+                   np.einsum('...ni,...i->...n', y, v)], axis=-1)/s
+    X2 = np.concatenate([np.ones(uv.shape[:-1] + (1,)), uv,
+                         0.5*(uv*uv).sum(axis=-1, keepdims=True)], axis=-1)
+    S2 = _pratt(X2, metric2)
+    c2 = S2[...,1:3]
+    rho = np.sqrt((c2*c2).sum(axis=-1) - 2*S2[...,3])*s[...,0,0]
+    c = m[...,0,:] + s[...,0,:]*(c2[...,:1]*u + c2[...,1:]*v)
+    S = pt(c)
+    S[...,4] -= 0.5*rho**2
+    return S, P
+
+
+# %%
+def sphere_params(S): # dual sphere --> center, radius
+    S = S/S[...,:1]
+    c = S[...,1:4]
+    return c, np.sqrt((c*c).sum(axis=-1) - 2*S[...,4])
+
+
+# %%
+def plane_params(P): # dual plane --> unit normal n, distance d with x.n = d
+    scale = np.linalg.norm(P[...,1:4], axis=-1)
+    return P[...,1:4]/scale[...,None], P[...,4]/scale
+
+
+# %% [markdown]
+# <h4>* RANSAC *</h4>
+#
+# Candidate models come from minimal samples (4 points for a sphere, 3 for a plane or a circle) and are evaluated `batch` at a time: a `(batch, chunk)` array of point-to-model distances per step.
+# Batches run on a thread pool (NumPy releases the GIL in the heavy loops), each with its own random stream spawned from `seed`, so the result does not depend on the number of workers.
+# The best candidate's inliers are then refit by least squares.
+
+# %%
+def _models_sphere(y):
+    c, r = sphere_params(_pratt(pt(y), metric))
+    return c, r
+
+def _dist_sphere(model, y):
+    c, r = model
+    return np.abs(np.linalg.norm(y[None,:,:] - c[:,None,:], axis=-1) - r[:,None])
+
+
+# %%
+def _models_plane(y):
+    n = np.cross(y[:,1] - y[:,0], y[:,2] - y[:,0])
+    n /= np.linalg.norm(n, axis=-1, keepdims=True)
+    return n, (n*y[:,0]).sum(axis=-1)
+
+def _dist_plane(model, y):
+    n, d = model
+    return np.abs(n.dot(y.T) - d[:,None])
+
+
+# %%
+def _models_circle(y):
+    a = y[:,1] - y[:,0]
+    b = y[:,2] - y[:,0]
+    axb = np.cross(a, b)
+    axb2 = (axb*axb).sum(axis=-1, keepdims=True)
+    # circumcenter of the triangle
+    d = np.cross((a*a).sum(axis=-1, keepdims=True)*b - (b*b).sum(axis=-1, keepdims=True)*a, axb)/(2*axb2)
+    return y[:,0] + d, axb/np.sqrt(axb2), np.linalg.norm(d, axis=-1)
+
+def _dist_circle(model, y):
+    c, n, r = model
+    dy = y[None,:,:] - c[:,None,:]
+    h = np.einsum('bni,bi->bn', dy, n)
+    q = np.sqrt(np.maximum((dy*dy).sum(axis=-1) - h*h, 0))
+    return np.sqrt(h*h + (q - r[:,None])**2)
+
+
+# %%
+_kinds = {
+    'sphere': (4, _models_sphere, _dist_sphere, fit_sphere),
+    'plane':  (3, _models_plane,  _dist_plane,  fit_plane),
+    'circle': (3, _models_circle, _dist_circle, fit_circle),
+}
+
+
+# %%
+def ransac(x, kind='sphere', threshold=0.01, trials=1024, batch=128, workers=None, seed=None):
+    # returns (least squares fit to the inliers, boolean inlier mask)
+    x = np.asarray(x, dtype=float)
+    k, models, dist, fit = _kinds[kind]
+    m, s = _center(x)
+    y = (x - m[0])/s.item()
+    thr = threshold/s.item()
+    chunk = max(1, (1 << 22)//batch)
+
+    def run(rng):
+        idx = rng.integers(len(y), size=(batch, k))
+        with np.errstate(all='ignore'):
+            model = models(y[idx])
+            count = np.zeros(batch, dtype=int)
+            for start in range(0, len(y), chunk):
+                count += (dist(model, y[start:start+chunk]) < thr).sum(axis=1)
+        best = np.argmax(count)
+        return count[best], tuple(p[best:best+1] for p in model)
+
+    streams = [np.random.default_rng(ss) for ss in np.random.SeedSequence(seed).spawn(-(-trials//batch))]
+    with ThreadPoolExecutor(workers) as pool:
+        results = list(pool.map(run, streams))
+    count, model = max(results, key=lambda res: res[0])
+    with np.errstate(all='ignore'):
+        inliers = np.concatenate([dist(model, y[start:start+chunk])[0] < thr
+                                  for start in range(0, len(y), chunk)])
+    if inliers.sum() < k:
+        # also for degenerate samples only, whose models are nan
+        raise ValueError("No {} with at least {} inliers within {}: only {}".format(kind, k, threshold, inliers.sum()))
+    return fit(x[inliers]), inliers
+
+
+# %% [markdown]
+# <h4>* Play *</h4>
+
+# %%
+# noisy points on a sphere of radius 2 centered at (1,2,3)
+rng = np.random.default_rng(0)
+u = rng.normal(size=(2000,3))
+x = np.array([1,2,3]) + 2*u/np.linalg.norm(u, axis=1, keepdims=True) + 0.01*rng.normal(size=(2000,3))
+sphere_params(fit_sphere(x))
+
+# %%
+# a stack of 100 independent fits in one call
+sphere_params(fit_sphere(x.reshape(100,20,3)))[1][:5]
+
+# %%
+# half of the points replaced by outliers
+x_bad = x.copy()
+x_bad[::2] = rng.uniform(-5, 5, size=(1000,3))
+S, inliers = ransac(x_bad, 'sphere', threshold=0.05, seed=1)
+sphere_params(S), inliers.sum()
+
+# %%
+# points near the circle of radius 1 about the z axis, in the plane z = 0.5, plus outliers
+t = rng.uniform(0, 2*np.pi, 500)
+xc = np.column_stack([np.cos(t), np.sin(t), 0.5 + 0*t]) + 0.005*rng.normal(size=(500,3))
+xc = np.vstack([xc, rng.uniform(-2, 2, size=(200,3))])
+(S, P), inliers = ransac(xc, 'circle', threshold=0.02, seed=2)
+sphere_params(S), plane_params(P), wedge(S, P)
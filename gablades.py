@@ -0,0 +1,248 @@
+# ---
+# title: Basis blades and product tables for any metric
+# jupyter:
+#   jupytext:
+#     cell_metadata_filter: all,-autoscroll,-collapsed,-scrolled,-trusted,-ExecuteTime
+#     notebook_metadata_filter: kernelspec,jupytext,-jupytext.text_representation.jupytext_version
+#     text_representation:
+#       extension: .py
+#       format_name: percent
+#       format_version: '1.3'
+#   kernelspec:
+#     display_name: Python [conda env:galgebra]
+#     language: python
+#     name: conda-env-galgebra-py
+# ---
+
+# %% [markdown]
+# Basis blades as bitmasks (bit $i$ for vector $i$) and the exact structure constants of the products on them, for any metric: shared by the kernel generator `gacodegen.py` and the sparse multivectors of `sparsemv.py`.
+#
+# An algebra is given by
+# * `metric`: the diagonal of the metric (`[0, 1, 1]`), a symmetric matrix, or a `galgebra` metric string such as `cm3g` of `cm3.py`,
+# * `vectors`: names of the basis vectors (default `0, 1, ...`),
+# * `blades`: the coefficient order, each blade a string or tuple of vector names; a blade out of order such as `'20'` means $e_2 e_0 = -e_{02}$. The default is the `clifford` order (by grade, then lexicographic).
+#
+# For a metric that is not diagonal the vectors are first written in an orthogonal basis ($e_i = \sum_j A_{ij} f_j$, by rational Gram–Schmidt), the products are taken there and transformed back with the outermorphisms of $A$ and $A^{-1}$.
+
+# %%
+from fractions import Fraction
+from itertools import combinations
+import numpy as np
+
+
+# %% [markdown]
+# ## Algebras
+
+# %%
+def parse_metric(metric):
+    # diagonal list, matrix or galgebra string --> square list of Fractions
+    if isinstance(metric, str):
+        metric = [row.split() for row in metric.split(',')]
+    metric = [[Fraction(x) for x in row] if np.ndim(row) else Fraction(row) for row in metric]
+    if not isinstance(metric[0], list):
+        metric = [[metric[i] if i == j else Fraction(0) for j in range(len(metric))] for i in range(len(metric))]
+    n = len(metric)
+    if any(len(row) != n for row in metric) or any(metric[i][j] != metric[j][i] for i in range(n) for j in range(n)):
+        raise ValueError("The metric must be a symmetric square matrix")
+    return metric
+
+
+def _parity(indices):
+    # sign of the permutation sorting a sequence of distinct indices
+    s = 1
+    indices = list(indices)
+    for i in range(len(indices)):
+        for j in range(i + 1, len(indices)):
+            if indices[i] > indices[j]:
+                s = -s
+    return s
+
+
+def _tokens(name, vectors):
+    # blade name --> vector indices, matching the longest vector name first
+    if not isinstance(name, str):
+        return [vectors.index(v) for v in name]
+    out = []
+    by_length = sorted(vectors, key=len, reverse=True)
+    while name:
+        v = next((v for v in by_length if name.startswith(v)), None)
+        if v is None:
+            raise ValueError("Cannot read blade {!r} with vectors {}".format(name, vectors))
+        out.append(vectors.index(v))
+        name = name[len(v):]
+    return out
+
+
+def default_blades(vectors):
+    # clifford order: by grade, then lexicographic in the vector order, as tuples of vector names
+    n = len(vectors)
+    return [tuple(vectors[i] for i in c) for k in range(n + 1) for c in combinations(range(n), k)]
+
+
+# %%
+class Algebra:
+    '''
+    blade bookkeeping for a metric and a coefficient order
+    blade k of the coefficient order is signs[k] times the canonical blade masks[k] (bit i for vector i)
+    '''
+    def __init__(self, metric, vectors=None, blades=None):
+        self.metric = parse_metric(metric)
+        n = self.n = len(self.metric)
+        self.vectors = [str(i) for i in range(n)] if vectors is None else [str(v) for v in vectors]
+        if len(self.vectors) != n:
+            raise ValueError("{} vector names for a metric of size {}".format(len(self.vectors), n))
+        self.blades = default_blades(self.vectors) if blades is None else list(blades)
+        self.masks, self.signs = [], []
+        for name in self.blades:
+            mask, sign = self.mask(name)
+            self.masks.append(mask)
+            self.signs.append(sign)
+        if sorted(self.masks) != list(range(2**n)):
+            raise ValueError("The blades must cover each of the {} basis blades once".format(2**n))
+        self.index = {m: k for k, m in enumerate(self.masks)}
+        self.grades = [bin(m).count('1') for m in self.masks]
+
+    def mask(self, name):
+        # canonical mask of a blade name, and the sign of the named blade relative to it
+        idx = _tokens(name, self.vectors)
+        if len(set(idx)) != len(idx):
+            raise ValueError("Repeated vector in blade {!r}".format(name))
+        return sum(1 << i for i in idx), _parity(idx)
+
+    def label(self, k):
+        # e02 style, or p1^p2 for longer vector names
+        names = [self.vectors[i] for i in _tokens(self.blades[k], self.vectors)]
+        if not names:
+            return '1'
+        return 'e' + ''.join(names) if all(len(v) == 1 for v in self.vectors) else '^'.join(names)
+
+
+# %% [markdown]
+# ## Products of canonical blades
+# Tables are dicts `{(i, j): {k: c}}` of the nonzero structure constants on canonical masks.
+
+# %%
+def reorder_sign(a, b):
+    # sign of moving the vectors of mask b past those of mask a into ascending order
+    a >>= 1
+    s = 0
+    while a:
+        s += bin(a & b).count('1')
+        a >>= 1
+    return -1 if s & 1 else 1
+
+
+def _orthogonalize(G):
+    # rows of B with f = B e orthogonal, and the squares d of f (rational Gram-Schmidt)
+    n = len(G)
+    dot = lambda u, v: sum(u[i]*G[i][j]*v[j] for i in range(n) for j in range(n) if G[i][j])
+    rest = [[Fraction(int(i == j)) for j in range(n)] for i in range(n)]
+    B, d = [], []
+    while rest:
+        k = next((k for k, u in enumerate(rest) if dot(u, u)), None)
+        if k is None:
+            # all null: a pair with a nonzero product gives a non-null sum, otherwise they are degenerate
+            pair = next(((k, l) for k in range(len(rest)) for l in range(k + 1, len(rest)) if dot(rest[k], rest[l])), None)
+            if pair is None:
+                B += rest
+                d += [Fraction(0)]*len(rest)
+                break
+            k, l = pair
+            rest[k] = [x + y for x, y in zip(rest[k], rest[l])]
+        f = rest.pop(k)
+        ff = dot(f, f)
+        rest = [[x - dot(u, f)/ff*y for x, y in zip(u, f)] for u in rest]
+        B.append(f)
+        d.append(ff)
+    return B, d
+
+
+def _inverse(A):
+    # Gauss-Jordan on Fractions
+    n = len(A)
+    M = [list(row) + [Fraction(int(i == j)) for j in range(n)] for i, row in enumerate(A)]
+    for c in range(n):
+        p = next(r for r in range(c, n) if M[r][c])
+        M[c], M[p] = M[p], M[c]
+        M[c] = [x/M[c][c] for x in M[c]]
+        for r in range(n):
+            if r != c and M[r][c]:
+                M[r] = [x - M[r][c]*y for x, y in zip(M[r], M[c])]
+    return [row[n:] for row in M]
+
+
+def _outermorphism(A, n):
+    # blade mask --> {mask: coefficient} for the vectors e_i = sum_j A[i][j] f_j
+    T = {0: {0: Fraction(1)}}
+    for mask in range(1, 2**n):
+        i = mask.bit_length() - 1
+        low, out = T[mask ^ (1 << i)], {}
+        for m, x in low.items():
+            for j in range(n):
+                if A[i][j] and not m & (1 << j):
+                    out[m | 1 << j] = out.get(m | 1 << j, 0) + x*A[i][j]*reorder_sign(m, 1 << j)
+        T[mask] = {m: x for m, x in out.items() if x}
+    return T
+
+
+# %%
+def _canonical(d, n, kind):
+    # a bilinear product of canonical blades in an orthogonal basis with squares d
+    table = {}
+    for a in range(2**n):
+        for b in range(2**n):
+            if kind == 'op' and a & b:
+                continue
+            if kind == 'lc' and a & ~b:
+                continue
+            c = reorder_sign(a, b)
+            for i in range(n):
+                if a & b & (1 << i):
+                    c *= d[i]
+            if c:
+                table[a, b] = {a ^ b: Fraction(c)}
+    return table
+
+
+def canonical_tables(G):
+    # gp, op and lc on the canonical blades of the basis e with metric G
+    n = len(G)
+    diagonal = all(G[i][j] == 0 for i in range(n) for j in range(n) if i != j)
+    if diagonal:
+        d = [G[i][i] for i in range(n)]
+        return {kind: _canonical(d, n, kind) for kind in ('gp', 'op', 'lc')}
+    B, d = _orthogonalize(G)
+    # e = A f and f = B e
+    T, Tinv = _outermorphism(_inverse(B), n), _outermorphism(B, n)
+    tables = {}
+    for kind in ('gp', 'op', 'lc'):
+        f_table = _canonical(d, n, kind)
+        table = {}
+        for a in range(2**n):
+            for b in range(2**n):
+                f_out = {}
+                for ma, xa in T[a].items():
+                    for mb, xb in T[b].items():
+                        for m, c in f_table.get((ma, mb), {}).items():
+                            f_out[m] = f_out.get(m, 0) + xa*xb*c
+                out = {}
+                for m, x in f_out.items():
+                    for k, y in Tinv[m].items():
+                        out[k] = out.get(k, 0) + x*y
+                out = {k: x for k, x in out.items() if x}
+                if out:
+                    table[a, b] = out
+        tables[kind] = table
+    return tables
+
+
+# %% [markdown]
+# <h4>* Play *</h4>
+
+# %%
+# the null vectors o and oo of cm3.py: o oo = -1 + o^oo
+cm3g = '0 0 0 0 -1, 0 1 0 0 0, 0 0 1 0 0, 0 0 0 1 0, -1 0 0 0 0'
+alg = Algebra(cm3g, ['o', 'e1', 'e2', 'e3', 'oo'])
+gp = canonical_tables(alg.metric)['gp']
+o, oo = alg.masks[1], alg.masks[5]
+{alg.label(alg.index[m]): c for m, c in gp[o, oo].items()}
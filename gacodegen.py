@@ -0,0 +1,285 @@
+# ---
+# title: Generated multivector kernels for any metric
+# jupyter:
+#   jupytext:
+#     cell_metadata_filter: all,-autoscroll,-collapsed,-scrolled,-trusted,-ExecuteTime
+#     notebook_metadata_filter: kernelspec,jupytext,-jupytext.text_representation.jupytext_version
+#     text_representation:
+#       extension: .py
+#       format_name: percent
+#       format_version: '1.3'
+#   kernelspec:
+#     display_name: Python [conda env:galgebra]
+#     language: python
+#     name: conda-env-galgebra-py
+# ---
+
+# %% [markdown]
+# The notebooks use several algebras: 2D PGA `Cl(2,0,1)` (`clifford`, with the `e20` convention of `pga.py`), 3D PGA (`clifford.pga` and `pga3` in `galgebra`), $R(2,2)$ with metric $[1,1,-1,-1]$ (`R22.py`) and the conformal model `cm3g` (`cm3.py`), whose metric is not even diagonal.
+# All of them multiply through a generic path at run time.
+# Here the multiplication tables are worked out once, exactly (with `Fraction`), and written out as a Python module with one unrolled line of NumPy per output coefficient.
+# The kernels take `(..., N)` coefficient arrays, so a batch of $10^6$ multivectors is one call.
+# Inside a bilinear kernel each argument is copied once to component-major order `(N, ...)`, so that every coefficient is a contiguous array rather than a strided column, and the result is built the same way and returned as a `(..., N)` view of it; a product of results (as in `sandwich`) then needs no copy.
+# For $10^5$ products in 3D PGA this is about 3 times faster than reading the columns directly.
+#
+# An algebra is a metric, names of the basis vectors and an order of the blades, as in `gablades.py`, which also works out the structure constants.
+#
+# The generated module has the bilinear kernels `gp` (geometric product), `op` ($\wedge$), `lc` (left contraction) and `vee` ($\vee$), and the linear maps `reverse`, `involute`, `conjugate`, `dual` and `undual`.
+# `dual` is the right complement ($B \wedge \mathrm{dual}(B) = I$, the `J` map of `linear algebra.py`, which is what `clifford` uses for degenerate metrics), so it does not depend on the metric and $a\vee b = \mathrm{undual}(\mathrm{dual}(a)\wedge\mathrm{dual}(b))$.
+#
+# `load(...)` writes the module to a cache folder (`~/.cache/ga-kernels`, or the environment variable `GA_KERNELS`) under a hash of the algebra, and later calls just import it.
+
+# %%
+import os
+import hashlib
+import importlib.util
+import numpy as np
+from gablades import Algebra, canonical_tables, reorder_sign
+
+# %%
+version = 2  # bump to regenerate cached modules after changing the generator
+
+
+# %%
+def tables(algebra):
+    # structure constants in the coefficient order: {kind: {(i, j): {k: c}}} and the linear maps
+    alg = algebra
+    N = 2**alg.n
+    out = {}
+    for kind, table in canonical_tables(alg.metric).items():
+        out[kind] = {}
+        for (a, b), terms in table.items():
+            i, j = alg.index[a], alg.index[b]
+            out[kind][i, j] = {alg.index[m]: c*alg.signs[i]*alg.signs[j]*alg.signs[alg.index[m]] for m, c in terms.items()}
+    # dual: blade k --> sign * blade with the complementary mask, with B ^ dual(B) = I
+    full = N - 1
+    dual_index, dual_sign = [0]*N, [0]*N
+    for k, m in enumerate(alg.masks):
+        c = alg.index[full ^ m]
+        # sign so that blade_k ^ (sign blade_c) = I (canonical)
+        dual_index[c] = k
+        dual_sign[c] = reorder_sign(m, full ^ m)*alg.signs[k]*alg.signs[c]
+    undual_index, undual_sign = [0]*N, [0]*N
+    for c in range(N):
+        undual_index[dual_index[c]] = c
+        undual_sign[dual_index[c]] = dual_sign[c]
+    out['dual'] = dual_index, dual_sign
+    out['undual'] = undual_index, undual_sign
+    # vee from op and the complements
+    vee = {}
+    for (i, j), terms in out['op'].items():
+        # dual(a)[i] = dual_sign[i] a[dual_index[i]], and undual(c)[dual_index[k]] = dual_sign[k] c[k]
+        entry = vee.setdefault((dual_index[i], dual_index[j]), {})
+        for k, x in terms.items():
+            entry[dual_index[k]] = entry.get(dual_index[k], 0) + x*dual_sign[i]*dual_sign[j]*dual_sign[k]
+    out['vee'] = vee
+    g = np.array(alg.grades)
+    out['reverse'] = np.where((g*(g - 1)//2) % 2, -1, 1)
+    out['involute'] = np.where(g % 2, -1, 1)
+    out['conjugate'] = out['reverse']*out['involute']
+    return out
+
+
+# %% [markdown]
+# ## Code
+
+# %%
+def _number(c):
+    return repr(int(c)) if c.denominator == 1 else repr(float(c))
+
+
+def _bilinear(name, table, N, doc):
+    # one unrolled line per output coefficient
+    rows = {}
+    for (i, j), terms in sorted(table.items()):
+        for k, c in terms.items():
+            rows.setdefault(k, []).append((c, i, j))
+    used_a = sorted({i for k in rows for c, i, j in rows[k]})
+    used_b = sorted({j for k in rows for c, i, j in rows[k]})
+    lines = ['def {}(a, b):'.format(name), '    # ' + doc,
+             '    a, b = np.asarray(a), np.asarray(b)',
+             '    shape = np.broadcast_shapes(a.shape, b.shape)',
+             '    out = np.empty(shape[-1:] + shape[:-1], dtype=np.result_type(a, b, float))',
+             '    a, b = _components(a), _components(b)']
+    lines += ['    a{0} = a[{0}]'.format(i) for i in used_a]
+    lines += ['    b{0} = b[{0}]'.format(j) for j in used_b]
+    zero = [k for k in range(N) if k not in rows]
+    if zero:
+        lines.append('    out[{}] = 0'.format(zero if len(zero) > 1 else zero[0]))
+    for k in range(N):
+        if k not in rows:
+            continue
+        expr = ''
+        for c, i, j in rows[k]:
+            term = 'a{}*b{}'.format(i, j)
+            if abs(c) != 1:
+                term = '{}*{}'.format(_number(abs(c)), term)
+            expr += (' - ' if c < 0 else ' + ') + term if expr else ('-' if c < 0 else '') + term
+        lines.append('    out[{}] = {}'.format(k, expr))
+    lines.append('    return np.moveaxis(out, 0, -1)')
+    return '\n'.join(lines)
+
+
+def source(algebra):
+    # the text of the kernel module
+    alg = algebra
+    N = 2**alg.n
+    t = tables(alg)
+    metric = [[_number(x) for x in row] for row in alg.metric]
+    parts = ['# generated by gacodegen.py (version {}), do not edit'.format(version),
+             '# metric {}'.format(metric),
+             'import numpy as np', '',
+             'blades = {!r}'.format(tuple(alg.label(k) for k in range(N))),
+             'grades = np.array({!r})'.format(alg.grades),
+             'metric = np.array({!r}, dtype=float)'.format([[float(x) for x in row] for row in alg.metric]), '',
+             'def _components(a):',
+             '    # component-major: a[k] is coefficient k, contiguous (no copy for the results of the kernels)',
+             '    return np.ascontiguousarray(np.moveaxis(a, -1, 0))', '']
+    for name in ('reverse', 'involute', 'conjugate'):
+        parts += ['_{}_signs = np.array({!r}, dtype=float)'.format(name, t[name].tolist()),
+                  'def {0}(a):\n    return np.asarray(a)*_{0}_signs'.format(name), '']
+    for name in ('dual', 'undual'):
+        index, sign = t[name]
+        parts += ['_{}_index = np.array({!r})'.format(name, index),
+                  '_{}_signs = np.array({!r}, dtype=float)'.format(name, sign),
+                  'def {0}(a):\n    return np.asarray(a)[..., _{0}_index]*_{0}_signs'.format(name), '']
+    docs = {'gp': 'geometric product', 'op': 'outer product', 'lc': 'left contraction', 'vee': 'regressive product, undual(op(dual(a), dual(b)))'}
+    for name in ('gp', 'op', 'lc', 'vee'):
+        parts += [_bilinear(name, t[name], N, docs[name]), '']
+    parts += ['def sandwich(m, x):\n    return gp(gp(m, x), reverse(m))', '']
+    return '\n'.join(parts)
+
+
+# %%
+def key(algebra):
+    # hash of the algebra and the generator version, naming the cached module
+    alg = algebra
+    spec = repr(([[str(x) for x in row] for row in alg.metric], alg.vectors, [str(b) for b in alg.blades], version))
+    return hashlib.sha1(spec.encode()).hexdigest()[:16]
+
+
+def cache_folder():
+    return os.environ.get('GA_KERNELS', os.path.join(os.path.expanduser('~'), '.cache', 'ga-kernels'))
+
+
+def load(metric, vectors=None, blades=None, folder=None):
+    '''
+    the kernel module of an algebra, generated on the first call and imported from the cache afterwards
+    '''
+    alg = Algebra(metric, vectors, blades)
+    folder = cache_folder() if folder is None else folder
+    path = os.path.join(folder, 'ga_{}.py'.format(key(alg)))
+    if not os.path.exists(path):
+        os.makedirs(folder, exist_ok=True)
+        # write then rename, so a half-written module is never imported
+        tmp = '{}.{}.tmp'.format(path, os.getpid())
+        with open(tmp, 'w') as f:
+            f.write(source(alg))
+        os.replace(tmp, path)
+    spec = importlib.util.spec_from_file_location('ga_{}'.format(key(alg)), path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+# %% [markdown]
+# ## The algebras of this repo
+
+# %%
+cm3g = '0 0 0 0 -1, 0 1 0 0 0, 0 0 1 0 0, 0 0 0 1 0, -1 0 0 0 0'
+
+algebras = {
+    # clifford Cl(2,0,1, firstIdx=0) and pga2array.to_values
+    'pga2': dict(metric=[0, 1, 1]),
+    # pga.py and PGA Gallery.py: points as x e20 + y e01 + e12
+    'pga2_e20': dict(metric=[0, 1, 1], blades=['', '0', '1', '2', '01', '20', '12', '012']),
+    # clifford.pga and pga3 of linear algebra.py
+    'pga3': dict(metric=[0, 1, 1, 1]),
+    # R22.py
+    'r22': dict(metric=[1, 1, -1, -1], vectors=['p1', 'p2', 'm1', 'm2']),
+    # cm3.py, basis o, e1, e2, e3, oo
+    'cm3': dict(metric=cm3g, vectors=['o', 'e1', 'e2', 'e3', 'oo']),
+}
+
+
+# %% [markdown]
+# <h4>* Play *</h4>
+
+# %%
+import time
+import tempfile
+
+# %%
+# first generation, then a cached import
+folder = tempfile.mkdtemp()
+times = {}
+for name, spec in algebras.items():
+    start = time.perf_counter()
+    load(folder=folder, **spec)
+    first = time.perf_counter() - start
+    start = time.perf_counter()
+    kernels = load(folder=folder, **spec)
+    times[name] = round(first, 3), round(time.perf_counter() - start, 4)
+times
+
+# %%
+# checks against clifford
+from clifford import Cl
+from clifford import pga
+
+rng = np.random.default_rng(0)
+errors = {}
+for name, layout in [('pga2', Cl(2, 0, 1, firstIdx=0)[0]), ('pga3', pga.layout), ('r22', Cl(sig=[1, 1, -1, -1])[0])]:
+    k = load(folder=folder, **algebras[name])
+    a, b = rng.normal(size=(2, 10, len(k.blades)))
+    A, B = [layout.MultiVector(v) for v in a], [layout.MultiVector(v) for v in b]
+    errors[name] = max(np.abs(k.gp(a, b) - [(x*y).value for x, y in zip(A, B)]).max(),
+                       np.abs(k.op(a, b) - [(x^y).value for x, y in zip(A, B)]).max(),
+                       np.abs(k.lc(a, b) - [(x << y).value for x, y in zip(A, B)]).max(),
+                       np.abs(k.reverse(a) - [(~x).value for x in A]).max())
+# for the degenerate algebras also the dual and vee of clifford
+for name, layout in [('pga2', Cl(2, 0, 1, firstIdx=0)[0]), ('pga3', pga.layout)]:
+    k = load(folder=folder, **algebras[name])
+    a, b = rng.normal(size=(2, 10, len(k.blades)))
+    A, B = [layout.MultiVector(v) for v in a], [layout.MultiVector(v) for v in b]
+    errors[name + ' dual, vee'] = max(np.abs(k.dual(a) - [x.dual().value for x in A]).max(),
+                                      np.abs(k.vee(a, b) - [(x & y).value for x, y in zip(A, B)]).max())
+errors
+
+# %%
+# the e20 convention of pga.py: the meet of the lines x = 1 and y = 2 is x e20 + y e01 + e12 = e20 + 2 e01 + e12
+k = load(folder=folder, **algebras['pga2_e20'])
+lx, ly = np.zeros(8), np.zeros(8)
+lx[[2, 1]] = 1, -1   # e1 - e0: x = 1
+ly[[3, 1]] = 1, -2   # e2 - 2 e0: y = 2
+P = k.op(lx, ly)
+P/P[6], k.blades
+
+# %%
+# the conformal model: a point squares to zero and a round through three points
+k = load(folder=folder, **algebras['cm3'])
+
+def cm3_point(x):
+    # eo + x + x^2/2 eoo
+    v = np.zeros(32)
+    v[1] = 1
+    v[2:5] = x
+    v[5] = 0.5*np.dot(x, x)
+    return v
+
+P = cm3_point([1., 2, 3])
+np.abs(k.gp(P, P)).max(), k.blades[:6]
+
+# %%
+# a batch of 10^5 3D PGA products, against clifford one multivector at a time
+k = load(folder=folder, **algebras['pga3'])
+a, b = rng.normal(size=(2, 10**5, 16))
+start = time.perf_counter()
+k.gp(a, b)
+t_kernel = time.perf_counter() - start
+A, B = [pga.layout.MultiVector(v) for v in a[:10**4]], [pga.layout.MultiVector(v) for v in b[:10**4]]
+start = time.perf_counter()
+[x*y for x, y in zip(A, B)]
+t_clifford = 10*(time.perf_counter() - start)
+# seconds for 10^5 products
+t_kernel, t_clifford
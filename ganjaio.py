@@ -0,0 +1,237 @@
+# ---
+# title: Writing large scenes for ganja.js / pyganja
+# jupyter:
+#   jupytext:
+#     cell_metadata_filter: all,-autoscroll,-collapsed,-scrolled,-trusted,-ExecuteTime
+#     notebook_metadata_filter: kernelspec,jupytext,-jupytext.text_representation.jupytext_version
+#     text_representation:
+#       extension: .py
+#       format_name: percent
+#       format_version: '1.3'
+#   kernelspec:
+#     display_name: Python [conda env:galgebra]
+#     language: python
+#     name: conda-env-galgebra-py
+# ---
+
+# %% [markdown]
+# `pyganja.GanjaScene` stores a scene as a JSON list of `{"data": [...], "color": ..., "label": ..., "static": ...}` entries, where `data` is a list of coefficient arrays in the `clifford` blade order of the algebra.
+# Building it with `scene.add_object(p)` costs a Python dict and a list conversion per object, which is too slow for $10^5$ objects.
+#
+# Here whole arrays of objects are converted at once and streamed to disk, a chunk at a time:
+# * `.json` files are a `GanjaScene` list with one entry per chunk, written directly from the arrays,
+# * binary files are a sequence of blocks, each a small JSON header followed by the raw coefficients, which read back as arrays with no parsing.
+#
+# `pyganja` only draws 3D PGA and 2D/3D CGA, so 2D PGA points and lines (the array conventions of `pga2array.py`) are converted to 2D CGA (`clifford.g2c`, signature (3,1)):
+# * the point $(x, y)$ becomes the null vector $\mathbf{x} + \tfrac12 x^2 e_\infty + e_o$,
+# * the line $ax + by + c = 0$ becomes the dual line $a e_1 + b e_2 - c\,e_\infty$,
+#
+# with $e_\infty = e_3 + e_4$ and $e_o = \tfrac12(e_4 - e_3)$.
+
+# %%
+import io
+import json
+import warnings
+import numpy as np
+
+# %%
+sig_cga2 = (1, 1, 1, -1)
+sig_pga3 = (0, 1, 1, 1)
+default_color = 0xAA000000  # pyganja's default, black
+
+
+# %% [markdown]
+# ## Conversions
+# Each returns an `(N, 16)` array of `clifford` coefficients.
+
+# %%
+def cga2_points(P):
+    # homogeneous 2D PGA points (N, 3) --> 2D CGA null vectors
+    P = np.asarray(P, dtype=float).reshape(-1, 3)
+    ideal = P[:,2] == 0
+    if ideal.any():
+        warnings.warn("{} ideal points have no conformal point and are written as zero".format(ideal.sum()))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        xy = np.where(ideal[:,None], 0, P[:,:2]/P[:,2:])
+    r2 = (xy*xy).sum(axis=1)
+    V = np.zeros((len(P), 16))
+    V[:,1:3] = xy
+    V[:,3] = 0.5*(r2 - 1)
+    V[:,4] = 0.5*(r2 + 1)
+    V[ideal] = 0
+    return V
+
+
+# %%
+def cga2_lines(L):
+    # 2D PGA lines (a, b, c) (N, 3) --> 2D CGA dual lines
+    L = np.asarray(L, dtype=float).reshape(-1, 3)
+    V = np.zeros((len(L), 16))
+    V[:,1:3] = L[:,:2]
+    V[:,3] = V[:,4] = -L[:,2]
+    return V
+
+
+# %%
+def pga3_points(p):
+    # Euclidean 3D points (N, 3) --> 3D PGA trivectors
+    p = np.asarray(p, dtype=float).reshape(-1, 3)
+    V = np.zeros((len(p), 16))
+    V[:,11] = -p[:,2]
+    V[:,12] = p[:,1]
+    V[:,13] = -p[:,0]
+    V[:,14] = 1.
+    return V
+
+
+# %%
+def pga3_lines(L):
+    # (N, 6) bivector arrays of pga3array.py --> 3D PGA bivectors
+    L = np.asarray(L, dtype=float).reshape(-1, 6)
+    V = np.zeros((len(L), 16))
+    V[:,5:11] = L
+    return V
+
+
+# %% [markdown]
+# ## Streaming writer
+
+# %%
+def _json_rows(V, precision):
+    # '[..],[..],..' without a Python object per row
+    buf = io.StringIO()
+    np.savetxt(buf, V, fmt='%.{}g'.format(precision), delimiter=',', newline='],[')
+    return '[' + buf.getvalue()[:-2]
+
+
+# %%
+class SceneWriter:
+    '''
+    stream objects to a ganja scene file, as JSON (GanjaScene layout) or binary blocks
+    use as a context manager; add() may be called any number of times
+    '''
+    magic = b'GANJABIN'
+
+    def __init__(self, path, sig, binary=None, chunk=10**4, precision=7, dtype=np.float32):
+        self.binary = (not str(path).endswith('.json')) if binary is None else binary
+        self.sig = [int(s) for s in sig]
+        self.chunk = chunk
+        self.precision = precision
+        self.dtype = np.dtype(dtype).newbyteorder('<')
+        self.count = 0
+        self.file = open(path, 'wb' if self.binary else 'w')
+        self.file.write(self.magic if self.binary else '[')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def add(self, V, color=default_color, label=None, static=False):
+        # V: (N, 16) coefficient arrays, all drawn with the same style
+        V = np.asarray(V).reshape(len(V), -1)
+        for start in range(0, len(V), self.chunk):
+            block = V[start:start+self.chunk]
+            style = {'color': int(color), 'label': label, 'static': static}
+            if self.binary:
+                data = np.ascontiguousarray(block, dtype=self.dtype)
+                header = dict(style, count=len(data), width=data.shape[1], dtype=data.dtype.str, sig=self.sig)
+                header = json.dumps(header).encode()
+                self.file.write(np.uint32(len(header)).tobytes())
+                self.file.write(header)
+                self.file.write(data.tobytes())
+            else:
+                if self.count:
+                    self.file.write(',\n')
+                self.file.write('{"data": [' + _json_rows(block, self.precision) + '], ')
+                self.file.write(json.dumps(style)[1:])
+            self.count += 1
+            label = None  # label the first chunk only
+
+    def close(self):
+        if not self.file.closed:
+            if not self.binary:
+                self.file.write(']')
+            self.file.close()
+
+
+# %%
+def write_scene(path, groups, sig, **kwargs):
+    # groups: iterable of (V, style dict)
+    with SceneWriter(path, sig, **kwargs) as writer:
+        for V, style in groups:
+            writer.add(V, **style)
+
+
+# %% [markdown]
+# ## Reading back
+
+# %%
+def read_scene(path):
+    # yields (V, style) per chunk; binary chunks are read straight into arrays
+    if str(path).endswith('.json'):
+        with open(path) as f:
+            for entry in json.load(f):
+                yield np.array(entry.pop('data')), entry
+        return
+    with open(path, 'rb') as f:
+        if f.read(len(SceneWriter.magic)) != SceneWriter.magic:
+            raise ValueError("{} is not a binary ganja scene".format(path))
+        while True:
+            n = f.read(4)
+            if not n:
+                return
+            header = json.loads(f.read(int(np.frombuffer(n, dtype='<u4')[0])))
+            count, width, dtype = header.pop('count'), header.pop('width'), header.pop('dtype')
+            V = np.fromfile(f, dtype=dtype, count=count*width).reshape(count, width)
+            yield V, header
+
+
+# %%
+def ganja_scene(path):
+    # a pyganja.GanjaScene holding the whole file, for pyganja.draw(scene, sig=...)
+    from pyganja import GanjaScene
+    scene = GanjaScene()
+    for V, style in read_scene(path):
+        style.pop('sig', None)
+        scene.internal_list.append(dict(style, data=V.tolist()))
+    return scene
+
+
+# %% [markdown]
+# <h4>* Play *</h4>
+# The triangle from `Clifford-pga2.py` (points and their joining lines) as a 2D CGA scene, and $10^5$ random points and lines.
+
+# %%
+import os
+import tempfile
+import time
+from pga2array import points, join
+
+# %%
+rng = np.random.default_rng(0)
+A, B, C = points(rng.uniform(-5, 5, size=(3,2)))
+tri = [(cga2_points([A, B, C]), {'color': 0xFF0000, 'label': 'ABC'}),
+       (cga2_lines([join(B, C), join(C, A), join(A, B)]), {'color': 0x0000FF})]
+folder = tempfile.mkdtemp()
+write_scene(os.path.join(folder, 'triangle.json'), tri, sig_cga2)
+open(os.path.join(folder, 'triangle.json')).read()[:200]
+
+# %%
+N = 10**5
+P = points(rng.normal(size=(N,2)))
+L = join(P, points(rng.normal(size=(N,2))))
+times = {}
+for name in ['big.json', 'big.bin']:
+    path = os.path.join(folder, name)
+    start = time.perf_counter()
+    write_scene(path, [(cga2_points(P), {'color': 0xFF0000}), (cga2_lines(L), {'color': 0x0000FF})], sig_cga2)
+    times[name] = time.perf_counter() - start, os.path.getsize(path)
+# seconds and bytes for 2 x 10^5 objects
+times
+
+# %%
+start = time.perf_counter()
+V = np.concatenate([V for V, style in read_scene(os.path.join(folder, 'big.bin'))])
+time.perf_counter() - start, V.shape, np.abs(V[:N] - cga2_points(P)).max()
@@ -0,0 +1,297 @@
+# ---
+# title: Profiling multivector arithmetic
+# jupyter:
+#   jupytext:
+#     cell_metadata_filter: all,-autoscroll,-collapsed,-scrolled,-trusted,-ExecuteTime
+#     notebook_metadata_filter: kernelspec,jupytext,-jupytext.text_representation.jupytext_version
+#     text_representation:
+#       extension: .py
+#       format_name: percent
+#       format_version: '1.3'
+#   kernelspec:
+#     display_name: Python [conda env:galgebra]
+#     language: python
+#     name: conda-env-galgebra-py
+# ---
+
+# %% [markdown]
+# When a symbolic notebook such as `linear algebra 2.py` or `cm3.py` is slow, a plain profiler shows thousands of `sympy` frames but not which geometric operation they belong to.
+# `enable()` wraps the multivector operations of `galgebra` (`Mv`) and `clifford` (`MultiVector`): the products `*`, `^`, `|`, `<`, `>`, `&`, division, `dual`, `exp`, the norms and normalization, and `galgebra`'s `simplify`.
+# `instrument(globals(), 'J3', 'vee3', 'normalize')` wraps the helper functions of a notebook in the same way.
+# For each operation we keep
+# * the number of calls, by the grades of the operands (`1,1` for a product of two vectors, `s` for a scalar operand),
+# * the total time and the self time (without the wrapped operations called inside it),
+# * for symbolic operands, the expression size (`sympy.count_ops`) of the largest operand and of the result,
+# * the self time of each stack of wrapped calls (`vee3;J3;Mv ^`), written by `write_stacks` in the folded format of `flamegraph.pl` and speedscope.
+#
+# Nothing is patched until `enable()`, and `disable()` puts the original methods back, so when profiling is off it costs nothing.
+# The bookkeeping (grades, expression sizes) is timed separately and left out of the reported times.
+# Setting the environment variable `GA_PROFILE=<path>` before importing enables profiling for the whole run and, at exit, prints the report and writes the stacks to `<path>`.
+
+# %%
+import os
+import sys
+import time
+import atexit
+import functools
+import importlib
+from collections import Counter, defaultdict
+
+# %%
+# operations wrapped by enable(): backend -> (module, class, methods)
+targets = {
+    'galgebra': ('galgebra.mv', 'Mv', ['__mul__', '__rmul__', '__xor__', '__rxor__', '__or__', '__ror__',
+                                       '__lt__', '__gt__', '__lshift__', '__rshift__', '__truediv__',
+                                       'dual', 'undual', 'exp', 'norm', 'norm2', 'inv', 'simplify', 'trigsimp']),
+    'clifford': ('clifford', 'MultiVector', ['__mul__', '__rmul__', '__xor__', '__rxor__', '__or__', '__ror__',
+                                             '__and__', '__truediv__', 'dual', 'vee', 'exp', 'normal', 'inv']),
+}
+_symbols = {'__mul__': '*', '__rmul__': '*', '__xor__': '^', '__rxor__': '^', '__or__': '|', '__ror__': '|',
+            '__lt__': '<', '__gt__': '>', '__lshift__': '<<', '__rshift__': '>>', '__and__': '&', '__truediv__': '/'}
+
+# %%
+stats = defaultdict(lambda: {'calls': 0, 'time': 0., 'self': 0., 'grades': Counter(), 'size_in': 0, 'size_out': 0, 'sized': 0})
+stacks = Counter()
+_stack = []    # frames [label, time of wrapped children, bookkeeping time of descendants]
+_patched = []  # (owner, name, original, owned) to restore
+_options = {'sizes': True, 'backends': None}
+
+
+# %%
+def _grades(x):
+    # '1', '02', ... for multivectors, 's' for anything else
+    g = getattr(x, 'grades', None)
+    if g is None:
+        return 's'
+    if callable(g):
+        g = g()
+    return ''.join(str(k) for k in sorted(g)) or '0'
+
+
+def _size(x):
+    # expression size of a symbolic multivector, None otherwise
+    obj = getattr(x, 'obj', None)
+    if obj is None or not hasattr(obj, 'count_ops'):
+        return None
+    return obj.count_ops()
+
+
+def _record(label, args, out, inclusive, own):
+    s = stats[label]
+    s['calls'] += 1
+    s['time'] += inclusive
+    s['self'] += own
+    s['grades'][','.join(_grades(a) for a in args)] += 1
+    if _options['sizes']:
+        size_in = [n for n in map(_size, args) if n is not None]
+        size_out = _size(out)
+        if size_in and size_out is not None:
+            s['size_in'] += max(size_in)
+            s['size_out'] += size_out
+            s['sized'] += 1
+    stacks[';'.join(frame[0] for frame in _stack) + (';' if _stack else '') + label] += own
+
+
+# %%
+def _wrap(label, func):
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        frame = [label, 0., 0.]
+        _stack.append(frame)
+        start = time.perf_counter()
+        try:
+            out = func(*args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - start
+            _stack.pop()
+        # the bookkeeping of wrapped calls inside this one is not part of its time
+        inclusive = elapsed - frame[2]
+        start = time.perf_counter()
+        _record(label, args, out, inclusive, inclusive - frame[1])
+        if _stack:
+            _stack[-1][1] += inclusive
+            _stack[-1][2] += frame[2] + time.perf_counter() - start
+        return out
+    wrapper.__wrapped_original__ = func
+    return wrapper
+
+
+def _patch(owner, name, label):
+    # owner is a class or a namespace dict
+    if isinstance(owner, dict):
+        original, owned = owner[name], True
+        owner[name] = _wrap(label, original)
+    else:
+        original, owned = getattr(owner, name), name in vars(owner)
+        setattr(owner, name, _wrap(label, original))
+    _patched.append((owner, name, original, owned))
+
+
+# %%
+def enable(backends=('galgebra', 'clifford'), sizes=True):
+    # wrap the operations of the installed backends; sizes=False skips the (slow) count_ops
+    if _patched:
+        disable()
+    _options['sizes'] = sizes
+    _options['backends'] = backends
+    for backend in backends:
+        module, cls, methods = targets[backend]
+        try:
+            cls = getattr(importlib.import_module(module), cls)
+        except ImportError:
+            continue
+        for name in methods:
+            if hasattr(cls, name):
+                _patch(cls, name, '{} {}'.format(cls.__name__, _symbols.get(name, name)))
+
+
+def instrument(namespace, *names):
+    # wrap functions of a module or notebook namespace, e.g. instrument(globals(), 'J3', 'vee3')
+    for name in names:
+        _patch(namespace, name, name)
+
+
+def disable():
+    # put back every original method and function
+    while _patched:
+        owner, name, original, owned = _patched.pop()
+        if isinstance(owner, dict):
+            owner[name] = original
+        elif owned:
+            setattr(owner, name, original)
+        else:
+            delattr(owner, name)
+    _stack.clear()
+    _options['backends'] = None
+
+
+def reset():
+    stats.clear()
+    stacks.clear()
+
+
+class profiling:
+    '''
+    with profiling(): ... enables profiling inside the block
+    inside a whole-run profile (GA_PROFILE) the block adds to it instead of resetting it
+    '''
+    def __init__(self, backends=('galgebra', 'clifford'), sizes=True, reset=True):
+        self.args = backends, sizes
+        self.reset = reset
+
+    def __enter__(self):
+        self.previous = _options['backends'], _options['sizes']
+        if self.reset and self.previous[0] is None:
+            reset()
+        enable(*self.args)
+        return stats
+
+    def __exit__(self, *exc):
+        disable()
+        if self.previous[0] is not None:
+            enable(*self.previous)
+
+
+# %% [markdown]
+# ## Output
+
+# %%
+def report(sort='self', top=20, grades=3):
+    # a table of the top operations by self (or total) time, with their most common operand grades
+    rows = sorted(stats.items(), key=lambda item: -item[1]['self' if sort == 'self' else 'time'])[:top]
+    lines = ['{:18} {:>8} {:>10} {:>10} {:>9} {:>14}  {}'.format(
+        'operation', 'calls', 'total s', 'self s', 'mean us', 'size in/out', 'operand grades')]
+    for label, s in rows:
+        size = '{:.0f}/{:.0f}'.format(s['size_in']/s['sized'], s['size_out']/s['sized']) if s['sized'] else '-'
+        common = ' '.join('{}:{}'.format(g, n) for g, n in s['grades'].most_common(grades))
+        lines.append('{:18} {:>8} {:>10.4f} {:>10.4f} {:>9.1f} {:>14}  {}'.format(
+            label, s['calls'], s['time'], s['self'], 1e6*s['time']/s['calls'], size, common))
+    return '\n'.join(lines)
+
+
+def write_stacks(path):
+    # folded stacks 'a;b;c <microseconds>' for flamegraph.pl or speedscope
+    with open(path, 'w') as f:
+        for stack, seconds in sorted(stacks.items()):
+            f.write('{} {}\n'.format(stack.replace(' ', '_'), max(int(round(1e6*seconds)), 1)))
+    return path
+
+
+# %%
+def _dump(path):
+    disable()
+    print(report(), file=sys.stderr)
+    write_stacks(path)
+
+
+if os.environ.get('GA_PROFILE'):
+    enable()
+    atexit.register(_dump, os.environ['GA_PROFILE'])
+
+
+# %% [markdown]
+# <h4>* Play *</h4>
+# The start of `linear algebra 2.py`: solving a linear system with the wedge of three planes in 3D PGA.
+
+# %%
+import tempfile
+import numpy as np
+from sympy import symbols, sqrt, flatten
+from galgebra.ga import Ga
+
+# %%
+pga3coords = (w, x, y, z) = symbols('w x y z', real=True)
+pga3 = Ga('e_0 e_1 e_2 e_3', g=[0, 1, 1, 1], coords=pga3coords)
+e0, e1, e2, e3 = pga3.mv()
+
+
+def J3(x):
+    coef_list = x.blade_coefs()
+    signs = [1, 1, -1, 1, -1, 1, -1, 1, 1, -1, 1, 1, -1, 1, -1, 1]
+    size = len(signs)
+    return pga3.mv(sum(signs[mm]*coef_list[mm]*flatten(pga3.blades)[size-1-mm] for mm in range(size)))
+
+def vee3(a, b):
+    return J3(J3(a)^J3(b))
+
+def normalize(x):
+    return x/sqrt(((~x)*x).scalar())
+
+
+# %%
+a = e1 + e2 + e3 - e0
+b = 2*e1 + e2 + e3
+c = e1 - 2*e2 - e3 + 2*e0
+p = J3(x*e1 + y*e2 + z*e3 + e0)
+
+with profiling():
+    instrument(globals(), 'J3', 'vee3', 'normalize')
+    solution = J3(a^b^c)
+    equations = vee3(p, a^b^c)
+    plane = normalize(vee3(p, J3(e1 + e0)) ^ e2)
+print(report())
+
+# %%
+# the stacks as a flame graph input
+path = write_stacks(os.path.join(tempfile.mkdtemp(), 'stacks.txt'))
+open(path).read().splitlines()[:5]
+
+# %%
+# disabled, the operations are the original methods again
+from galgebra.mv import Mv
+hasattr(Mv.__xor__, '__wrapped_original__'), hasattr(J3, '__wrapped_original__')
+
+# %% [markdown]
+# The same for `clifford`: meets and joins of random lines and points in 2D PGA.
+
+# %%
+from clifford import Cl
+layout, blades = Cl(2, 0, 1, firstIdx=0)
+lines = [layout.MultiVector([0, *row, 0, 0, 0, 0]) for row in np.random.default_rng(0).normal(size=(1000, 3))]
+# numba compiles the products on first use, which would dominate the profile
+((lines[0]^lines[1]) & (lines[2]^lines[3])).normal()
+
+with profiling(('clifford',)):
+    points = [l^m for l, m in zip(lines[::2], lines[1::2])]
+    joins = [(P & Q).normal() for P, Q in zip(points[::2], points[1::2])]
+print(report())
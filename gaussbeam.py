@@ -0,0 +1,161 @@
+# ---
+# title: Gaussian beams through ray transfer matrices
+# jupyter:
+#   jupytext:
+#     cell_metadata_filter: all,-autoscroll,-collapsed,-scrolled,-trusted,-ExecuteTime
+#     notebook_metadata_filter: kernelspec,jupytext,-jupytext.text_representation.jupytext_version
+#     text_representation:
+#       extension: .py
+#       format_name: percent
+#       format_version: '1.3'
+#   kernelspec:
+#     display_name: Python [conda env:galgebra]
+#     language: python
+#     name: conda-env-galgebra-py
+# ---
+
+# %% [markdown]
+# A Gaussian beam (the line complex of the laser beam in `coffeeshop.md`) is described at each plane by its complex beam parameter
+# $$\frac 1q = \frac 1R - i\frac{\lambda}{\pi n w^2},$$
+# with $R$ the radius of curvature of the wavefront, $w$ the spot size (the $1/e^2$ radius), $\lambda$ the vacuum wavelength and $n$ the index of the medium.
+# A ray transfer matrix $\begin{pmatrix}A & B\\ C & D\end{pmatrix}$ (the upper left of the $3\times 3$ matrices of `lens.py`, acting on height and angle) maps it as
+# $$q' = \frac{Aq + B}{Cq + D}.$$
+# In these (height, angle) coordinates the determinant of a refraction is $n/n'$, so after any sequence the index is $n' = n/\det M$.
+#
+# Writing $q = z + i z_R$, the waist is a distance $z$ before the plane (behind it when $z < 0$), $z_R$ is the Rayleigh range, the waist size is $w_0 = \sqrt{\lambda z_R/\pi n}$, and at a distance $\zeta$ after the plane
+# $$w(\zeta)^2 = \frac{\lambda}{\pi n z_R}\left((z + \zeta)^2 + z_R^2\right),$$
+# which is only real arithmetic.
+#
+# Everything broadcasts: matrices `(..., 3, 3)` for stacks of systems (for example one per wavelength), beam parameters `(...)`, and `spot_size` adds a last axis for the $z$ grid.
+# Sequences of elements are listed in the order the beam meets them, so the system matrix is $M = M_k\cdots M_1$ (the products in `lens.py` are written with the first surface on the left instead).
+
+# %%
+import numpy as np
+from functools import reduce
+
+
+# %%
+def thin_lens(f):
+    # lens.thin_lens for arrays of focal lengths f, (..., 3, 3)
+    f = np.asarray(f, dtype=float)
+    M = np.zeros(f.shape + (3, 3))
+    M[...,0,0] = M[...,1,1] = M[...,2,2] = 1
+    M[...,1,0] = -1/f
+    return M
+
+def translate(d):
+    # lens.translate for arrays of distances d
+    d = np.asarray(d, dtype=float)
+    M = np.zeros(d.shape + (3, 3))
+    M[...,0,0] = M[...,1,1] = M[...,2,2] = 1
+    M[...,0,1] = d
+    return M
+
+def ref_sph(r, n):
+    # lens.ref_sph for arrays of radii r and relative indices n = n_out/n_in
+    r, n = np.broadcast_arrays(np.asarray(r, dtype=float), np.asarray(n, dtype=float))
+    M = np.zeros(n.shape + (3, 3))
+    M[...,0,0] = M[...,2,2] = 1
+    M[...,1,0] = (1 - n)/r/n
+    M[...,1,1] = 1/n
+    return M
+
+
+def system(elements):
+    # the matrix M_k ... M_1 of the elements listed in the order the beam meets them
+    return reduce(lambda M, E: np.matmul(E, M), elements)
+
+
+# %%
+def waist_q(w0, wavelength, z=0., n=1.):
+    # q of a beam with waist size w0 a distance z before the plane (behind it for z < 0)
+    return z + 1j*np.pi*n*np.asarray(w0, dtype=float)**2/wavelength
+
+def propagate(q, M):
+    # q' = (A q + B)/(C q + D), broadcasting q (...) against M (..., 3, 3) or (..., 2, 2)
+    M = np.asarray(M)
+    return (M[...,0,0]*q + M[...,0,1])/(M[...,1,0]*q + M[...,1,1])
+
+def index_after(M, n=1.):
+    # index of the medium after the system M, entered from index n
+    M = np.asarray(M)
+    return n/(M[...,0,0]*M[...,1,1] - M[...,0,1]*M[...,1,0])
+
+
+# %%
+def parameters(q, wavelength, n=1.):
+    '''
+    beam parameters at the plane of q, in the units of the wavelength (vacuum)
+    returns a dict of arrays: waist (its distance before the plane), w0, rayleigh, w (spot size at the plane), R
+    '''
+    q = np.asarray(q, dtype=complex)
+    z, zr = q.real, q.imag
+    with np.errstate(divide='ignore'):
+        R = (z*z + zr*zr)/z
+    return {'waist': z, 'w0': np.sqrt(wavelength*zr/(np.pi*n)), 'rayleigh': zr,
+            'w': np.sqrt(wavelength*(z*z + zr*zr)/(np.pi*n*zr)), 'R': R}
+
+def spot_size(q, wavelength, zeta, n=1.):
+    # w at the distances zeta (Z,) after the plane, for beams q (...): (..., Z)
+    q = np.asarray(q, dtype=complex)[...,None]
+    z, zr = q.real, q.imag
+    scale = np.asarray(wavelength/(np.pi*n), dtype=float)[...,None]/zr
+    return np.sqrt(scale*((z + zeta)**2 + zr*zr))
+
+
+# %% [markdown]
+# <h4>* Play *</h4>
+
+# %%
+import time
+import matplotlib.pyplot as plt
+
+# %% [markdown]
+# A beam focused by a thin lens: with the waist $w_0$ at the lens the new waist is at $f/(1 + (f/z_R)^2)$ with size $w_0/\sqrt{1 + (z_R/f)^2}$.
+
+# %%
+wavelength = 633e-6  # mm
+f = 100.
+q = waist_q(1., wavelength)
+p = parameters(propagate(q, thin_lens(f)), wavelength)
+zr = np.pi/wavelength
+-p['waist'], f/(1 + (f/zr)**2), p['w0'], 1/np.sqrt(1 + (zr/f)**2)
+
+# %% [markdown]
+# The Cooke triplet of `lens.py` for three wavelengths (relative indices from a simple $A + B/\lambda^2$ dispersion) and a hundred input waists.
+# The beam leaves the last surface into air; the focus is where the waist is, and the spot size is evaluated on a grid around it.
+
+# %%
+def triplet(wavelength):
+    # the elements of lens.py in the order the beam meets them, for an array of wavelengths (mm)
+    n1 = n3 = 1.69 + 4e-9/wavelength**2 - 4e-9/588e-6**2
+    n2 = 1.67 + 1e-8/wavelength**2 - 1e-8/588e-6**2
+    return [ref_sph(23.71, n1), translate(4.831), ref_sph(7331, 1/n1), translate(5.86),
+            ref_sph(-24.46, n2), translate(0.975), ref_sph(21.896, 1/n2), translate(4.822),
+            ref_sph(86.76, n3), translate(3.127), ref_sph(-20.49, 1/n3)]
+
+wavelengths = np.array([486e-6, 588e-6, 656e-6])
+M = system(triplet(wavelengths))  # (3, 3, 3)
+w_in = np.linspace(0.5, 5, 100)
+q_out = propagate(waist_q(w_in[:,None], wavelengths), M)  # (100 beams, 3 wavelengths)
+focus = parameters(q_out, wavelengths, index_after(M))
+# effective focal length and index after the lens, and the focus (distance and waist) of the widest beam, for each wavelength
+-1/M[:,1,0], index_after(M), -focus['waist'][-1], focus['w0'][-1]
+
+# %%
+# spot sizes on a grid of 10^5 distances after the last surface, for all 300 beams
+zeta = np.linspace(0, 100, 10**5)
+start = time.perf_counter()
+w = spot_size(q_out, wavelengths, zeta)
+elapsed = time.perf_counter() - start
+# (beam, z) pairs per second
+w.size/elapsed
+
+# %%
+fig, ax = plt.subplots()
+for k, color in enumerate(['blue', 'green', 'red']):
+    ax.plot(zeta[::100], w[-1,k,::100], color=color, label='{:.0f} nm'.format(wavelengths[k]*1e6))
+ax.set_xlabel('distance after the last surface (mm)')
+ax.set_ylabel('spot size (mm)')
+ax.set_yscale('log')
+ax.legend();
@@ -0,0 +1,223 @@
+# ---
+# title: 2D PGA points and lines with NumPy arrays
+# jupyter:
+#   jupytext:
+#     cell_metadata_filter: all,-autoscroll,-collapsed,-scrolled,-trusted,-ExecuteTime
+#     notebook_metadata_filter: kernelspec,jupytext,-jupytext.text_representation.jupytext_version
+#     text_representation:
+#       extension: .py
+#       format_name: percent
+#       format_version: '1.3'
+#   kernelspec:
+#     display_name: Python [conda env:galgebra]
+#     language: python
+#     name: conda-env-galgebra-py
+# ---
+
+# %% [markdown]
+# Array versions of the 2D PGA objects of `Clifford-pga2.py` (`Cl(2,0,1)` with blades `1, e0, e1, e2, e01, e02, e12, e012`).
+#
+# * a line $a e_1 + b e_2 + c e_0$ is the row `(a, b, c)`, the line $ax + by + c = 0$,
+# * a point $-x e_{02} + y e_{01} + w e_{12}$ is the row `(x, y, w)`, with $w = 1$ for normalized points and $w = 0$ for ideal points.
+#
+# With these conventions the meet $\ell_1\wedge\ell_2$ and the join $P\vee Q$ are both cross products of the rows.
+
+# %%
+import numpy as np
+
+
+# %%
+def points(xy, w=1.):
+    # (..., 2) Euclidean coordinates --> (..., 3) homogeneous points
+    xy = np.asarray(xy, dtype=float)
+    return np.concatenate([xy, np.broadcast_to(w, xy.shape[:-1] + (1,))], axis=-1)
+
+
+# %%
+def meet(l1, l2):
+    # intersection points of lines
+    return np.cross(l1, l2)
+
+def join(P, Q):
+    # lines through pairs of points
+    return np.cross(P, Q)
+
+
+# %%
+def normalize_points(P):
+    # w = 1; ideal points give inf/nan
+    P = np.asarray(P, dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return P/P[...,2:]
+
+def normalize_lines(L):
+    # a^2 + b^2 = 1
+    L = np.asarray(L, dtype=float)
+    return L/np.linalg.norm(L[...,:2], axis=-1, keepdims=True)
+
+
+# %%
+def to_values(X, grade):
+    # rows of points (grade 2) or lines (grade 1) --> (..., 8) clifford coefficient arrays
+    X = np.asarray(X, dtype=float)
+    V = np.zeros(X.shape[:-1] + (8,))
+    if grade == 1:
+        V[...,1] = X[...,2]
+        V[...,2:4] = X[...,:2]
+    elif grade == 2:
+        V[...,4] = X[...,1]
+        V[...,5] = -X[...,0]
+        V[...,6] = X[...,2]
+    else:
+        raise ValueError("Only lines (grade 1) and points (grade 2), not grade {}".format(grade))
+    return V
+
+def from_values(V, grade):
+    # inverse of to_values
+    V = np.asarray(V, dtype=float)
+    if grade == 1:
+        return np.stack([V[...,2], V[...,3], V[...,1]], axis=-1)
+    elif grade == 2:
+        return np.stack([-V[...,5], V[...,4], V[...,6]], axis=-1)
+    raise ValueError("Only lines (grade 1) and points (grade 2), not grade {}".format(grade))
+
+
+# %%
+def from_multivectors(mvs, grade):
+    # list of clifford 2D PGA multivectors --> rows
+    return from_values([mv.value for mv in mvs], grade)
+
+def to_multivectors(X, grade, layout):
+    return [layout.MultiVector(v) for v in to_values(X, grade).reshape(-1, 8)]
+
+
+# %% [markdown]
+# ## Classifying multivectors
+# `classify` labels each row of an `(N, 8)` coefficient array with one of `kinds` (an index into it), without touching the input.
+# A grade counts as present when its largest coefficient exceeds `rtol` times the largest coefficient of the same object, and a point or line is ideal when its Euclidean part is that small.
+# Objects that are tiny compared with the rest of the batch (below `rtol` times the median object scale, or `atol` if given) are `zero`.
+
+# %%
+kinds = ('zero', 'scalar', 'real line', 'ideal line', 'real point', 'ideal point', 'pseudoscalar', 'mixed')
+_grades = [[0], [1, 2, 3], [4, 5, 6], [7]]
+
+
+# %%
+def classify(V, rtol=1e-9, atol=None):
+    # V: (N, 8) coefficients, a single (8,) row, or a list of clifford multivectors --> (N,) indices into kinds
+    if not isinstance(V, np.ndarray) and hasattr(V[0], 'value'):
+        V = [mv.value for mv in V]
+    V = np.abs(np.asarray(V, dtype=float)).reshape(-1, 8)
+    by_grade = np.stack([V[:,g].max(axis=1) for g in _grades], axis=1)
+    scale = by_grade.max(axis=1)
+    if atol is None:
+        atol = rtol*np.median(scale) if len(scale) else 0.
+    tol = rtol*scale
+    present = by_grade > tol[:,None]
+    single = present.sum(axis=1) == 1
+    grade = np.argmax(present, axis=1)
+    # Euclidean parts: (e1, e2) of a line, e12 of a point
+    line_ideal = np.hypot(V[:,2], V[:,3]) <= tol
+    point_ideal = V[:,6] <= tol
+    out = np.full(len(V), kinds.index('mixed'), dtype=np.int8)
+    out[single & (grade == 0)] = kinds.index('scalar')
+    out[single & (grade == 1)] = np.where(line_ideal, kinds.index('ideal line'), kinds.index('real line'))[single & (grade == 1)]
+    out[single & (grade == 2)] = np.where(point_ideal, kinds.index('ideal point'), kinds.index('real point'))[single & (grade == 2)]
+    out[single & (grade == 3)] = kinds.index('pseudoscalar')
+    out[scale <= atol] = kinds.index('zero')
+    return out
+
+
+# %% [markdown]
+# ## Drawing helpers
+# Clipping lines to a box, all at once with the Liang-Barsky slab test, and rasterizing them into a pixel grid.
+
+# %%
+def clip_lines(L, box):
+    '''
+    segments (M, 2, 2) of the lines L (N, 3) inside box = (xmin, xmax, ymin, ymax)
+    also returns the boolean mask of the N lines that cross the box
+    '''
+    L = np.asarray(L, dtype=float).reshape(-1, 3)
+    a, b, c = L.T
+    xmin, xmax, ymin, ymax = box
+    with np.errstate(divide='ignore', invalid='ignore'):
+        n2 = a*a + b*b
+        p = -c[:,None]*L[:,:2]/n2[:,None]  # foot of the perpendicular from the origin
+        d = np.column_stack([-b, a])
+        lo = np.full(len(L), -np.inf)
+        hi = np.full(len(L), np.inf)
+        for k, (m0, m1) in enumerate([(xmin, xmax), (ymin, ymax)]):
+            t0 = (m0 - p[:,k])/d[:,k]
+            t1 = (m1 - p[:,k])/d[:,k]
+            parallel = d[:,k] == 0
+            outside = parallel & ((p[:,k] < m0) | (p[:,k] > m1))
+            lo = np.where(parallel, lo, np.maximum(lo, np.minimum(t0, t1)))
+            hi = np.where(parallel, hi, np.minimum(hi, np.maximum(t0, t1)))
+            hi = np.where(outside, -np.inf, hi)
+    crosses = (lo <= hi) & (n2 > 0)
+    seg = p[crosses,None,:] + np.stack([lo[crosses], hi[crosses]], axis=1)[:,:,None]*d[crosses,None,:]
+    return seg, crosses
+
+
+# %%
+def raster_lines(L, box, shape, weights=None):
+    '''
+    boolean image (H, W) of the pixels crossed by the lines L (N, 3), row 0 at ymin
+    with weights (N,), the sum of the weights of the lines crossing each pixel instead
+    one sample per pixel column for shallow lines and per pixel row for steep ones
+    '''
+    L = np.asarray(L, dtype=float).reshape(-1, 3)
+    H, W = shape
+    xmin, xmax, ymin, ymax = box
+    # the same lines in pixel coordinates
+    a = L[:,0]*(xmax - xmin)/W
+    b = L[:,1]*(ymax - ymin)/H
+    c = L[:,2] + L[:,0]*xmin + L[:,1]*ymin
+    out = np.zeros(H*W, dtype=bool if weights is None else float)
+    shallow = np.abs(a) <= np.abs(b)
+    for mask, n, m, p, q, stride in [(shallow, W, H, a, b, (1, W)), (~shallow, H, W, b, a, (W, 1))]:
+        u = np.arange(n, dtype=np.float32) + 0.5
+        p, q, r = [z[mask,None].astype(np.float32) for z in (p, q, c)]
+        v = -(p*u + r)/q
+        inside = (v >= 0) & (v < m)
+        pixels = (np.arange(n)*stride[0] + v.astype(np.int32)*stride[1])[inside]
+        if weights is None:
+            out[pixels] = True
+        else:
+            w = np.broadcast_to(np.asarray(weights, dtype=float)[mask,None], v.shape)[inside]
+            out += np.bincount(pixels, weights=w, minlength=H*W)
+    return out.reshape(H, W)
+
+
+# %%
+def finite_points(P):
+    # Euclidean coordinates (M, 2) of the finite points among P (N, 3)
+    P = np.asarray(P, dtype=float).reshape(-1, 3)
+    P = P[P[:,2] != 0]
+    return P[:,:2]/P[:,2:]
+
+
+# %% [markdown]
+# ## Projective transformations
+# A $3\times 3$ matrix $T$ acting on points $P \mapsto TP$ acts on lines by the inverse transpose, so that incidence $\ell\cdot P = 0$ is kept.
+# For rows of points and lines that is `P @ T.T` and `L @ inv(T)`.
+
+# %%
+def euclidean(theta=0., tx=0., ty=0.):
+    # rotation by theta about the origin followed by a translation by (tx, ty)
+    c, s = np.cos(theta), np.sin(theta)
+    return np.array([[c, -s, tx],
+                     [s,  c, ty],
+                     [0., 0., 1.]])
+
+
+# %%
+def transform(X, T, grade):
+    # apply the point transformation T to rows of points (grade 2) or lines (grade 1)
+    X = np.asarray(X, dtype=float)
+    if grade == 2:
+        return X.dot(T.T)
+    elif grade == 1:
+        return X.dot(np.linalg.inv(T))
+    raise ValueError("Only lines (grade 1) and points (grade 2), not grade {}".format(grade))
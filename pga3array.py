@@ -0,0 +1,84 @@
+# ---
+# title: 3D PGA lines with NumPy arrays
+# jupyter:
+#   jupytext:
+#     cell_metadata_filter: all,-autoscroll,-collapsed,-scrolled,-trusted,-ExecuteTime
+#     notebook_metadata_filter: kernelspec,jupytext,-jupytext.text_representation.jupytext_version
+#     text_representation:
+#       extension: .py
+#       format_name: percent
+#       format_version: '1.3'
+#   kernelspec:
+#     display_name: Python [conda env:galgebra]
+#     language: python
+#     name: conda-env-galgebra-py
+# ---
+
+# %% [markdown]
+# Array versions of the 3D PGA line constructions used in `statics.py`, shared by the truss, force system and dynamics notebooks.
+#
+# Bivectors are stored as arrays of the 6 coefficients of `clifford.pga` in blade order `e01, e02, e03, e12, e13, e23`, so `mv.value[5:11]` of a `clifford` bivector is one row.
+# For a line through the point $\mathbf{p}$ with direction $\mathbf{d}$:
+# * the direction sits in $(e_{23}, -e_{13}, e_{12})$,
+# * the moment $\mathbf{p}\times\mathbf{d}$ sits in $(e_{01}, e_{02}, e_{03})$.
+
+# %%
+import numpy as np
+
+
+# %%
+def points(p):
+    # 3D points; 2D points are placed in the z = 0 plane
+    p = np.asarray(p, dtype=float)
+    if p.shape[-1] == 2:
+        p = np.concatenate([p, np.zeros(p.shape[:-1] + (1,))], axis=-1)
+    return p
+
+
+# %%
+def force_lines(p, F):
+    # force lines for forces F (3-vectors) applied at points p, i.e. |F| (p & (p + F)).normal()
+    p = points(p)
+    F = points(F)
+    L = np.empty(np.broadcast_shapes(p.shape, F.shape)[:-1] + (6,))
+    L[...,0:3] = np.cross(p, F)
+    L[...,3] = F[...,2]
+    L[...,4] = -F[...,1]
+    L[...,5] = F[...,0]
+    return L
+
+
+# %%
+def join_lines(p, q):
+    # normalized lines p & q through arrays of 3D points, directed from p to q
+    p = points(p)
+    d = points(q) - p
+    return force_lines(p, d/np.linalg.norm(d, axis=-1, keepdims=True))
+
+
+# %%
+def force_vectors(L):
+    # direction (force) part of force lines, inverse of force_lines
+    L = np.asarray(L, dtype=float)
+    return np.stack([L[...,5], -L[...,4], L[...,3]], axis=-1)
+
+
+# %%
+def moments(L):
+    # moment part of force lines, p x F about the origin
+    return np.asarray(L, dtype=float)[...,0:3]
+
+
+# %%
+def from_multivectors(mvs):
+    # list of clifford.pga bivectors --> (N, 6) array
+    return np.array([mv.value[5:11] for mv in mvs])
+
+
+# %%
+def to_multivectors(L, layout):
+    # (N, 6) array --> list of clifford.pga bivectors
+    L = np.asarray(L, dtype=float).reshape(-1, 6)
+    values = np.zeros((len(L), layout.gaDims))
+    values[:,5:11] = L
+    return [layout.MultiVector(v) for v in values]
@@ -0,0 +1,235 @@
+# ---
+# title: Animating 2D PGA plots
+# jupyter:
+#   jupytext:
+#     cell_metadata_filter: all,-autoscroll,-collapsed,-scrolled,-trusted,-ExecuteTime
+#     notebook_metadata_filter: kernelspec,jupytext,-jupytext.text_representation.jupytext_version
+#     text_representation:
+#       extension: .py
+#       format_name: percent
+#       format_version: '1.3'
+#   kernelspec:
+#     display_name: Python [conda env:galgebra]
+#     language: python
+#     name: conda-env-galgebra-py
+# ---
+
+# %% [markdown]
+# `add_to_axes` (in `clifford-2DPGA-matplotlib.py`) makes new artists for every object, which is fine for a static figure but far too slow to redraw a sweep of a parameter.
+# Here each group of objects gets persistent artists (a `LineCollection` for lines, a marker-only `Line2D` for points) and a frame only replaces their data arrays.
+# With blitting the axes, ticks and any static objects are drawn once, saved as a background, and each frame only draws the animated artists on top of it.
+#
+# A group is a function of the swept parameter returning rows of points `(x, y, w)` or lines `(a, b, c)` (conventions of `pga2array.py`).
+# Lines are clipped to the axes box all at once (`pga2array.clip_lines`).
+# For thousands of lines Agg spends most of the frame stroking paths (about 45 µs a line), so above `raster_above = 500` lines a group is drawn instead as one pixel wide lines in an image the size of the axes, computed with NumPy (`pga2array.raster_lines`) and handed to the renderer without resampling (`LineImage`); `lines(..., raster=True/False)` forces either way.
+# On a 460 pixel axes 2000 lines then take about 13 ms a frame instead of 90 ms.
+#
+# For interactive use switch to `%matplotlib widget` and call `play`; offline, `save` writes a video file (ffmpeg for `.mp4`, pillow for `.gif`).
+
+# %%
+import time
+import warnings
+import numpy as np
+import matplotlib.pyplot as plt
+from matplotlib import animation
+from matplotlib.artist import Artist
+from matplotlib.colors import to_rgba
+from matplotlib.collections import LineCollection
+from pga2array import clip_lines, raster_lines, finite_points
+
+
+# %%
+class LineImage(Artist):
+    '''
+    lines as an RGBA image with one pixel per screen pixel of the axes box
+    rasterized at draw time and handed to the renderer as it is, without the resampling of AxesImage
+    '''
+    def __init__(self, box, color, **kwargs):
+        super().__init__()
+        self.set(**kwargs)
+        self.box = box
+        # the RGBA bytes of the color as one uint32, so that a frame is a single np.where
+        self.color = (255*np.array(to_rgba(color))).astype(np.uint8).view(np.uint32)[0]
+        self.L = np.zeros((0, 3))
+
+    def set_lines(self, L):
+        self.L = L
+        self.stale = True
+
+    def draw(self, renderer):
+        if not self.get_visible():
+            return
+        bbox = self.axes.bbox
+        mask = raster_lines(self.L, self.box, (max(int(bbox.height), 1), max(int(bbox.width), 1)))
+        # row 0 at the bottom, as raster_lines gives it
+        rgba = np.where(mask, self.color, np.uint32(0)).view(np.uint8).reshape(mask.shape + (4,))
+        gc = renderer.new_gc()
+        gc.set_clip_rectangle(bbox)
+        renderer.draw_image(gc, bbox.x0, bbox.y0, rgba)
+        gc.restore()
+        self.stale = False
+
+
+# %%
+class Animation2D:
+    '''
+    persistent artists for groups of 2D PGA points and lines, updated from a swept parameter
+    '''
+    def __init__(self, ax=None, box=(-1, 1, -1, 1)):
+        if ax is None:
+            fig, ax = plt.subplots(figsize=(6,6))
+            ax.set_aspect(1)
+        self.ax = ax
+        self.fig = ax.figure
+        self.box = box
+        ax.axis(box)
+        self.groups = []
+        self.background = None
+        self.frame_times = []
+
+    # lines(raster=None) draws more lines than this into an image
+    raster_above = 500
+
+    def lines(self, func, static=False, raster=None, **style):
+        # func(t) -> (N, 3) lines; static groups are drawn once with func(None)
+        # raster: one pixel wide lines in an image instead of paths, by default above raster_above lines
+        style.setdefault('color', 'green')
+        paths = LineCollection([], animated=not static, **style)
+        self.ax.add_collection(paths)
+        image = LineImage(self.box, style['color'], animated=not static, zorder=paths.get_zorder())
+        self.ax.add_artist(image)
+
+        def setter(L):
+            use = len(L) > self.raster_above if raster is None else raster
+            paths.set_visible(not use)
+            image.set_visible(use)
+            if use:
+                image.set_lines(L)
+            else:
+                paths.set_segments(clip_lines(L, self.box)[0])
+
+        self._add([paths, image], func, static, setter)
+        return paths, image
+
+    def points(self, func, static=False, **style):
+        # func(t) -> (N, 3) points; ideal points are skipped
+        style.setdefault('color', 'blue')
+        style.setdefault('marker', 'o')
+        artist, = self.ax.plot([], [], linestyle='', animated=not static, **style)
+        self._add([artist], func, static, lambda P: artist.set_data(*finite_points(P).T))
+        return artist
+
+    def _add(self, artists, func, static, setter):
+        if static:
+            setter(func(None))
+        else:
+            self.groups.append((artists, func, setter))
+        self.background = None
+
+    def update(self, t):
+        # new data for every animated artist; returns the artists for blitting
+        for artists, func, setter in self.groups:
+            setter(func(t))
+        return [artist for artists, func, setter in self.groups for artist in artists]
+
+    def _init(self):
+        return self.update(self.params[0])
+
+    def play(self, params, interval=33, **kwargs):
+        # FuncAnimation with blitting; keep a reference to the result while it runs
+        self.params = np.asarray(params)
+        return animation.FuncAnimation(self.fig, self.update, frames=self.params, init_func=self._init,
+                                       interval=interval, blit=True, **kwargs)
+
+    def blit(self, t):
+        # one blitted frame: restore the saved background and draw only the animated artists
+        canvas = self.fig.canvas
+        if self.background is None:
+            animated = [artist for artists, func, setter in self.groups for artist in artists]
+            visible = [artist.get_visible() for artist in animated]
+            for artist in animated:
+                artist.set_visible(False)
+            canvas.draw()
+            self.background = canvas.copy_from_bbox(self.ax.bbox)
+            for artist, v in zip(animated, visible):
+                artist.set_visible(v)
+        start = time.perf_counter()
+        canvas.restore_region(self.background)
+        for artist in self.update(t):
+            self.ax.draw_artist(artist)
+        canvas.blit(self.ax.bbox)
+        canvas.flush_events()
+        self.frame_times.append(time.perf_counter() - start)
+
+    def fps(self, params):
+        # sustained frames per second of the blitted loop
+        self.frame_times = []
+        for t in params:
+            self.blit(t)
+        return 1/np.median(self.frame_times)
+
+    def save(self, path, params, fps=30, dpi=100, **kwargs):
+        # offline export; the writer is chosen from the file extension
+        writer = 'pillow' if str(path).endswith('.gif') else 'ffmpeg'
+        if not animation.writers.is_available(writer):
+            warnings.warn("Writer {} not available, saving a gif instead".format(writer))
+            writer = 'pillow'
+            path = str(path).rsplit('.', 1)[0] + '.gif'
+        self.play(params).save(path, writer=writer, fps=fps, dpi=dpi, **kwargs)
+        return path
+
+
+# %% [markdown]
+# <h4>* Play *</h4>
+
+# %%
+from pga2array import points, meet, join, euclidean, transform
+
+# %% [markdown]
+# Two thousand random lines rotating about the origin, with the meets of neighbouring lines.
+
+# %%
+rng = np.random.default_rng(0)
+angle = rng.uniform(0, 2*np.pi, 2000)
+L0 = np.column_stack([np.cos(angle), np.sin(angle), rng.uniform(-1, 1, 2000)])
+spin = Animation2D(box=(-1.5, 1.5, -1.5, 1.5))
+spin.lines(lambda t: transform(L0, euclidean(t), 1), raster=False, linewidths=0.5)
+spin.points(lambda t: transform(meet(L0[:200:2], L0[1:200:2]), euclidean(t), 2), markersize=2)
+spin.points(lambda t: points([[0, 0]]), static=True, color='red')
+
+# %%
+# the same lines drawn into an image, the default for this many lines
+spin_raster = Animation2D(box=(-1.5, 1.5, -1.5, 1.5))
+spin_raster.lines(lambda t: transform(L0, euclidean(t), 1))
+spin_raster.points(lambda t: transform(meet(L0[:200:2], L0[1:200:2]), euclidean(t), 2), markersize=2)
+spin_raster.points(lambda t: points([[0, 0]]), static=True, color='red')
+
+# %%
+# frames per second for 2000 lines and 100 points, as paths and as an image
+spin.fps(np.linspace(0, np.pi/2, 30)), spin_raster.fps(np.linspace(0, np.pi/2, 30))
+
+# %% [markdown]
+# A thin lens at $x = 0$ as its focal length is swept.
+# A ray with height $h$ and slope $m$ is the line $mx - y + h = 0$ (see `Clifford-pga2.py`) and leaves the lens with slope $m - h/f$.
+
+# %%
+obj = points([[-3., 0.8]])
+m = np.linspace(-0.6, 0.2, 9)
+rays_in = join(obj, points(np.column_stack([np.zeros_like(m), 0.8 + 3*m])))
+
+def rays_out(f):
+    # incoming rays as (m, -1, h) rows, refracted by the thin lens
+    r = rays_in/-rays_in[:,1:2]
+    r[:,0] -= r[:,2]/f
+    return r
+
+lens = Animation2D(box=(-3.5, 6, -2, 2))
+lens.lines(lambda t: rays_in, static=True, color='gray', linewidths=0.5)
+lens.lines(lambda t: np.array([[1., 0, 0]]), static=True, color='black')
+lens.lines(rays_out)
+lens.points(lambda f: meet(rays_out(f)[:1], rays_out(f)[-1:]), color='red')
+lens.points(lambda t: obj, static=True, color='red')
+
+# %%
+# lens.save('lens.mp4', np.linspace(1, 2.5, 90))
+lens.fps(np.linspace(1, 2.5, 30))
@@ -0,0 +1,499 @@
+# ---
+# title: Benchmarks of the 2D PGA backends
+# jupyter:
+#   jupytext:
+#     cell_metadata_filter: all,-autoscroll,-collapsed,-scrolled,-trusted,-ExecuteTime
+#     notebook_metadata_filter: kernelspec,jupytext,-jupytext.text_representation.jupytext_version
+#     text_representation:
+#       extension: .py
+#       format_name: percent
+#       format_version: '1.3'
+#   kernelspec:
+#     display_name: Python [conda env:galgebra]
+#     language: python
+#     name: conda-env-galgebra-py
+# ---
+
+# %% [markdown]
+# The same 2D PGA operations appear three times in this repo: symbolic `galgebra` multivectors (`pga.py`, `linear algebra.py`), `clifford` multivectors (`Clifford-pga2.py`, `statics.py`) and NumPy arrays (`pga2array.py`, `lens.py`).
+# This notebook times each operation in every backend that has it, for $1$ to $10^6$ objects, and checks that the backends agree.
+#
+# A case is an input generator `make(rng, n)` and, for each backend, three functions:
+# * `prepare(*args)` converts the inputs to the backend's objects (not timed),
+# * `run(prepared)` is the timed operation,
+# * `result(out)` converts the output back to an array, compared with the first backend (`array`) for small sizes.
+#
+# Multivector inputs are `(n, 8)` coefficient arrays in the `clifford` blade order `1, e0, e1, e2, e01, e02, e12, e012`, which is also the `galgebra` order of `Ga('e_0 e_1 e_2')`.
+# A backend stops at the first size whose time would exceed `budget` seconds, extrapolated from the last two sizes as a fixed cost plus a cost per object (or in proportion to the size after the first one), so `galgebra` stops after about a hundred objects and `clifford` after a few thousand.
+#
+# Runs are appended to a JSON history file together with the git commit, and `compare` flags the timings that got slower than a baseline run.
+# (The repo is a set of notebooks rather than a package, so this is a plain module instead of an `asv` or `pytest-benchmark` suite.)
+
+# %%
+import json
+import os
+import time
+import platform
+import warnings
+import subprocess
+from functools import reduce
+import numpy as np
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.collections import LineCollection
+from pga2array import meet, join, normalize_lines, to_values, from_values, euclidean, transform, clip_lines
+
+# %% [markdown]
+# ## Backends
+# The `clifford` and `galgebra` algebras are built once, when the first case needs them.
+
+# %%
+_algebras = {}
+
+
+def clifford_layout():
+    if 'clifford' not in _algebras:
+        from clifford import Cl
+        _algebras['clifford'] = Cl(2, 0, 1, firstIdx=0)[0]
+    return _algebras['clifford']
+
+
+def galgebra_algebra():
+    # the algebra and its 8 basis blades
+    if 'galgebra' not in _algebras:
+        from galgebra.ga import Ga
+        ga = Ga('e_0 e_1 e_2', g=[0, 1, 1])
+        e0, e1, e2 = ga.mv()
+        _algebras['galgebra'] = ga, [ga.mv(1), e0, e1, e2, e0^e1, e0^e2, e1^e2, e0^e1^e2]
+    return _algebras['galgebra']
+
+
+# %%
+def to_clifford(V):
+    layout = clifford_layout()
+    return [layout.MultiVector(v) for v in np.asarray(V, dtype=float).reshape(-1, 8)]
+
+def from_clifford(mvs):
+    return np.array([mv.value for mv in mvs]).reshape(-1, 8)
+
+def to_galgebra(V):
+    ga, blades = galgebra_algebra()
+    return [sum((float(c)*b for c, b in zip(v, blades) if c != 0), ga.mv(0))
+            for v in np.asarray(V, dtype=float).reshape(-1, 8)]
+
+def from_galgebra(mvs):
+    return np.array([[float(c) for c in mv.blade_coefs()] for mv in mvs]).reshape(-1, 8)
+
+
+# %%
+# the dual of clifford (a complement, defined for degenerate metrics) reverses the blades and flips e1 and e02
+_dual_signs = np.array([1, 1, -1, 1, 1, -1, 1, 1.])
+
+def galgebra_dual(x):
+    # galgebra's own dual multiplies by I, which loses the e0 parts in PGA; use the complement instead
+    return to_galgebra(_dual_signs*from_galgebra([x])[0][::-1])[0]
+
+def galgebra_vee(a, b):
+    # regressive product through the complement, as vee3 in linear algebra.py
+    return galgebra_dual(galgebra_dual(a)^galgebra_dual(b))
+
+
+# %%
+def _array(func, grade_in, grade_out):
+    # NumPy rows in the conventions of pga2array.py
+    return (lambda *V: [from_values(v, grade_in) for v in V],
+            lambda X: func(*X),
+            lambda Y: to_values(Y, grade_out))
+
+def _clifford(func):
+    return (lambda *V: [to_clifford(v) for v in V],
+            lambda X: [func(*x) for x in zip(*X)],
+            from_clifford)
+
+def _galgebra(func):
+    return (lambda *V: [to_galgebra(v) for v in V],
+            lambda X: [func(*x) for x in zip(*X)],
+            from_galgebra)
+
+
+# %% [markdown]
+# ## Cases
+
+# %%
+cases = {}
+
+def register(op, make, **backends):
+    # backends: name -> (prepare, run, result); the first one is the reference for the checks
+    cases[op] = (make, backends)
+
+
+# %%
+def _lines(rng, n):
+    # normalized lines crossing the unit disc, as coefficients
+    phi = rng.uniform(0, 2*np.pi, n)
+    return to_values(np.column_stack([np.cos(phi), np.sin(phi), rng.uniform(-0.9, 0.9, n)]), 1)
+
+def _points(rng, n):
+    return to_values(np.column_stack([rng.uniform(-1, 1, (n, 2)), np.ones(n)]), 2)
+
+
+# %%
+register('wedge', lambda rng, n: (_lines(rng, n), _lines(rng, n)),
+         array=_array(meet, 1, 2),
+         clifford=_clifford(lambda a, b: a^b),
+         galgebra=_galgebra(lambda a, b: a^b))
+
+register('vee', lambda rng, n: (_points(rng, n), _points(rng, n)),
+         array=_array(join, 2, 1),
+         clifford=_clifford(lambda a, b: a & b),
+         galgebra=_galgebra(galgebra_vee))
+
+register('dual', lambda rng, n: (rng.normal(size=(n, 8)),),
+         array=(lambda V: V, lambda V: _dual_signs*V[:,::-1], lambda V: V),
+         clifford=_clifford(lambda x: x.dual()),
+         galgebra=_galgebra(galgebra_dual))
+
+register('normalize', lambda rng, n: (3*_lines(rng, n),),
+         array=_array(normalize_lines, 1, 1),
+         clifford=_clifford(lambda x: x.normal()),
+         galgebra=_galgebra(lambda x: x/(x*x.rev()).scalar()**0.5))
+
+
+# %% [markdown]
+# The sandwich $M P \tilde M$ with the motor $M = (1 - \tfrac12(t_x e_{01} + t_y e_{02}))(\cos\tfrac\theta2 - \sin\tfrac\theta2 e_{12})$ is `pga2array.transform` with `euclidean(theta, tx, ty)`.
+#
+# The outermorphism of a ray transfer matrix (as `M` in `pga.py`, acting on the coefficients of $e_0, e_1, e_2$) acts on the point coefficients $(e_{01}, e_{02}, e_{12})$ by its second compound matrix.
+
+# %%
+_motor = (0.7, 0.3, -0.2)
+_rtm = np.array([[1, -0.5, 0], [0.2, 1, 0], [0, 0, 1.]])
+
+
+def motor_values(theta, tx, ty):
+    # coefficients of M, the rotation by theta about the origin followed by the translation (tx, ty)
+    c, s = np.cos(theta/2), np.sin(theta/2)
+    V = np.zeros(8)
+    V[0], V[6] = c, -s
+    V[4] = -0.5*(c*tx + s*ty)
+    V[5] = 0.5*(s*tx - c*ty)
+    return V
+
+
+def compound(M):
+    # second compound matrix: the outermorphism of M on bivectors (e01, e02, e12)
+    ij = [(0, 1), (0, 2), (1, 2)]
+    return np.array([[M[i,k]*M[j,l] - M[i,l]*M[j,k] for k, l in ij] for i, j in ij])
+
+
+# %%
+def _sandwich_clifford():
+    prepare, run, result = _clifford(None)
+    M = to_clifford(motor_values(*_motor))[0]
+    return prepare, lambda X: [M*x*~M for x in X[0]], result
+
+def _sandwich_galgebra():
+    prepare, run, result = _galgebra(None)
+    M = to_galgebra(motor_values(*_motor))[0]
+    return prepare, lambda X: [M*x*M.rev() for x in X[0]], result
+
+register('sandwich', lambda rng, n: (_points(rng, n),),
+         array=_array(lambda P: transform(P, euclidean(*_motor), 2), 2, 2),
+         clifford=_sandwich_clifford(),
+         galgebra=_sandwich_galgebra())
+
+
+# %%
+def _outermorphism_array():
+    C = compound(_rtm)
+
+    def result(B):
+        V = np.zeros(B.shape[:-1] + (8,))
+        V[:,4:7] = B
+        return V
+
+    return lambda V: V[:,4:7].copy(), lambda B: B @ C.T, result
+
+def _outermorphism_clifford():
+    from clifford.transformations import OutermorphismMatrix
+    prepare, run, result = _clifford(None)
+    f = OutermorphismMatrix(_rtm, clifford_layout())
+    return prepare, lambda X: [f(x) for x in X[0]], result
+
+def _outermorphism_galgebra():
+    prepare, run, result = _galgebra(None)
+    # galgebra takes the transpose of the matrix
+    f = galgebra_algebra()[0].lt(_rtm.T.tolist())
+    return prepare, lambda X: [f(x) for x in X[0]], result
+
+register('outermorphism', lambda rng, n: (_points(rng, n),),
+         array=_outermorphism_array(),
+         clifford=_outermorphism_clifford(),
+         galgebra=_outermorphism_galgebra())
+
+
+# %% [markdown]
+# A ray-transfer chain is the Cooke triplet of `lens.py`, evaluated for $n$ wavelengths, here a relative change $s$ of all three refractive indices.
+# `numpy` multiplies `np.matrix` objects one system at a time as `lens.py` does, `array` multiplies stacks of $n$ matrices, and `galgebra` composes `pga2.lt` maps as in `pga.py`.
+
+# %%
+def triplet(s, ref_sph, translate):
+    # the 11 ray transfer matrices of the Cooke triplet in lens.py
+    n1 = n3 = 1.69*s; n2 = 1.67*s
+    return [ref_sph(23.71, n1), translate(4.831), ref_sph(7331, 1/n1), translate(5.86),
+            ref_sph(-24.46, n2), translate(0.975), ref_sph(21.896, 1/n2), translate(4.822),
+            ref_sph(86.76, n3), translate(3.127), ref_sph(-20.49, 1/n3)]
+
+
+def ref_sph_stack(r, n):
+    # lens.ref_sph for an array of relative indices n
+    M = np.zeros(np.shape(n) + (3, 3))
+    M[...,0,0] = M[...,2,2] = 1
+    M[...,1,0] = (1 - n)/r/n
+    M[...,1,1] = 1/n
+    return M
+
+def translate_stack(d):
+    return np.array([[1, d, 0], [0, 1, 0], [0, 0, 1.]])
+
+
+# %%
+def _chain_numpy():
+    from lens import ref_sph, translate
+    return (lambda s: s,
+            lambda s: [reduce(lambda A, B: A*B, triplet(x, ref_sph, translate)) for x in s],
+            lambda Ms: np.array(Ms).reshape(-1, 9))
+
+def _chain_galgebra():
+    from lens import ref_sph, translate
+
+    def prepare(s):
+        ga = galgebra_algebra()[0]
+        return [[ga.lt(np.asarray(M).T.tolist()) for M in triplet(x, ref_sph, translate)] for x in s]
+
+    return (prepare,
+            lambda lts: [reduce(lambda f, g: f*g, fs) for fs in lts],
+            lambda fs: np.array([np.array(f.matrix(), dtype=float) for f in fs]).reshape(-1, 9))
+
+register('ray transfer chain', lambda rng, n: (rng.uniform(0.99, 1.01, n),),
+         array=(lambda s: s,
+                lambda s: reduce(np.matmul, triplet(s, ref_sph_stack, translate_stack)),
+                lambda Ms: Ms.reshape(-1, 9)),
+         numpy=_chain_numpy(),
+         galgebra=_chain_galgebra())
+
+
+# %% [markdown]
+# Plotting draws $n$ lines into an off-screen Agg figure of the box $[-1, 1]^2$: `clifford` one artist per line, clipped as in `add_to_axes` (`clifford-2DPGA-matplotlib.py`), `array` one `LineCollection` from `pga2array.clip_lines`.
+# The result is the drawn segments, with the end points in a fixed order.
+
+# %%
+_box = (-1, 1, -1, 1)
+
+
+def _axes():
+    fig = Figure(figsize=(4, 4))
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+    ax.axis(_box)
+    return ax
+
+
+def _segments(S):
+    S = np.array(S, dtype=float).reshape(-1, 2, 2)
+    swap = (S[:,0,0] > S[:,1,0]) | ((S[:,0,0] == S[:,1,0]) & (S[:,0,1] > S[:,1,1]))
+    S[swap] = S[swap,::-1]
+    return S.reshape(-1, 4)
+
+
+def plot_clifford(mvs):
+    ax = _axes()
+    layout = clifford_layout()
+    e0, e1, e2 = [layout.MultiVector(v) for v in np.eye(8)[1:4]]
+    xmin, xmax, ymin, ymax = _box
+    point = lambda x, y: x*(e2^e0) + y*(e0^e1) + (e1^e2)
+    corners = [point(xmin, ymin), point(xmax, ymin), point(xmax, ymax), point(xmin, ymax)]
+    edges = [-e2 + ymin*e0, -e1 + xmax*e0, e2 - ymax*e0, e1 - xmin*e0]
+    for x in mvs:
+        crossing = [np.sign((corners[j]^x).value[7]*(corners[(j+1)%4]^x).value[7]) == -1 for j in range(4)]
+        crosspoints = [x^edges[j] for j in range(4) if crossing[j]]
+        ax.plot([-j.value[5]/j.value[6] for j in crosspoints], [j.value[4]/j.value[6] for j in crosspoints], color='green')
+    ax.figure.canvas.draw()
+    return ax
+
+def plot_array(L):
+    ax = _axes()
+    ax.add_collection(LineCollection(clip_lines(L, _box)[0], color='green'))
+    ax.figure.canvas.draw()
+    return ax
+
+register('plotting', lambda rng, n: (_lines(rng, n),),
+         array=(lambda V: from_values(V, 1), plot_array, lambda ax: _segments(ax.collections[0].get_segments())),
+         clifford=(to_clifford, plot_clifford, lambda ax: _segments([l.get_xydata() for l in ax.lines])))
+
+
+# %% [markdown]
+# ## Running
+
+# %%
+sizes = (1, 10, 100, 10**3, 10**4, 10**5, 10**6)
+
+
+def timeit(func, min_time=0.05, repeat=3):
+    # best seconds per call, each of the repeat rounds running at least min_time
+    best = np.inf
+    for r in range(repeat):
+        number, start = 0, time.perf_counter()
+        while True:
+            func()
+            number += 1
+            elapsed = time.perf_counter() - start
+            if elapsed >= min_time:
+                break
+        best = min(best, elapsed/number)
+    return best
+
+
+def _estimate(measured, n):
+    # seconds for n objects from the last two (n, seconds) as a + b n, or in proportion to a single one
+    if not measured:
+        return 0.
+    if len(measured) == 1:
+        (n1, t1), = measured
+        return t1*n/n1
+    (n1, t1), (n2, t2) = measured
+    return t2 + max(t2 - t1, 0.)*(n - n2)/(n2 - n1)
+
+
+def run(ops=None, backends=None, sizes=sizes, budget=1.0, seed=0, check_size=100, tol=1e-9, min_time=0.05):
+    '''
+    times every case in ops (default all) for every backend in backends (default all)
+    returns records {op, backend, n, seconds, error}; error is the largest deviation from the first backend
+    for n <= check_size (None above), and a warning is raised when it exceeds tol
+    '''
+    records = []
+    for op in cases if ops is None else ops:
+        make, impls = cases[op]
+        names = [name for name in impls if backends is None or name in backends]
+        first = next(iter(impls))
+        stopped = set()
+        last = {}
+        for n in sizes:
+            args = make(np.random.default_rng(seed), n)
+            reference = None
+            for name in names:
+                if name in stopped or _estimate(last.get(name, []), n) > budget:
+                    stopped.add(name)
+                    continue
+                prepare, func, result = impls[name]
+                X = prepare(*args)
+                seconds = timeit(lambda: func(X), min_time)
+                error = None
+                if n <= check_size:
+                    if reference is None:
+                        ref_prepare, ref_func, ref_result = impls[first]
+                        reference = ref_result(ref_func(ref_prepare(*args)))
+                    error = float(np.abs(result(func(X)) - reference).max(initial=0.))
+                    if error > tol:
+                        warnings.warn("{} with {} differs from {} by {:.3g} for n = {}".format(op, name, first, error, n))
+                records.append({'op': op, 'backend': name, 'n': n, 'seconds': seconds, 'error': error})
+                last[name] = last.get(name, [])[-1:] + [(n, seconds)]
+    return records
+
+
+# %%
+def report(records):
+    # microseconds per object, a row per op and backend and a column per size
+    ns = sorted({r['n'] for r in records})
+    rows = {}
+    for r in records:
+        rows.setdefault((r['op'], r['backend']), {})[r['n']] = 1e6*r['seconds']/r['n']
+    lines = ['{:20} {:10}'.format('op', 'backend') + ''.join('{:>10}'.format(n) for n in ns)]
+    for (op, backend), t in rows.items():
+        lines.append('{:20} {:10}'.format(op, backend) +
+                     ''.join('{:>10.3g}'.format(t[n]) if n in t else '{:>10}'.format('-') for n in ns))
+    return '\n'.join(lines)
+
+
+# %% [markdown]
+# ## History and regressions
+# The history file is a JSON list of runs, each with the time, git commit, machine, library versions and the records.
+
+# %%
+def _commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError, NameError):
+        return None
+
+
+def load(path):
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return json.load(f)
+
+
+def save(records, path='benchmarks.json'):
+    # append a run to the history file
+    versions = {'python': platform.python_version(), 'numpy': np.__version__}
+    for name in ['clifford', 'galgebra', 'matplotlib']:
+        try:
+            versions[name] = __import__(name).__version__
+        except ImportError:
+            pass
+    history = load(path)
+    history.append({'time': time.strftime('%Y-%m-%dT%H:%M:%S'), 'commit': _commit(),
+                    'machine': platform.node(), 'versions': versions, 'results': records})
+    with open(path, 'w') as f:
+        json.dump(history, f, indent=1)
+    return path
+
+
+def compare(records, history, commit=None, threshold=1.5, floor=1e-4):
+    '''
+    timings in records slower than the baseline by more than a factor threshold
+    the baseline is the last run in history (the last one of commit if given); timings below floor seconds are too noisy to compare
+    '''
+    runs = [h for h in history if commit is None or h['commit'] == commit]
+    if not runs:
+        warnings.warn("No baseline run to compare with")
+        return []
+    old = {(r['op'], r['backend'], r['n']): r['seconds'] for r in runs[-1]['results']}
+    slower = []
+    for r in records:
+        key = r['op'], r['backend'], r['n']
+        if key in old and max(old[key], r['seconds']) > floor and r['seconds'] > threshold*old[key]:
+            slower.append(dict(r, baseline=old[key], ratio=r['seconds']/old[key]))
+    if slower:
+        warnings.warn("{} regressions against commit {}, the worst {op}/{backend}/n={n} x{ratio:.2f}".format(
+            len(slower), runs[-1]['commit'], **max(slower, key=lambda r: r['ratio'])))
+    return slower
+
+
+# %% [markdown]
+# <h4>* Play *</h4>
+# A quick run up to $10^4$ objects (the default sizes go to $10^6$ and take a few minutes).
+
+# %%
+import tempfile
+
+# %%
+records = run(sizes=(1, 10, 100, 10**4), budget=0.5, min_time=0.01)
+print(report(records))
+
+# %%
+# the largest disagreement between backends
+max(r['error'] for r in records if r['error'] is not None)
+
+# %%
+# two runs in a history file, then the second compared with the first
+path = os.path.join(tempfile.mkdtemp(), 'benchmarks.json')
+save(records, path)
+again = run(ops=['wedge', 'ray transfer chain'], backends=['array', 'numpy'], sizes=(1, 100, 10**4))
+compare(again, load(path))
+
+# %%
+# a baseline twice as fast flags every timing above the noise floor
+fast = [dict(h, results=[dict(r, seconds=r['seconds']/2) for r in h['results']]) for h in load(path)]
+len(compare(records, fast)), len(records)
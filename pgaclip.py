@@ -0,0 +1,237 @@
+# ---
+# title: Clipping segments and polygons in 2D PGA
+# jupyter:
+#   jupytext:
+#     cell_metadata_filter: all,-autoscroll,-collapsed,-scrolled,-trusted,-ExecuteTime
+#     notebook_metadata_filter: kernelspec,jupytext,-jupytext.text_representation.jupytext_version
+#     text_representation:
+#       extension: .py
+#       format_name: percent
+#       format_version: '1.3'
+#   kernelspec:
+#     display_name: Python [conda env:galgebra]
+#     language: python
+#     name: conda-env-galgebra-py
+# ---
+
+# %% [markdown]
+# `add_to_axes` finds where a line leaves the plot box from the signs of `corners[j]^x`, the orientation of the box corners relative to the line.
+# Here the same orientation products, $s = X\vee\ell$ (the dot product of a point row and a line row, conventions of `pga2array.py`), clip whole batches against any convex window, given as its sides $\ell_k$ positive on the inside (`window(vertices)`, or the output of `pgahull.intersect`).
+#
+# * The edge from $P$ to $Q$ crosses the side $\ell$ when $s_P = P\vee\ell$ and $s_Q = Q\vee\ell$ have opposite signs, at the meet of the edge with $\ell$, the homogeneous point $s_P Q - s_Q P$ (its join with $\ell$ is $s_P s_Q - s_Q s_P = 0$), a fraction $t = s_P/(s_P - s_Q)$ of the way.
+# * `clip_segments` and `clip_lines_window` (Cyrus-Beck) keep for each segment or line the interval of $t$ inside all sides, for all segments and sides at once; `clip_lines_window` is `pga2array.clip_lines` for any convex window instead of the axes box.
+# * `clip_polygons` is Sutherland-Hodgman: for one side at a time, every edge of every polygon emits its start when it is inside and the crossing when it crosses, so the new vertex arrays come from one cumulative sum. Each polygon can have its own window.
+# * `clip_general` clips against a window that need not be convex, by cutting the window into triangles (ear clipping) and clipping every polygon against every triangle in one `clip_polygons`. The result is the intersection in convex pieces, one list of pieces per polygon, and their areas add up.
+#
+# Polygons are stored flat as in `pgamesh.py`: all vertices `(n, 2)` and the number of vertices of each polygon `(P,)`, counterclockwise or not (Sutherland-Hodgman also clips concave polygons, possibly leaving zero-width bridges).
+# A polygon clipped away keeps its place with zero vertices.
+
+# %%
+import numpy as np
+from pga2array import points, join
+
+
+# %%
+def area2(V):
+    # twice the signed area of the polygon with vertices V (k, 2)
+    V = np.asarray(V, dtype=float)
+    return np.sum(V[:,0]*np.roll(V[:,1], -1) - np.roll(V[:,0], -1)*V[:,1])
+
+def window(V):
+    # sides (K, 3) of the convex polygon V (K, 2), positive on the inside
+    V = np.asarray(V, dtype=float)
+    if area2(V) < 0:
+        V = V[::-1]
+    P = points(V)
+    return join(P, np.roll(P, -1, axis=0))
+
+
+# %%
+def _interval(s0, s1, lo, hi):
+    # Cyrus-Beck: the part of [lo, hi] where (1 - t) s0 + t s1 >= 0 for all sides (last axis)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t = s0/(s0 - s1)
+    lo = np.maximum(lo, np.where(s0 < s1, t, -np.inf).max(axis=-1))
+    hi = np.minimum(hi, np.where(s0 > s1, t, np.inf).min(axis=-1))
+    # parallel to a side and outside it
+    hi = np.where(((s0 == s1) & (s0 < 0)).any(axis=-1), -np.inf, hi)
+    return lo, hi
+
+def clip_segments(S, sides):
+    '''
+    the parts of the segments S (M, 2, 2) inside the convex window sides (K, 3)
+    also returns the boolean mask of the segments that keep a part
+    '''
+    S = np.asarray(S, dtype=float).reshape(-1, 2, 2)
+    s0 = points(S[:,0]).dot(np.transpose(sides))
+    s1 = points(S[:,1]).dot(np.transpose(sides))
+    lo, hi = _interval(s0, s1, 0., 1.)
+    keep = lo <= hi
+    d = S[keep,1] - S[keep,0]
+    return np.stack([S[keep,0] + lo[keep,None]*d, S[keep,0] + hi[keep,None]*d], axis=1), keep
+
+def clip_lines_window(L, sides):
+    # the segments (M, 2, 2) of the lines L (N, 3) inside the convex window, and the mask of lines crossing it
+    L = np.asarray(L, dtype=float).reshape(-1, 3)
+    n2 = L[:,0]**2 + L[:,1]**2
+    # the foot of the perpendicular from the origin, and the direction as an ideal point
+    P = points(-L[:,2:]*L[:,:2]/n2[:,None])
+    D = np.column_stack([L[:,1], -L[:,0], np.zeros(len(L))])
+    sP, sD = P.dot(np.transpose(sides)), D.dot(np.transpose(sides))
+    lo, hi = _interval(sP, sP + sD, -np.inf, np.inf)
+    keep = (lo <= hi) & (n2 > 0)
+    seg = P[keep,None,:2] + np.stack([lo[keep], hi[keep]], axis=1)[:,:,None]*D[keep,None,:2]
+    return seg, keep
+
+
+# %%
+def clip_polygons(V, counts, sides):
+    '''
+    Sutherland-Hodgman clipping of the polygons (V (n, 2), counts (P,)) against convex windows,
+    sides (K, 3) for all polygons or (P, K, 3) for one window each
+    returns the clipped polygons (V', counts')
+    '''
+    V = np.asarray(V, dtype=float).reshape(-1, 2)
+    counts = np.asarray(counts, dtype=np.int64)
+    sides = np.asarray(sides, dtype=float)
+    for k in range(sides.shape[-2]):
+        start = np.cumsum(counts) - counts
+        pid = np.repeat(np.arange(len(counts)), counts)
+        nxt = np.arange(len(V)) + 1
+        nxt[start[counts > 0] + counts[counts > 0] - 1] = start[counts > 0]
+        side = sides[...,k,:]
+        # P v side for the points (x, y, 1)
+        if side.ndim == 2:
+            s = np.einsum('ni,ni->n', V, side[pid,:2]) + side[pid,2]
+        else:
+            s = V.dot(side[:2]) + side[2]
+        inside = s >= 0
+        cross = inside != inside[nxt]
+        emit = inside.astype(np.int64) + cross
+        at = np.cumsum(emit) - emit
+        out = np.empty((emit.sum(), 2))
+        out[at[inside]] = V[inside]
+        i = np.flatnonzero(cross)
+        j = nxt[i]
+        # the meet s_P Q - s_Q P of the edge with the side, normalized
+        out[at[i] + inside[i]] = (s[i,None]*V[j] - s[j,None]*V[i])/(s[i] - s[j])[:,None]
+        V = out
+        counts = np.bincount(pid, weights=emit, minlength=len(counts)).astype(np.int64)
+    return V, counts
+
+
+# %%
+def areas(V, counts):
+    # signed areas of the polygons (V, counts)
+    V = np.asarray(V, dtype=float).reshape(-1, 2)
+    counts = np.asarray(counts, dtype=np.int64)
+    start = np.cumsum(counts) - counts
+    pid = np.repeat(np.arange(len(counts)), counts)
+    nxt = np.arange(len(V)) + 1
+    nxt[start[counts > 0] + counts[counts > 0] - 1] = start[counts > 0]
+    return 0.5*np.bincount(pid, weights=V[:,0]*V[nxt,1] - V[nxt,0]*V[:,1], minlength=len(counts))
+
+
+# %% [markdown]
+# ## Windows that are not convex
+
+# %%
+def triangulate(W):
+    # (T, 3) vertex indices of a triangulation of the simple polygon W (k, 2) by ear clipping
+    W = np.asarray(W, dtype=float)
+    left = list(range(len(W))) if area2(W) > 0 else list(range(len(W)))[::-1]
+    tris = []
+    while len(left) > 3:
+        P = W[left]
+        a, b, c = np.roll(P, 1, axis=0), P, np.roll(P, -1, axis=0)
+        convex = (b[:,0] - a[:,0])*(c[:,1] - a[:,1]) - (b[:,1] - a[:,1])*(c[:,0] - a[:,0]) > 0
+        for i in np.flatnonzero(convex):
+            sides = window([a[i], b[i], c[i]])
+            others = np.delete(P, [(i - 1) % len(P), i, (i + 1) % len(P)], axis=0)
+            if not (points(others).dot(sides.T) > 0).all(axis=1).any():
+                break
+        else:
+            raise ValueError("The window is not a simple polygon")
+        tris.append([left[(i - 1) % len(left)], left[i], left[(i + 1) % len(left)]])
+        del left[i]
+    tris.append(left)
+    return np.array(tris)
+
+
+def clip_general(V, counts, W):
+    '''
+    intersections of the polygons (V, counts) with the polygon W (k, 2), convex or not
+    returns the convex pieces (V', counts') and, for each piece, the index of its polygon
+    '''
+    counts = np.asarray(counts, dtype=np.int64)
+    tris = triangulate(W)
+    sides = np.stack([window(np.asarray(W, dtype=float)[t]) for t in tris])
+    # every polygon against every triangle
+    P, T = len(counts), len(tris)
+    V = np.asarray(V, dtype=float).reshape(-1, 2)
+    V, pieces = clip_polygons(np.tile(V, (T, 1)), np.tile(counts, T), np.repeat(sides, P, axis=0))
+    owner = np.tile(np.arange(P), T)
+    keep = pieces > 2
+    V = V[np.repeat(keep, pieces)]
+    return V, pieces[keep], owner[keep]
+
+
+# %% [markdown]
+# <h4>* Play *</h4>
+
+# %%
+import time
+import matplotlib.pyplot as plt
+from matplotlib.collections import LineCollection, PolyCollection
+
+# %%
+# a hexagonal window, random segments and lines
+hexagon = np.column_stack([np.cos(np.arange(6)*np.pi/3), np.sin(np.arange(6)*np.pi/3)])
+sides = window(hexagon)
+rng = np.random.default_rng(0)
+S = rng.uniform(-1.5, 1.5, (200, 2, 2))
+inner, kept = clip_segments(S, sides)
+L = join(points(rng.uniform(-1, 1, (20, 2))), points(rng.uniform(-1, 1, (20, 2))))
+chords, crossing = clip_lines_window(L, sides)
+fig, ax = plt.subplots(figsize=(6,6))
+ax.set_aspect(1)
+ax.fill(*hexagon.T, facecolor='none', edgecolor='black')
+ax.add_collection(LineCollection(S, colors='lightgray', linewidths=0.5))
+ax.add_collection(LineCollection(inner, colors='blue', linewidths=0.8))
+ax.add_collection(LineCollection(chords, colors='green', linewidths=0.8))
+ax.axis((-1.6, 1.6, -1.6, 1.6));
+
+# %% [markdown]
+# Vignetting: a beam of circular cross section (a 64-gon) moved across a circular aperture stop of the same radius.
+# The transmitted fraction is the clipped area over the beam area; for two unit circles at distance $d$ the overlap is $2\arccos\frac d2 - \frac d2\sqrt{4 - d^2}$.
+
+# %%
+circle = np.column_stack([np.cos(np.linspace(0, 2*np.pi, 64, endpoint=False)), np.sin(np.linspace(0, 2*np.pi, 64, endpoint=False))])
+shift = np.linspace(0, 2.2, 12)
+beams = (circle[None] + np.column_stack([shift, np.zeros_like(shift)])[:,None]).reshape(-1, 2)
+clipped, n = clip_polygons(beams, np.full(len(shift), 64), window(circle))
+d = np.minimum(shift, 2)
+exact = (2*np.arccos(d/2) - d/2*np.sqrt(4 - d**2))/np.pi
+np.column_stack([shift, areas(clipped, n)/areas(circle, [64]), exact]).round(4)
+
+# %% [markdown]
+# The same for $10^4$ beams at random positions, and the window of an L-shaped aperture (not convex) clipping a few of them.
+
+# %%
+offsets = rng.uniform(-1.5, 1.5, (10**4, 2))
+beams = (circle[None] + offsets[:,None]).reshape(-1, 2)
+start = time.perf_counter()
+clipped, n = clip_polygons(beams, np.full(len(offsets), 64), window(circle))
+t_clip = time.perf_counter() - start
+aperture = np.array([[-1, -1], [1.5, -1], [1.5, 0], [0, 0], [0, 1.5], [-1, 1.5]])
+pieces, m, owner = clip_general(beams[:64*5], np.full(5, 64), aperture)
+# seconds, and the transmitted fractions of the first beams through the L
+t_clip, np.bincount(owner, weights=areas(pieces, m), minlength=5)/areas(circle, [64])
+
+# %%
+fig, ax = plt.subplots(figsize=(6,6))
+ax.set_aspect(1)
+ax.fill(*aperture.T, facecolor='none', edgecolor='black')
+ax.add_collection(PolyCollection(np.split(beams[:64*5], 5), facecolors='none', edgecolors='gray'))
+ax.add_collection(PolyCollection(np.split(pieces, np.cumsum(m)[:-1]), facecolors='C0', alpha=0.4, edgecolors='C0'))
+ax.axis((-2.5, 3, -2.5, 3));
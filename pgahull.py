@@ -0,0 +1,272 @@
+# ---
+# title: Convex hulls and half-plane intersections in 2D PGA
+# jupyter:
+#   jupytext:
+#     cell_metadata_filter: all,-autoscroll,-collapsed,-scrolled,-trusted,-ExecuteTime
+#     notebook_metadata_filter: kernelspec,jupytext,-jupytext.text_representation.jupytext_version
+#     text_representation:
+#       extension: .py
+#       format_name: percent
+#       format_version: '1.3'
+#   kernelspec:
+#     display_name: Python [conda env:galgebra]
+#     language: python
+#     name: conda-env-galgebra-py
+# ---
+
+# %% [markdown]
+# An oriented line `(a, b, c)` (conventions of `pga2array.py`) is the half-plane $ax + by + c \geq 0$, where $X \vee \ell$ is positive for normalized points $X$.
+# The join of two points $P\vee Q$ is positive on the left of the way from $P$ to $Q$, so the sides of a counterclockwise polygon are positive on the inside (as in `pgamesh.py`), and `add_to_axes` is the intersection of the four half-planes of the axes box.
+#
+# ## Convex hull
+# `hull(X)` first drops the points strictly inside the hull of a sample, the farthest point from the centroid in each of $\sqrt N$ angular bins (each point is tested against one side, the one of its sector), which leaves the points near the boundary.
+# The rest go through Andrew's monotone chain: sorted by $x$, a lower and an upper chain are built by popping the last vertex while it does not turn left, $O(N\log N)$ whatever the input.
+# The chain is a Python loop, so the time is in the sort and the filter unless most points are on the hull.
+# The hull is returned as vertex indices in counterclockwise order and as its sides $P_k \vee P_{k+1}$, positive on the inside.
+#
+# ## Half-plane intersection
+# This is the dual problem.
+# Given a point $O$ strictly inside all half-planes, take it as the origin; then every $c > 0$ and the half-plane $\mathbf{n}\cdot\mathbf{x} + c \geq 0$ is $\mathbf{q}\cdot\mathbf{x} \leq 1$ with the point $\mathbf{q} = -\mathbf{n}/c$.
+# The intersection is the polar of the hull of all $\mathbf{q}$ and the origin, with a side for each hull vertex $\mathbf{q}$ in the same counterclockwise order and a corner for each hull side, the meet $\ell_i\wedge\ell_j$ of consecutive lines.
+# Parallel lines of the same orientation have their $\mathbf{q}$ on a ray from the origin, so only the most restrictive one is on the hull.
+# When all lines are parallel the $\mathbf{q}$ are on one line through the origin and there is no hull: the intersection is the nearest line of each orientation, a half-plane or a strip, with ideal corners only.
+# When the origin itself is a hull vertex the intersection is unbounded, and the two hull sides at the origin are ideal corners, the directions $\ell\wedge e_0$ of the first and the last side.
+# Ideal lines $c e_0$ are all of the plane or nothing, depending on the sign of $c$; with ideal lines only (or none) that keep everything the intersection is the whole plane, with no sides and no corners.
+#
+# Without a point $O$, `intersect` finds the center of the largest disk (up to radius 1) in the intersection with `scipy.optimize.linprog`, on a subset of the half-planes that grows by the violated ones until there are none.
+
+# %%
+import warnings
+import numpy as np
+from math import hypot
+from pga2array import points, join, meet, normalize_lines
+
+
+# %%
+def _chain(q, keep=-1, tol=1e-12):
+    # counterclockwise indices of the hull vertices of q (N, 2), by Andrew's monotone chain
+    # collinear vertices are dropped, except keep, which only goes when strictly reflex
+    order = np.lexsort((q[:,1], q[:,0]))
+    x, y = q[order,0].tolist(), q[order,1].tolist()
+    keep = np.flatnonzero(order == keep)[0] if keep >= 0 else -1
+    def half(sequence):
+        hx, hy, h = [], [], []
+        for k in sequence:
+            px, py = x[k], y[k]
+            while len(h) > 1:
+                ux, uy = hx[-1] - hx[-2], hy[-1] - hy[-2]
+                vx, vy = px - hx[-1], py - hy[-1]
+                turn = ux*vy - uy*vx
+                # collinear up to tol: the sine of the turn
+                scale = tol*hypot(ux, uy)*hypot(vx, vy)
+                if turn > scale or (turn >= -scale and h[-1] == keep):
+                    break
+                hx.pop(), hy.pop(), h.pop()
+            hx.append(px), hy.append(py), h.append(k)
+        return h
+    lower, upper = half(range(len(x))), half(range(len(x) - 1, -1, -1))
+    return order[lower[:-1] + upper[:-1] if len(lower) > 1 else lower]
+
+
+def _prefilter(X, tol=1e-12):
+    # points of X (N, 2) not strictly inside the hull of the farthest points from the centroid in angular bins
+    d = X - X.mean(axis=0)
+    bins = max(8, int(np.sqrt(len(X))))
+    b = np.minimum(((np.arctan2(d[:,1], d[:,0]) + np.pi)*(bins/(2*np.pi))).astype(np.int64), bins - 1)
+    r2 = d[:,0]**2 + d[:,1]**2
+    far = np.full(bins, -1.)
+    np.maximum.at(far, b, r2)
+    sample = np.flatnonzero(r2 == far[b])
+    corners = X[sample[_chain(X[sample])]]
+    if len(corners) < 3:
+        return np.arange(len(X))
+    # each point against the side of its sector about the center of the corners
+    center = corners.mean(axis=0)
+    a = np.arctan2(corners[:,1] - center[1], corners[:,0] - center[0])
+    first = a.argmin()
+    corners, a = np.roll(corners, -first, axis=0), np.roll(a, -first)
+    sides = normalize_lines(join(points(corners), points(np.roll(corners, -1, axis=0))))
+    d = X - center
+    k = (np.searchsorted(a, np.arctan2(d[:,1], d[:,0]), side='right') - 1) % len(corners)
+    s = np.einsum('ni,ni->n', points(X), sides[k])
+    return np.flatnonzero(s <= tol*np.abs(X).max())
+
+
+# %%
+def hull(X):
+    '''
+    convex hull of the points X, rows (x, y) or homogeneous (x, y, w) with w != 0
+    returns the counterclockwise vertex indices into X and the sides (K, 3), positive on the inside
+    '''
+    X = np.asarray(X, dtype=float)
+    if X.shape[-1] == 3:
+        X = X[...,:2]/X[...,2:]
+    X = X.reshape(-1, 2)
+    candidates = _prefilter(X) if len(X) > 64 else np.arange(len(X))
+    idx = candidates[_chain(X[candidates])]
+    if len(idx) < 3:
+        # all points on a line: the two ends
+        if len(X) > 1:
+            axis = X[candidates].std(axis=0).argmax()
+            idx = np.unique([candidates[np.argmin(X[candidates,axis])], candidates[np.argmax(X[candidates,axis])]])
+        warnings.warn("Degenerate hull of {} point(s)".format(len(idx)))
+    P = points(X[idx])
+    return idx, join(P, np.roll(P, -1, axis=0))
+
+
+# %%
+def interior(L, batch=1000):
+    # a point (x, y) inside all half-planes L, the center of the largest disk up to radius 1, and that radius
+    from scipy.optimize import linprog
+    L = normalize_lines(np.asarray(L, dtype=float).reshape(-1, 3))
+    # maximize t subject to a x + b y + c >= t, on a subset of the half-planes
+    # grown by the most violated ones until the solution satisfies all of them
+    subset = np.unique(np.linspace(0, len(L) - 1, min(batch, len(L))).astype(np.int64))
+    while True:
+        res = linprog([0, 0, -1], A_ub=np.column_stack([-L[subset,:2], np.ones(len(subset))]), b_ub=L[subset,2],
+                      bounds=[(None, None), (None, None), (None, 1)], method='highs')
+        if res.status != 0:
+            return None, 0.
+        slack = L.dot(np.r_[res.x[:2], 1.]) - res.x[2]
+        violated = np.flatnonzero(slack < -1e-9)
+        if len(violated) == 0:
+            return res.x[:2], res.x[2]
+        if len(violated) > batch:
+            violated = violated[np.argpartition(slack[violated], batch)[:batch]]
+        subset = np.union1d(subset, violated)
+
+
+def intersect(L, inside=None, tol=1e-12):
+    '''
+    intersection of the half-planes L (N, 3), a x + b y + c >= 0
+    inside: a point (x, y) strictly inside all of them, found with interior() if not given
+    returns the indices of the sides in counterclockwise order and the corners (K, 3) as homogeneous points:
+    bounded, corner k is the meet of sides k and k + 1 (cyclically);
+    unbounded, there is one corner more, the first and the last are ideal points
+    an empty intersection gives empty arrays and a warning, and so does the whole plane (no real half-plane)
+    '''
+    L = np.asarray(L, dtype=float).reshape(-1, 3)
+    norm = np.hypot(L[:,0], L[:,1])
+    ideal = norm <= tol*np.abs(L[:,2])
+    empty = (np.zeros(0, dtype=np.int64), np.zeros((0, 3)))
+    if (L[ideal,2] < 0).any():
+        warnings.warn("Empty intersection: an ideal half-plane excludes everything")
+        return empty
+    real = np.flatnonzero(~ideal)
+    if len(real) == 0:
+        warnings.warn("The intersection is the whole plane: no half-plane other than ideal ones")
+        return empty
+    N = L[real]/norm[real,None]
+    if inside is None:
+        inside, radius = interior(N)
+        if inside is None or radius <= tol:
+            warnings.warn("Empty or degenerate intersection")
+            return empty
+    c = N[:,2] + N[:,:2].dot(inside)
+    if (c <= 0).any():
+        raise ValueError("The point {} is not strictly inside all half-planes".format(inside))
+    if (np.abs(N[:,0]*N[0,1] - N[:,1]*N[0,0]) <= tol).all():
+        # all lines parallel, the q on a line through the origin: the nearest line of each orientation,
+        # a half-plane or a strip, between ideal corners (the corner of a strip is the common direction)
+        s = N[:,:2].dot(N[0,:2]) > 0
+        active = np.array([real[side][np.argmin(c[side])] for side in (s, ~s) if side.any()])
+        A = L[active]
+        return active, np.concatenate([[[-A[0,1], A[0,0], 0.]], np.column_stack([A[:,1], -A[:,0], np.zeros(len(A))])])
+    q = np.concatenate([-N[:,:2]/c[:,None], [[0., 0.]]])
+    origin = len(real)
+    candidates = np.union1d(_prefilter(q), [origin]) if len(q) > 64 else np.arange(len(q))
+    vertices = candidates[_chain(q[candidates], keep=np.flatnonzero(candidates == origin)[0])]
+    if origin not in vertices:
+        active = real[vertices]
+        return active, _finite(meet(L[active], np.roll(L[active], -1, axis=0)))
+    # unbounded: start after the origin
+    k = np.flatnonzero(vertices == origin)[0]
+    active = real[np.roll(vertices, -k-1)[:-1]]
+    first, last = L[active[0]], L[active[-1]]
+    corners = _finite(meet(L[active[:-1]], L[active[1:]]))
+    return active, np.concatenate([[[-first[1], first[0], 0.]], corners, [[last[1], -last[0], 0.]]])
+
+
+def _finite(P):
+    # w = +1 for the corners, leaving ideal ones (w = 0) as they are
+    w = np.abs(P[:,2:])
+    return P/np.where(w > 0, w, 1.)
+
+
+# %% [markdown]
+# <h4>* Play *</h4>
+
+# %%
+import time
+import matplotlib.pyplot as plt
+from pga2array import euclidean, transform
+
+# %%
+# the unit square as four half-planes, plus a redundant one and a parallel copy further out
+square = np.array([[1, 0, 0], [0, 1, 0], [-1, 0, 1], [0, -1, 1], [1, 1, 5], [2, 0, 1]])
+intersect(square)
+
+# %%
+# a wedge with one redundant half-plane: unbounded, between two ideal corners
+intersect([[1, 0, 0], [0, 1, 0], [1, 1, 1]])
+
+# %%
+# empty intersections
+intersect([[1, 0, 0], [-1, 0, -1]]), intersect([[1, 0, 0], [0, 0, -1]])
+
+# %%
+# the whole plane
+intersect([[0, 0, 1]])
+
+# %%
+# parallel lines only: a strip, the same with redundant copies, and a half-plane
+(intersect([[0, 1, 0], [0, -1, 1]]), intersect([[0, 1, 0], [0, 1, 1], [0, 1, -1], [0, -1, 5]]),
+ intersect([[0, 1, 0], [0, 1, 0.5]], inside=(0.5, 0.5)))
+
+# %% [markdown]
+# $10^6$ half-planes, tangent to the unit circle at random angles and moved a little outwards, so that a few thousand of them are sides; the same with the known inside point; and the hull of $10^6$ random points.
+
+# %%
+rng = np.random.default_rng(0)
+n = 10**6
+angle = rng.uniform(0, 2*np.pi, n)
+H = np.column_stack([-np.cos(angle), -np.sin(angle), 1 + rng.exponential(0.01, n)])
+times = {}
+start = time.perf_counter()
+active, corners = intersect(H)
+times['intersect'] = time.perf_counter() - start
+start = time.perf_counter()
+intersect(H, inside=(0, 0))
+times['intersect with inside'] = time.perf_counter() - start
+X = rng.normal(size=(n, 2))
+start = time.perf_counter()
+idx, sides = hull(X)
+times['hull'] = time.perf_counter() - start
+# the corners are inside the first 1000 half-planes, and all points inside all sides
+times, len(active), (corners.dot(H[:1000].T) >= -1e-9).all(), len(idx), (points(X).dot(sides.T) >= -1e-9).all()
+
+# %% [markdown]
+# Inputs that the sample does not thin out: $10^5$ points on the unit circle with 32 more at radius 1.01 (the circle is inside their hull, but no point of it is reflex between its neighbours), its dual, and $10^5$ points that are all on the hull.
+
+# %%
+a = np.linspace(0, 2*np.pi, 10**5, endpoint=False)
+b = np.linspace(0, 2*np.pi, 32, endpoint=False) + 0.01
+ring = np.concatenate([np.column_stack([np.cos(a), np.sin(a)]), 1.01*np.column_stack([np.cos(b), np.sin(b)])])
+hard = {}
+start = time.perf_counter()
+ring_idx, _ = hull(ring)
+hard['hull, circle and 32 points'] = time.perf_counter() - start
+start = time.perf_counter()
+ring_active, _ = intersect(np.column_stack([-ring, np.ones(len(ring))]), inside=(0, 0))
+hard['intersect, its dual'] = time.perf_counter() - start
+start = time.perf_counter()
+circle_idx, _ = hull(ring[:10**5])
+hard['hull, circle only'] = time.perf_counter() - start
+hard, len(ring_idx), len(ring_active), len(circle_idx)
+
+# %%
+fig, ax = plt.subplots(figsize=(6,6))
+ax.set_aspect(1)
+ax.plot(*X[:2000].T, '.', markersize=1, color='gray')
+ax.fill(*X[idx].T, facecolor='none', edgecolor='blue')
+ax.fill(*corners[:,:2].T, facecolor='none', edgecolor='green')
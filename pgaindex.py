@@ -0,0 +1,299 @@
+# ---
+# title: Nearest lines in 2D and 3D PGA
+# jupyter:
+#   jupytext:
+#     cell_metadata_filter: all,-autoscroll,-collapsed,-scrolled,-trusted,-ExecuteTime
+#     notebook_metadata_filter: kernelspec,jupytext,-jupytext.text_representation.jupytext_version
+#     text_representation:
+#       extension: .py
+#       format_name: percent
+#       format_version: '1.3'
+#   kernelspec:
+#     display_name: Python [conda env:galgebra]
+#     language: python
+#     name: conda-env-galgebra-py
+# ---
+
+# %% [markdown]
+# A normalized 2D line $\ell = a e_1 + b e_2 + c e_0$ has the direction (normal) $\mathbf{n} = (a, b)$ and $|c|$ is its distance from the origin (`PGA Gallery.py`), so the distance of the point $\mathbf{p}$ to it is the single inner product $|\mathbf{p}\cdot\mathbf{n} + c|$.
+# For a normalized 3D line with direction $\mathbf{d}$ and moment $\mathbf{m}$ (conventions of `pga3array.py`) the distance is $|\mathbf{p}\times\mathbf{d} - \mathbf{m}|$.
+#
+# Both are small as long as the direction is close to a fixed $\mathbf{n}_0$ (or $\mathbf{d}_0$): with $\delta \geq |\mathbf{n} - \mathbf{n}_0|$,
+# $$|c + \mathbf{p}\cdot\mathbf{n}_0| \leq \text{distance} + |\mathbf{p}|\,\delta, \qquad |\mathbf{m}\cdot\mathbf{u} - (\mathbf{p}\times\mathbf{d}_0)\cdot\mathbf{u}| \leq \text{distance} + |\mathbf{p}|\,\delta$$
+# for a unit $\mathbf{u}$.
+# So the lines are binned by direction (angles of the normal in 2D, cells of a cube map of the direction in 3D) and sorted by the offset $c$ (or $\mathbf{m}\cdot\mathbf{u}$) in each bin.
+# The lines within $r$ of a point are then, in each bin, a contiguous range of offsets found by binary search, and only these candidates get the exact distance.
+# $\delta$ is measured per bin when the index is built, and coordinates are taken about the center of the lines to keep $|\mathbf{p}|$ small.
+#
+# With about $\sqrt N$ bins in 2D ($N^{2/3}$ in 3D) a query costs a binary search per bin plus the candidates, instead of all $N$ lines.
+# The queries work on batches of points (rows of Euclidean coordinates) and return pairs `(query, line)` like a sparse matrix:
+# * `within(X, r)`: the lines at distance at most `r` from each point,
+# * `nearest(X, k)`: the `k` nearest lines of each point, by `within` with a growing radius,
+# * `crossing(boxes)`: the lines entering axis-aligned boxes `(xmin, xmax, ymin, ymax[, zmin, zmax])`, as the box edges in `add_to_axes`.
+
+# %%
+import numpy as np
+from pga2array import normalize_lines
+from pga3array import force_vectors, moments
+
+
+# %%
+class LineIndex:
+    '''
+    normalized lines binned by direction, each bin sorted by the offsets of its lines
+    LineIndex2D and LineIndex3D provide the bins, offsets and exact distances
+    '''
+    codim = 1  # dimension of the space of offsets, for the first radius of nearest()
+
+    def _build(self, bins, nbins, value, directions, centers):
+        order = np.lexsort((value, bins))
+        start = np.searchsorted(bins[order], np.arange(nbins + 1))
+        delta = np.zeros(nbins)
+        np.maximum.at(delta, bins, np.linalg.norm(directions - centers[bins], axis=1))
+        self.bins = np.flatnonzero(np.diff(start))  # the nonempty bins
+        self.delta = delta[self.bins]
+        self.order = order
+        # one sorted key for all bins: bin*span + offset, with a gap between bins
+        self.vmin = value.min()
+        self.vrange = value.max() - self.vmin
+        self.span = 2*self.vrange + 1.
+        self.keys = bins[order]*self.span + (value[order] - self.vmin)
+
+    def __len__(self):
+        return len(self.order)
+
+    def _candidates(self, target, margin):
+        # pairs (query, line) with offsets within margin of target, both (Q, bins)
+        b = self.bins*self.span
+        pad = 1e-9*self.span
+        lo = b + np.clip(target - margin - self.vmin - pad, 0., self.vrange)
+        hi = b + np.clip(target + margin - self.vmin + pad, 0., self.vrange)
+        first = np.searchsorted(self.keys, lo, side='left').ravel()
+        n = np.searchsorted(self.keys, hi, side='right').ravel() - first
+        q = np.repeat(np.repeat(np.arange(len(target)), len(self.bins)), n)
+        k = np.repeat(first, n) + np.arange(n.sum()) - np.repeat(np.cumsum(n) - n, n)
+        return q, self.order[k]
+
+    def _within(self, x, r, chunk):
+        # pairs (query, line) and distances, for points x relative to the origin of the index
+        qs, ls, ds = [], [], []
+        for s in range(0, len(x), chunk):
+            xs, rs = x[s:s+chunk], r[s:s+chunk]
+            margin = rs[:,None] + np.linalg.norm(xs, axis=1)[:,None]*self.delta
+            q, i = self._candidates(self._targets(xs), margin)
+            d = self._distance(xs[q], i)
+            keep = d <= rs[q]
+            qs.append(s + q[keep])
+            ls.append(i[keep])
+            ds.append(d[keep])
+        return np.concatenate(qs), np.concatenate(ls), np.concatenate(ds)
+
+    def within(self, X, r, chunk=None):
+        '''
+        lines within distance r (scalar or per point) of the points X (M, dim)
+        returns the arrays query, line, distance of all pairs, ordered by query
+        '''
+        x = np.asarray(X, dtype=float).reshape(-1, self.dim) - self.origin
+        r = np.broadcast_to(np.asarray(r, dtype=float), len(x))
+        # chunks of queries keep the (queries, bins) arrays to a few million entries
+        chunk = chunk or max(1, 4*10**6//len(self.bins))
+        return self._within(x, r, chunk)
+
+    def nearest(self, X, k=1):
+        # (M, k) indices and distances of the k nearest lines of each point, nearest first
+        if k > len(self):
+            raise ValueError("Only {} lines, not k = {}".format(len(self), k))
+        x = np.asarray(X, dtype=float).reshape(-1, self.dim) - self.origin
+        idx = np.empty((len(x), k), dtype=np.int64)
+        dist = np.empty((len(x), k))
+        # radius expected to hold about 2k lines, doubled until it holds k
+        r = np.full(len(x), max(self.vrange*(k/len(self))**(1/self.codim), 1e-12))
+        todo = np.arange(len(x))
+        while len(todo):
+            q, i, d = self._within(x[todo], r[todo], max(1, 4*10**6//len(self.bins)))
+            counts = np.bincount(q, minlength=len(todo))
+            order = np.lexsort((d, q))
+            q, i, d = q[order], i[order], d[order]
+            rank = np.arange(len(q)) - np.repeat(np.cumsum(counts) - counts, counts)
+            done = counts >= k
+            keep = done[q] & (rank < k)
+            idx[todo[done]] = i[keep].reshape(-1, k)
+            dist[todo[done]] = d[keep].reshape(-1, k)
+            todo = todo[~done]
+            r[todo] *= 2
+        return idx, dist
+
+    def crossing(self, boxes):
+        # pairs (box, line) of lines entering the boxes (M, 2 dim), ordered by box
+        boxes = np.asarray(boxes, dtype=float).reshape(-1, 2*self.dim)
+        lo, hi = boxes[:,0::2], boxes[:,1::2]
+        center, half = 0.5*(lo + hi), 0.5*(hi - lo)
+        q, i, d = self.within(center, np.linalg.norm(half, axis=1))
+        keep = self._crosses(center[q] - self.origin, half[q], i, d)
+        return q[keep], i[keep]
+
+
+# %% [markdown]
+# ## 2D lines
+# Lines are rows `(a, b, c)` (conventions of `pga2array.py`), made normalized with the normal angle in $[0, \pi)$, binned in `bins` equal angles.
+# Ideal lines have no direction and are refused.
+
+# %%
+class LineIndex2D(LineIndex):
+    dim = 2
+
+    def __init__(self, L, bins=None):
+        L = np.asarray(L, dtype=float).reshape(-1, 3)
+        ideal = np.flatnonzero(np.hypot(L[:,0], L[:,1]) == 0)
+        if len(ideal):
+            raise ValueError("Ideal lines (a = b = 0) have no direction to bin: rows {}".format(ideal[:10]))
+        L = normalize_lines(L)
+        # L and -L are the same line
+        L = np.where(((L[:,1] < 0) | ((L[:,1] == 0) & (L[:,0] < 0)))[:,None], -L, L)
+        self.lines = L
+        self.n = L[:,:2]
+        # the mean of the feet of the perpendiculars from the origin
+        self.origin = (-L[:,2:]*self.n).mean(axis=0)
+        self.c = L[:,2] + self.n.dot(self.origin)
+        nbins = bins or max(1, int(np.sqrt(len(L))))
+        theta = np.arctan2(self.n[:,1], self.n[:,0])
+        b = np.minimum((theta/np.pi*nbins).astype(np.int64), nbins - 1)
+        angles = (np.arange(nbins) + 0.5)*np.pi/nbins
+        centers = np.column_stack([np.cos(angles), np.sin(angles)])
+        self._build(b, nbins, self.c, self.n, centers)
+        self.normals = centers[self.bins]
+
+    def _targets(self, x):
+        return -x.dot(self.normals.T)
+
+    def _distance(self, x, i):
+        # |X v l| for normalized X and l
+        return np.abs(np.einsum('ni,ni->n', x, self.n[i]) + self.c[i])
+
+    def _crosses(self, x, half, i, d):
+        # the box center is within |a| hx + |b| hy of the line
+        return d <= np.einsum('ni,ni->n', np.abs(self.n[i]), half)
+
+
+# %% [markdown]
+# ## 3D lines
+# Lines are rows of bivector coefficients `(e01, e02, e03, e12, e13, e23)` (conventions of `pga3array.py`), made normalized with the largest component of the direction positive (ideal lines, with a zero direction, are refused).
+# The directions are binned on the three positive faces of a cube map, `grid` $\times$ `grid` cells each; the offset in a bin is the moment along an axis $\mathbf{u}$ perpendicular to the center direction of the bin.
+
+# %%
+class LineIndex3D(LineIndex):
+    dim = 3
+    codim = 2
+
+    def __init__(self, L, grid=None):
+        L = np.asarray(L, dtype=float).reshape(-1, 6)
+        d, m = force_vectors(L), moments(L)
+        scale = np.linalg.norm(d, axis=1, keepdims=True)
+        ideal = np.flatnonzero(scale[:,0] == 0)
+        if len(ideal):
+            raise ValueError("Ideal lines (zero direction) have no direction to bin: rows {}".format(ideal[:10]))
+        face = np.argmax(np.abs(d), axis=1)
+        scale = scale*np.sign(d[np.arange(len(d)), face])[:,None]
+        self.lines = L/scale
+        self.d, m = d/scale, m/scale
+        self.origin = np.cross(self.d, m).mean(axis=0)
+        self.m = m - np.cross(self.origin, self.d)
+        G = grid or max(1, int(round((len(L)/6)**(1/3))))
+        uv = np.stack([self.d[np.arange(len(d)), (face + k) % 3] for k in (1, 2)], axis=1)/self.d[np.arange(len(d)), face][:,None]
+        ij = np.minimum(((uv + 1)/2*G).astype(np.int64), G - 1)
+        b = (face*G + ij[:,0])*G + ij[:,1]
+        # center directions and offset axes of all 3 G^2 bins
+        f, i, j = np.unravel_index(np.arange(3*G*G), (3, G, G))
+        centers = np.zeros((3*G*G, 3))
+        centers[np.arange(3*G*G), f] = 1.
+        centers[np.arange(3*G*G), (f + 1) % 3] = -1 + (i + 0.5)*2/G
+        centers[np.arange(3*G*G), (f + 2) % 3] = -1 + (j + 0.5)*2/G
+        centers /= np.linalg.norm(centers, axis=1, keepdims=True)
+        axes = np.cross(centers, np.eye(3)[(f + 1) % 3])
+        axes /= np.linalg.norm(axes, axis=1, keepdims=True)
+        self._build(b, 3*G*G, np.einsum('ni,ni->n', self.m, axes[b]), self.d, centers)
+        # (p x d0).u = p.(d0 x u)
+        self.normals = np.cross(centers, axes)[self.bins]
+
+    def _targets(self, x):
+        return x.dot(self.normals.T)
+
+    def _distance(self, x, i):
+        return np.linalg.norm(np.cross(x, self.d[i]) - self.m[i], axis=1)
+
+    def _crosses(self, x, half, i, d):
+        # slab test on the parameter along the line, from its foot relative to the box center
+        D = self.d[i]
+        foot = np.cross(D, self.m[i]) - x
+        lo = np.full(len(i), -np.inf)
+        hi = np.full(len(i), np.inf)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            for k in range(3):
+                t0 = (-half[:,k] - foot[:,k])/D[:,k]
+                t1 = (half[:,k] - foot[:,k])/D[:,k]
+                parallel = D[:,k] == 0
+                lo = np.where(parallel, lo, np.maximum(lo, np.minimum(t0, t1)))
+                hi = np.where(parallel, hi, np.minimum(hi, np.maximum(t0, t1)))
+                hi = np.where(parallel & (np.abs(foot[:,k]) > half[:,k]), -np.inf, hi)
+        return lo <= hi
+
+
+# %% [markdown]
+# <h4>* Play *</h4>
+
+# %%
+import time
+from pga2array import points, join, clip_lines
+from pga3array import join_lines
+
+# %% [markdown]
+# $10^5$ random lines through the square $[-10, 10]^2$ and $10^4$ query points, checked against the brute-force distances of all pairs.
+
+# %%
+rng = np.random.default_rng(0)
+L = join(points(rng.uniform(-10, 10, (10**5, 2))), points(rng.uniform(-10, 10, (10**5, 2))))
+X = rng.uniform(-10, 10, (10**4, 2))
+start = time.perf_counter()
+index = LineIndex2D(L)
+t_build = time.perf_counter() - start
+start = time.perf_counter()
+idx, dist = index.nearest(X, k=5)
+t_nearest = time.perf_counter() - start
+start = time.perf_counter()
+q, i, d = index.within(X, 0.01)
+t_within = time.perf_counter() - start
+# brute force for the first 200 points
+N = normalize_lines(L)
+start = time.perf_counter()
+brute = np.abs(points(X[:200]).dot(N.T))
+t_brute = (time.perf_counter() - start)*len(X)/200
+t_build, t_nearest, t_within, t_brute, \
+np.abs(dist[:200] - np.sort(brute, axis=1)[:,:5]).max(), (q < 200).sum() == (brute <= 0.01).sum()
+
+# %%
+# the lines of a small view, then clipped to it for drawing
+box = (2., 3., -1., 0.5)
+view, visible = index.crossing([box])
+len(visible), len(clip_lines(L[visible], box)[0]), clip_lines(L, box)[1].sum()
+
+# %% [markdown]
+# $10^5$ random 3D lines through the cube $[-10, 10]^3$.
+
+# %%
+L3 = join_lines(rng.uniform(-10, 10, (10**5, 3)), rng.uniform(-10, 10, (10**5, 3)))
+X3 = rng.uniform(-10, 10, (1000, 3))
+start = time.perf_counter()
+index3 = LineIndex3D(L3)
+t_build = time.perf_counter() - start
+start = time.perf_counter()
+idx3, dist3 = index3.nearest(X3, k=5)
+t_nearest = time.perf_counter() - start
+brute3 = np.linalg.norm(np.cross(X3[:100,None,:], force_vectors(L3)) - moments(L3), axis=2)
+t_build, t_nearest, np.abs(dist3[:100] - np.sort(brute3, axis=1)[:,:5]).max()
+
+# %%
+# lines entering a box, against the same slab test on all lines
+box3 = (0, 1, 0, 1, 0, 1)
+boxes, entering = index3.crossing([box3])
+everything = index3._crosses(np.full((len(L3), 3), 0.5) - index3.origin, np.full((len(L3), 3), 0.5), np.arange(len(L3)), None)
+np.array_equal(np.sort(entering), np.flatnonzero(everything))
@@ -0,0 +1,150 @@
+# ---
+# title: Level of detail for large 2D PGA scenes
+# jupyter:
+#   jupytext:
+#     cell_metadata_filter: all,-autoscroll,-collapsed,-scrolled,-trusted,-ExecuteTime
+#     notebook_metadata_filter: kernelspec,jupytext,-jupytext.text_representation.jupytext_version
+#     text_representation:
+#       extension: .py
+#       format_name: percent
+#       format_version: '1.3'
+#   kernelspec:
+#     display_name: Python [conda env:galgebra]
+#     language: python
+#     name: conda-env-galgebra-py
+# ---
+
+# %% [markdown]
+# Drawing $10^5$ rays one artist at a time (`add_to_axes`) is slow and the picture is a solid smear anyway.
+# Past a certain number of objects on screen we draw densities instead:
+# * points are binned into a 2D histogram with about one bin per screen pixel,
+# * lines are binned into a Hough accumulator over $(\theta, c)$, and each occupied bin is drawn once, weighted by its count.
+#
+# As in `PGA Gallery.py`, a normalized line $\ell = a e_1 + b e_2 + c e_0$ has $a = -\sin\theta$, $b = \cos\theta$, where $\theta$ is the angle with the $x$-axis and $|c|$ is the distance from the origin.
+# Taking $\theta\in[0,\pi)$ (flipping the sign of $\ell$ if needed) every line has one $(\theta, c)$, and only $|c|$ up to the farthest corner of the axes box can be seen.
+# The cost of drawing the accumulator depends on the number of bins, not the number of lines.
+#
+# `draw_points` and `draw_lines` count the objects inside the axes box and switch to the density mode when there are more than `max_objects`; by default that is one object per 100 screen pixels of the axes, so a small plot switches sooner than a large one.
+# Points and lines follow the row conventions of `pga2array.py`.
+
+# %%
+import numpy as np
+import matplotlib.pyplot as plt
+from matplotlib.colors import LogNorm
+from matplotlib.collections import LineCollection
+from pga2array import normalize_lines, clip_lines, raster_lines, finite_points
+
+
+# %%
+def hough(L, box, bins=(180, 200)):
+    '''
+    (theta, c) accumulator of the lines L (N, 3) that can cross box = (xmin, xmax, ymin, ymax)
+    returns counts (n_theta, n_c) and the bin edges of theta and c
+    '''
+    L = normalize_lines(L)
+    theta = np.arctan2(-L[:,0], L[:,1])
+    flip = theta < 0
+    theta = np.where(flip, theta + np.pi, theta) % np.pi
+    c = np.where(flip, -L[:,2], L[:,2])
+    xmin, xmax, ymin, ymax = box
+    R = np.hypot(max(abs(xmin), abs(xmax)), max(abs(ymin), abs(ymax)))
+    return np.histogram2d(theta, c, bins=bins, range=[[0, np.pi], [-R, R]])
+
+
+# %%
+def hough_lines(theta, c):
+    # normalized lines with angle theta and offset c
+    theta, c = np.broadcast_arrays(theta, c)
+    return np.stack([-np.sin(theta), np.cos(theta), c], axis=-1)
+
+
+# %%
+def _pixels(ax):
+    bbox = ax.get_window_extent()
+    return max(int(bbox.height), 1), max(int(bbox.width), 1)
+
+
+def _box(ax):
+    (xmin, xmax), (ymin, ymax) = ax.get_xlim(), ax.get_ylim()
+    return xmin, xmax, ymin, ymax
+
+
+def _dense(n, ax, max_objects):
+    # density mode when there are more objects on screen than max_objects (default one per 100 pixels)
+    if max_objects is None:
+        H, W = _pixels(ax)
+        max_objects = H*W//100
+    return n > max_objects
+
+
+# %%
+def draw_points(P, ax=None, max_objects=None, cmap='Blues', color='blue', **kwargs):
+    # points (N, 3) as markers, or as a 2D histogram image when there are many on screen
+    # kwargs style the markers
+    ax = plt.gca() if ax is None else ax
+    box = _box(ax)
+    xy = finite_points(P)
+    xy = xy[(xy[:,0] >= box[0]) & (xy[:,0] <= box[1]) & (xy[:,1] >= box[2]) & (xy[:,1] <= box[3])]
+    if not _dense(len(xy), ax, max_objects):
+        artist, = ax.plot(xy[:,0], xy[:,1], linestyle='', marker='o', color=color, **kwargs)
+        return artist
+    H, W = _pixels(ax)
+    counts, ye, xe = np.histogram2d(xy[:,1], xy[:,0], bins=(H, W), range=[box[2:], box[:2]])
+    artist = ax.imshow(np.ma.masked_equal(counts, 0), extent=box, origin='lower', cmap=cmap,
+                       norm=LogNorm(), interpolation='nearest', aspect=ax.get_aspect())
+    ax.axis(box)
+    return artist
+
+
+# %%
+def draw_lines(L, ax=None, max_objects=None, bins=(180, 200), cmap='Greens', color='green', **kwargs):
+    # lines (N, 3) as clipped segments, or as a density of Hough bins when there are many on screen
+    # kwargs style the segments
+    ax = plt.gca() if ax is None else ax
+    box = _box(ax)
+    seg, crosses = clip_lines(L, box)
+    if not _dense(len(seg), ax, max_objects):
+        artist = LineCollection(seg, color=color, **kwargs)
+        ax.add_collection(artist)
+        return artist
+    counts, te, ce = hough(np.asarray(L, dtype=float).reshape(-1, 3)[crosses], box, bins)
+    i, j = np.nonzero(counts)
+    lines = hough_lines(0.5*(te[i] + te[i+1]), 0.5*(ce[j] + ce[j+1]))
+    density = raster_lines(lines, box, _pixels(ax), weights=counts[i, j])
+    artist = ax.imshow(np.ma.masked_equal(density, 0), extent=box, origin='lower', cmap=cmap,
+                       norm=LogNorm(), interpolation='nearest', aspect=ax.get_aspect())
+    ax.axis(box)
+    return artist
+
+
+# %% [markdown]
+# <h4>* Play *</h4>
+# A fan of $10^5$ rays from a point source through a thin lens (as in `pgaanim.py`), and the $10^5$ pairwise meets of neighbouring rays.
+
+# %%
+import time
+from pga2array import points, join, meet
+
+# %%
+rng = np.random.default_rng(0)
+N = 10**5
+src = points([[-3., 0.5]])
+m = rng.uniform(-0.5, 0.3, N)
+rays = join(src, points(np.column_stack([np.zeros(N), 0.5 + 3*m])))
+f = 1.5
+out = rays/-rays[:,1:2]  # (m, -1, h) rows
+out[:,0] -= out[:,2]/f
+meets = meet(out[:-1], out[1:] + rng.normal(scale=0.01, size=(N-1, 3)))
+
+# %%
+fig, axes = plt.subplots(1, 2, figsize=(12, 5))
+times = []
+for ax, n in zip(axes, [200, N]):
+    ax.axis((-3.5, 6, -2, 2))
+    start = time.perf_counter()
+    draw_lines(out[:n], ax, linewidths=0.5)
+    draw_points(meets[:n], ax, color='red', markersize=2)
+    times.append(time.perf_counter() - start)
+    ax.set_title('{} rays'.format(n))
+# seconds for 200 objects as artists and 10^5 as densities
+times
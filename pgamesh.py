@@ -0,0 +1,192 @@
+# ---
+# title: Triangle meshes in 2D PGA
+# jupyter:
+#   jupytext:
+#     cell_metadata_filter: all,-autoscroll,-collapsed,-scrolled,-trusted,-ExecuteTime
+#     notebook_metadata_filter: kernelspec,jupytext,-jupytext.text_representation.jupytext_version
+#     text_representation:
+#       extension: .py
+#       format_name: percent
+#       format_version: '1.3'
+#   kernelspec:
+#     display_name: Python [conda env:galgebra]
+#     language: python
+#     name: conda-env-galgebra-py
+# ---
+
+# %% [markdown]
+# `Clifford-pga2.py` builds a triangle from three points $A, B, C$ and its sides $a = B\vee C$, $b = C\vee A$, $c = A\vee B$.
+# For normalized points:
+# * the Euclidean norm of a side is its length, $\lVert a\rVert = |BC|$,
+# * $A\vee B\vee C = A\vee a$ is twice the signed area (positive for counterclockwise triangles),
+# * the sides oriented by the sign of the area are positive on the inside, so $X$ is in the triangle when $X\vee a$, $X\vee b$ and $X\vee c$ are all $\geq 0$,
+# * the incenter is the weighted sum of points $|BC|\,A + |CA|\,B + |AB|\,C$ (normalized),
+# * the circumcenter is the meet of two perpendicular bisectors; the bisector of $P$ and $Q$ is the line $(\mathbf{q}-\mathbf{p})\cdot\mathbf{x} = \tfrac12(|\mathbf{q}|^2 - |\mathbf{p}|^2)$.
+#
+# Here all of these are computed for a whole mesh at once: a vertex array `(V, 2)` and a triangle index array `(N, 3)`, with points and lines as rows in the conventions of `pga2array.py`, where the join is a cross product and $X\vee\ell$ is a dot product.
+#
+# Point location uses a uniform grid over the triangles' bounding boxes, stored as a sorted cell list (CSR): each query point is tested only against the triangles sharing its cell.
+
+# %%
+import numpy as np
+from pga2array import points, join, meet, normalize_points
+
+
+# %%
+class TriangleMesh:
+    '''
+    triangles tris (N, 3) indexing into vertices (V, 2)
+    '''
+    def __init__(self, vertices, tris):
+        self.vertices = np.asarray(vertices, dtype=float)
+        self.tris = np.asarray(tris, dtype=np.int64).reshape(-1, 3)
+        self._corners = None
+        self._edges = None
+        self._index = None
+
+    def __len__(self):
+        return len(self.tris)
+
+    def corners(self):
+        # (N, 3, 3) normalized points A, B, C, computed once
+        if self._corners is None:
+            self._corners = points(self.vertices)[self.tris]
+        return self._corners
+
+    def edges(self):
+        # (N, 3, 3) side lines a = B v C, b = C v A, c = A v B, computed once
+        if self._edges is None:
+            P = self.corners()
+            self._edges = np.stack([join(P[:,1], P[:,2]), join(P[:,2], P[:,0]), join(P[:,0], P[:,1])], axis=1)
+        return self._edges
+
+    def lengths(self):
+        # (N, 3) side lengths |BC|, |CA|, |AB|
+        L = self.edges()
+        return np.hypot(L[...,0], L[...,1])
+
+    def areas(self):
+        # signed areas, A v B v C / 2 = A v a / 2
+        return 0.5*np.einsum('ni,ni->n', self.corners()[:,0], self.edges()[:,0])
+
+    def circumcenters(self):
+        P = self.corners()
+        bisectors = np.empty((len(P), 2, 3))
+        for k, (i, j) in enumerate([(0, 1), (0, 2)]):
+            p, q = P[:,i,:2], P[:,j,:2]
+            bisectors[:,k,:2] = q - p
+            bisectors[:,k,2] = -0.5*((q*q).sum(axis=1) - (p*p).sum(axis=1))
+        return normalize_points(meet(bisectors[:,0], bisectors[:,1]))
+
+    def incenters(self):
+        P = self.corners()
+        return normalize_points(np.einsum('nk,nki->ni', self.lengths(), P))
+
+    def _inward(self, tol=1e-12):
+        # normalized sides oriented positive on the inside
+        # a triangle of area |A| <= tol has no inside: its sides are the ideal line -e0, negative everywhere
+        A = self.areas()
+        solid = np.abs(A) > tol
+        with np.errstate(divide='ignore', invalid='ignore'):
+            inward = self.edges()*(np.sign(A)[:,None]/self.lengths())[...,None]
+        inward[~solid] = [0., 0., -1.]
+        return inward
+
+    # point location
+
+    def build_index(self, cell=None, tol=1e-12):
+        # uniform grid; the default cell is half the mean bounding box size of the triangles
+        # (smaller cells mean fewer candidates per query but more cells per triangle)
+        # triangles of area |A| <= tol are left out of the cells
+        V = self.vertices[self.tris]
+        lo = np.minimum(np.minimum(V[:,0], V[:,1]), V[:,2])
+        hi = np.maximum(np.maximum(V[:,0], V[:,1]), V[:,2])
+        if cell is None:
+            cell = max(0.5*(hi - lo).max(axis=1).mean(), 1e-12)
+        origin = lo.min(axis=0)
+        shape = np.floor((hi.max(axis=0) - origin)/cell).astype(np.int64) + 1
+        i0 = np.floor((lo - origin)/cell).astype(np.int64)
+        i1 = np.floor((hi - origin)/cell).astype(np.int64)
+        w = i1 - i0 + 1
+        counts = np.where(np.abs(self.areas()) > tol, w[:,0]*w[:,1], 0)
+        tri = np.repeat(np.arange(len(counts)), counts)
+        k = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        cx = i0[tri,0] + k % w[tri,0]
+        cy = i0[tri,1] + k//w[tri,0]
+        cells = cy*shape[0] + cx
+        order = np.argsort(cells, kind='stable')
+        start = np.searchsorted(cells[order], np.arange(shape[0]*shape[1] + 1))
+        self._index = (origin, cell, shape, start, tri[order], self._inward(tol))
+        return self
+
+    def locate(self, X, tol=1e-12, chunk=10**6):
+        # index of a triangle containing each point of X (M, 2), -1 if none
+        # tol is a distance outside the triangle that still counts as inside
+        if self._index is None:
+            self.build_index()
+        origin, cell, shape, start, tri, inward = self._index
+        X = np.asarray(X, dtype=float).reshape(-1, 2)
+        out = np.full(len(X), -1, dtype=np.int64)
+        for s in range(0, len(X), chunk):
+            x = X[s:s+chunk]
+            ij = np.floor((x - origin)/cell).astype(np.int64)
+            ok = np.all((ij >= 0) & (ij < shape), axis=1)
+            c = np.where(ok, ij[:,1]*shape[0] + ij[:,0], 0)
+            n = np.where(ok, start[c+1] - start[c], 0)
+            q = np.repeat(np.arange(len(x)), n)
+            t = tri[np.repeat(start[c], n) + np.arange(n.sum()) - np.repeat(np.cumsum(n) - n, n)]
+            # X v side for the three sides of each candidate
+            d = np.einsum('mki,mi->mk', inward[t], points(x[q]))
+            inside = np.all(d >= -tol, axis=1)
+            # the first candidate wins when a point lies on a shared edge
+            out[s + q[inside][::-1]] = t[inside][::-1]
+        return out
+
+
+# %% [markdown]
+# <h4>* Play *</h4>
+
+# %%
+import time
+
+# %%
+# a single triangle, checked against the formulas in Clifford-pga2.py
+mesh = TriangleMesh([[0, 0], [4, 0], [0, 3]], [[0, 1, 2]])
+mesh.lengths(), mesh.areas(), mesh.circumcenters(), mesh.incenters()
+
+# %%
+# degenerate triangles, collinear and a single point, contain nothing: only the real triangle is found
+mesh = TriangleMesh([[0, 0], [2, 2], [4, 4], [4, 0], [3, 3]], [[0, 1, 2], [4, 4, 4], [0, 3, 2]])
+mesh.locate([[3, 3.9], [3, 3], [3, 1], [1, 1]]), mesh.areas()
+
+# %% [markdown]
+# A jittered grid of $2\times 10^6$ triangles, and $10^6$ random query points.
+
+# %%
+n = 1000
+rng = np.random.default_rng(0)
+gx, gy = np.meshgrid(np.arange(n + 1), np.arange(n + 1))
+vertices = np.column_stack([gx.ravel(), gy.ravel()]) + rng.uniform(-0.3, 0.3, size=((n + 1)**2, 2))
+v = (np.arange(n)[:,None] + (n + 1)*np.arange(n)[None,:]).ravel()
+tris = np.concatenate([np.column_stack([v, v + 1, v + n + 2]), np.column_stack([v, v + n + 2, v + n + 1])])
+mesh = TriangleMesh(vertices, tris)
+
+# %%
+start = time.perf_counter()
+A, C, I = mesh.areas(), mesh.circumcenters(), mesh.incenters()
+t_geometry = time.perf_counter() - start
+start = time.perf_counter()
+mesh.build_index()
+t_index = time.perf_counter() - start
+X = rng.uniform(0, n, size=(10**6, 2))
+start = time.perf_counter()
+found = mesh.locate(X)
+t_locate = time.perf_counter() - start
+# seconds, and a check: the total area of the mesh and the share of points found
+t_geometry, t_index, t_locate, A.sum(), (found >= 0).mean()
+
+# %%
+# brute-force check of a few located points
+k = rng.integers(len(X), size=100)
+inward = mesh._inward()
+all(((inward[found[i]].dot(np.r_[X[i], 1]) >= -1e-9).all() for i in k if found[i] >= 0))
@@ -0,0 +1,154 @@
+# ---
+# title: Random PGA objects in reproducible chunks
+# jupyter:
+#   jupytext:
+#     cell_metadata_filter: all,-autoscroll,-collapsed,-scrolled,-trusted,-ExecuteTime
+#     notebook_metadata_filter: kernelspec,jupytext,-jupytext.text_representation.jupytext_version
+#     text_representation:
+#       extension: .py
+#       format_name: percent
+#       format_version: '1.3'
+#   kernelspec:
+#     display_name: Python [conda env:galgebra]
+#     language: python
+#     name: conda-env-galgebra-py
+# ---
+
+# %% [markdown]
+# Array versions of `rand_line` and `rand_point` from the plotting notebooks, with the same distributions:
+# * lines $\cos\phi\, e_1 + \sin\phi\, e_2 + c\, e_0$ with $\phi$ uniform and $c$ uniform in $[0, \ell)$,
+# * points at a uniform angle and a distance from the origin uniform in $[0, \ell)$,
+# * ideal points in a uniform direction.
+#
+# Instead of the global `np.random` state they draw from an `np.random.Generator`, and instead of a list of multivectors they yield arrays of `chunk` objects at a time, so $10^8$ samples never have to be in memory at once.
+# `n=None` yields chunks forever.
+# Each chunk is drawn in a single call, row by row, so the objects do not depend on the chunk size.
+#
+# 2D objects are rows in the conventions of `pga2array.py` (`values=True` gives `clifford` coefficients instead).
+# 3D points are Euclidean `(N, 3)` arrays and 3D lines `(N, 6)` bivectors as in `pga3array.py`; 3D planes $d e_0 + a e_1 + b e_2 + c e_3$ are `(N, 4)` arrays in the `clifford` order `(d, a, b, c)`, with unit normal and $d$ uniform in $[0, \ell)$.
+#
+# For parallel workers, `streams(seed, n)` spawns independent generators as in `cm3fit.ransac`.
+
+# %%
+import numpy as np
+from pga2array import to_values
+from pga3array import force_lines
+
+
+# %%
+def streams(seed, n):
+    # n independent generators spawned from one seed
+    return [np.random.default_rng(s) for s in np.random.SeedSequence(seed).spawn(n)]
+
+
+# %%
+def _chunks(n, chunk):
+    # sizes of the chunks making up n objects (forever if n is None)
+    done = 0
+    while n is None or done < n:
+        m = chunk if n is None else min(chunk, n - done)
+        yield m
+        done += m
+
+
+# %%
+def _unit3(u):
+    # uniform directions from uniform (m, 2) samples
+    z = 2*u[:,0] - 1
+    phi = 2*np.pi*u[:,1]
+    r = np.sqrt(1 - z*z)
+    return np.column_stack([r*np.cos(phi), r*np.sin(phi), z])
+
+
+# %% [markdown]
+# ## 2D PGA
+
+# %%
+def lines2(rng, n=None, chunk=10**5, length=1.0, values=False):
+    # normalized lines (a, b, c), distance to the origin below length
+    for m in _chunks(n, chunk):
+        u = rng.random((m, 2))
+        phi = 2*np.pi*u[:,0]
+        L = np.column_stack([np.cos(phi), np.sin(phi), length*u[:,1]])
+        yield to_values(L, 1) if values else L
+
+
+# %%
+def points2(rng, n=None, chunk=10**5, length=1.0, values=False):
+    # normalized points (x, y, 1) at most length from the origin
+    for m in _chunks(n, chunk):
+        u = rng.random((m, 2))
+        phi = 2*np.pi*u[:,0]
+        r = length*u[:,1]
+        P = np.column_stack([r*np.cos(phi), r*np.sin(phi), np.ones(m)])
+        yield to_values(P, 2) if values else P
+
+
+# %%
+def ideal_points2(rng, n=None, chunk=10**5, values=False):
+    # unit directions (x, y, 0)
+    for m in _chunks(n, chunk):
+        phi = 2*np.pi*rng.random(m)
+        P = np.column_stack([np.cos(phi), np.sin(phi), np.zeros(m)])
+        yield to_values(P, 2) if values else P
+
+
+# %% [markdown]
+# ## 3D PGA
+
+# %%
+def points3(rng, n=None, chunk=10**5, length=1.0):
+    # Euclidean points at most length from the origin, uniform direction and distance
+    for m in _chunks(n, chunk):
+        u = rng.random((m, 3))
+        yield length*u[:,2:]*_unit3(u[:,:2])
+
+
+# %%
+def lines3(rng, n=None, chunk=10**5, length=1.0):
+    # normalized lines with uniform direction, at a distance below length from the origin
+    for m in _chunks(n, chunk):
+        u = rng.random((m, 5))
+        d = _unit3(u[:,:2])
+        # foot of the perpendicular: a uniform direction orthogonal to d
+        a = np.where(np.abs(d[:,:1]) < 0.9, [[1., 0, 0]], [[0, 1., 0]])
+        e1 = np.cross(d, a)
+        e1 /= np.linalg.norm(e1, axis=1, keepdims=True)
+        e2 = np.cross(d, e1)
+        psi = 2*np.pi*u[:,2:3]
+        p = length*u[:,3:4]*(np.cos(psi)*e1 + np.sin(psi)*e2)
+        yield force_lines(p, d)
+
+
+# %%
+def planes3(rng, n=None, chunk=10**5, length=1.0):
+    # planes (d, a, b, c) with unit normal (a, b, c) and d uniform below length
+    for m in _chunks(n, chunk):
+        u = rng.random((m, 3))
+        yield np.column_stack([length*u[:,2], _unit3(u[:,:2])])
+
+
+# %% [markdown]
+# <h4>* Play *</h4>
+
+# %%
+# the same objects whatever the chunk size
+a = np.concatenate(list(lines2(np.random.default_rng(1), 1000, chunk=64)))
+b = np.concatenate(list(lines2(np.random.default_rng(1), 1000, chunk=1000)))
+(a == b).all()
+
+# %%
+# Monte Carlo: the mean distance between random points in the unit disc (with this radial distribution),
+# 10^6 pairs from 4 independent streams, a chunk at a time
+def mean_distance(rng, n=250000):
+    total = 0.
+    for P, Q in zip(points2(rng, n, chunk=10**4), points2(rng, n, chunk=10**4)):
+        total += np.linalg.norm(P[:,:2] - Q[:,:2], axis=1).sum()
+    return total/n
+
+np.mean([mean_distance(rng) for rng in streams(0, 4)])
+
+# %%
+# 3D lines: distance from the origin |p x d| stays below length
+L = next(lines3(np.random.default_rng(2), 10**5, length=2.0))
+np.linalg.norm(L[:,:3], axis=1).max(), next(planes3(np.random.default_rng(3), 5))
@@ -0,0 +1,280 @@
+# ---
+# title: Drawing 2D PGA figures straight into NumPy images
+# jupyter:
+#   jupytext:
+#     cell_metadata_filter: all,-autoscroll,-collapsed,-scrolled,-trusted,-ExecuteTime
+#     notebook_metadata_filter: kernelspec,jupytext,-jupytext.text_representation.jupytext_version
+#     text_representation:
+#       extension: .py
+#       format_name: percent
+#       format_version: '1.3'
+#   kernelspec:
+#     display_name: Python [conda env:galgebra]
+#     language: python
+#     name: conda-env-galgebra-py
+# ---
+
+# %% [markdown]
+# A matplotlib figure per slide or frame is slow when there are hundreds of them.
+# A `Canvas` is just an `(H, W, 4)` `uint8` RGBA array with a data box, and everything is drawn into it with array operations:
+# * lines are clipped to the box (`pga2array.clip_lines`) and sampled once per pixel along their length, thickened across it and optionally dashed,
+# * points are discs stamped at every point at once,
+# * labels are small text bitmaps (rendered once per string with the default pillow font) blended in.
+#
+# `Canvas.add` follows `add_to_axes` from `clifford-2DPGA-matplotlib.py`: real lines are drawn across the box with the label near the end, points get the label offset by 5 pixels, an ideal point is an arrow from the center of the picture, and the ideal line is a dashed ellipse inscribed in the box with its label at (0.8, 0.8).
+#
+# `write_png` needs only `zlib`, and `render_frames` draws and writes many frames on a pool of workers.
+
+# %%
+import zlib
+import struct
+import warnings
+import numpy as np
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from matplotlib.colors import to_rgba
+from pga2array import classify, kinds, from_values, clip_lines, finite_points
+
+
+# %%
+def write_png(path, rgba, level=6):
+    # (H, W, 4) uint8 image, row 0 at the top
+    H, W, _ = rgba.shape
+    raw = np.concatenate([np.zeros((H, 1), dtype=np.uint8), rgba.reshape(H, -1)], axis=1)
+
+    def chunk(tag, data):
+        return struct.pack('>I', len(data)) + tag + data + struct.pack('>I', zlib.crc32(tag + data) & 0xffffffff)
+
+    with open(path, 'wb') as f:
+        f.write(b'\x89PNG\r\n\x1a\n')
+        f.write(chunk(b'IHDR', struct.pack('>IIBBBBB', W, H, 8, 6, 0, 0, 0)))
+        f.write(chunk(b'IDAT', zlib.compress(np.ascontiguousarray(raw).tobytes(), level)))
+        f.write(chunk(b'IEND', b''))
+
+
+# %%
+@lru_cache(maxsize=256)
+def _text_mask(text):
+    # coverage (h, w) of text in the default pillow font
+    from PIL import Image, ImageDraw, ImageFont
+    font = ImageFont.load_default()
+    x0, y0, x1, y1 = ImageDraw.Draw(Image.new('L', (1, 1))).textbbox((0, 0), text, font=font)
+    img = Image.new('L', (max(x1, 1), max(y1, 1)))
+    ImageDraw.Draw(img).text((0, 0), text, fill=255, font=font)
+    return np.asarray(img)/255.
+
+
+# %%
+def _disc(radius):
+    r = int(np.ceil(radius))
+    dy, dx = np.mgrid[-r:r+1, -r:r+1]
+    inside = dx*dx + dy*dy <= radius*radius
+    return dx[inside], dy[inside]
+
+
+# %%
+class Canvas:
+    '''
+    RGBA image of the data box = (xmin, xmax, ymin, ymax), size = (W, H) pixels
+    '''
+    def __init__(self, box=(-1, 1, -1, 1), size=(400, 400), background='white'):
+        self.box = tuple(float(b) for b in box)
+        self.W, self.H = size
+        self.rgba = np.empty((self.H, self.W, 4), dtype=np.uint8)
+        self.rgba[...] = self._color(background)
+
+    def _color(self, color):
+        return np.round(255*np.array(to_rgba(color))).astype(np.uint8)
+
+    def to_pixels(self, xy):
+        # data coordinates (..., 2) --> (column, row) floats, row 0 at the top
+        xmin, xmax, ymin, ymax = self.box
+        xy = np.asarray(xy, dtype=float)
+        return np.stack([(xy[...,0] - xmin)/(xmax - xmin)*self.W,
+                         (ymax - xy[...,1])/(ymax - ymin)*self.H], axis=-1)
+
+    def _paint(self, col, row, color, coverage=None):
+        # blend color into the pixels (col, row); each pixel once
+        col = np.asarray(col).astype(np.int64).ravel()
+        row = np.asarray(row).astype(np.int64).ravel()
+        ok = (col >= 0) & (col < self.W) & (row >= 0) & (row < self.H)
+        flat = row[ok]*self.W + col[ok]
+        alpha = color[3]/255.
+        if coverage is None:
+            flat = np.unique(flat)
+            a = np.full(len(flat), alpha)
+        else:
+            a = np.asarray(coverage, dtype=float).ravel()[ok]*alpha
+        img = self.rgba.reshape(-1, 4)
+        img[flat,:3] = np.round(img[flat,:3]*(1 - a[:,None]) + color[:3]*a[:,None]).astype(np.uint8)
+        img[flat,3] = np.maximum(img[flat,3], np.round(255*a).astype(np.uint8))
+
+    def segments(self, seg, color='black', width=1, dash=None):
+        # segments (N, 2, 2) in data coordinates; dash = (on, off) in pixels
+        color = self._color(color)
+        p = self.to_pixels(seg)
+        d = p[:,1] - p[:,0]
+        n = np.ceil(np.abs(d).max(axis=1)).astype(int) + 1
+        which = np.repeat(np.arange(len(n)), n)
+        s = np.arange(n.sum()) - np.repeat(np.cumsum(n) - n, n)
+        f = s/np.maximum(n - 1, 1)[which]
+        xy = p[which,0] + f[:,None]*d[which]
+        if dash is not None:
+            length = s*np.hypot(d[:,0], d[:,1])[which]/np.maximum(n - 1, 1)[which]
+            keep = length % sum(dash) < dash[0]
+            xy, which = xy[keep], which[keep]
+        # thicken across the minor axis of each segment
+        steep = (np.abs(d[:,1]) > np.abs(d[:,0]))[which]
+        for k in np.arange(width) - (width - 1)/2:
+            self._paint(xy[:,0] + np.where(steep, k, 0), xy[:,1] + np.where(steep, 0, k), color)
+
+    def lines(self, L, color='black', width=1, dash=None):
+        # lines (N, 3) clipped to the box
+        seg, crosses = clip_lines(L, self.box)
+        self.segments(seg, color, width, dash)
+        return seg
+
+    def points(self, P, color='black', radius=3):
+        # finite points (N, 3) as discs
+        p = self.to_pixels(finite_points(P))
+        dx, dy = _disc(radius)
+        self._paint(p[:,0,None] + dx, p[:,1,None] + dy, self._color(color))
+
+    def text(self, text, col, row, color='black'):
+        # text with its top left corner at pixel (col, row)
+        if text is None:
+            return
+        mask = _text_mask(str(text))
+        rr, cc = np.nonzero(mask)
+        self._paint(int(col) + cc, int(row) + rr, self._color(color), mask[rr, cc])
+
+    def arrow(self, start, end, color='black', head=8):
+        # arrow between pixel positions, head at end
+        start, end = np.asarray(start, dtype=float), np.asarray(end, dtype=float)
+        d = end - start
+        d = d/max(np.hypot(*d), 1e-12)
+        back = end - head*d
+        side = head*0.5*np.array([-d[1], d[0]])
+        seg = np.array([[start, end], [end, back + side], [end, back - side]])
+        xmin, xmax, ymin, ymax = self.box
+        data = np.stack([xmin + seg[...,0]/self.W*(xmax - xmin), ymax - seg[...,1]/self.H*(ymax - ymin)], axis=-1)
+        self.segments(data, color)
+
+    def ellipse(self, color='black', dash=(6, 4), n=256):
+        # ellipse inscribed in the box
+        xmin, xmax, ymin, ymax = self.box
+        t = np.linspace(0, 2*np.pi, n + 1)
+        xy = np.column_stack([0.5*(xmin + xmax) + 0.5*(xmax - xmin)*np.cos(t),
+                              0.5*(ymin + ymax) + 0.5*(ymax - ymin)*np.sin(t)])
+        seg = np.stack([xy[:-1], xy[1:]], axis=1)
+        # dash along the whole curve rather than per segment
+        p = self.to_pixels(seg)
+        s = np.cumsum(np.hypot(*(p[:,1] - p[:,0]).T))
+        self.segments(seg[s % sum(dash) < dash[0]], color)
+
+    def add(self, X, label=None, color='black', eps=1e-6, width=1, dash=None, radius=3):
+        '''
+        draw clifford 2D PGA multivectors or (N, 8) coefficient rows in the style of add_to_axes
+        the same label goes on every object; width and dash are for the lines, radius for the points
+        '''
+        if not isinstance(X, np.ndarray):
+            X = [x.value for x in X] if isinstance(X, (list, tuple)) else X.value
+        V = np.asarray(X, dtype=float).reshape(-1, 8)
+        kind = np.array(kinds)[classify(V, rtol=eps)]
+        L = from_values(V[kind == 'real line'], 1)
+        if len(L):
+            seg, crosses = clip_lines(L, self.box)
+            if not crosses.all():
+                warnings.warn("{} lines outside window".format((~crosses).sum()))
+            self.segments(seg, color, width, dash)
+            if label is not None:
+                for c, r in self.to_pixels(seg[:,0] + 0.9*(seg[:,1] - seg[:,0])):
+                    self.text(label, c + 5, r - 15, color)
+        P = from_values(V[kind == 'real point'], 2)
+        if len(P):
+            self.points(P, color, radius)
+            if label is not None:
+                for c, r in self.to_pixels(finite_points(P)):
+                    self.text(label, c + 5, r - 15, color)
+        center = np.array([self.W/2, self.H/2])
+        for x, y, w in from_values(V[kind == 'ideal point'], 2):
+            # arrow from the center toward the ideal point, 10% of the picture per unit
+            tip = center + 0.1*np.array([x*self.W, -y*self.H])
+            self.arrow(center, tip, color)
+            self.text(label, tip[0], tip[1], color)
+        if (kind == 'ideal line').any():
+            self.ellipse(color)
+            self.text(label, 0.8*self.W, 0.2*self.H, color)
+        other = ~np.isin(kind, ['real line', 'real point', 'ideal point', 'ideal line'])
+        if other.any():
+            warnings.warn("{} objects are not points or lines.  Ignoring.".format(other.sum()))
+
+    def save(self, path, **kwargs):
+        write_png(path, self.rgba, **kwargs)
+
+
+# %%
+def _render(job):
+    draw, t, path, box, size, background = job
+    canvas = Canvas(box, size, background)
+    draw(canvas, t)
+    canvas.save(path)
+    return path
+
+
+# %%
+def render_frames(draw, params, pattern, box=(-1, 1, -1, 1), size=(400, 400), background='white',
+                  workers=None, processes=False):
+    '''
+    draw(canvas, t) for every t in params, each frame saved to pattern.format(i)
+    frames run on a thread pool (zlib and most of the array work release the GIL),
+    or on a process pool with processes=True, which needs draw to be importable
+    '''
+    jobs = [(draw, t, pattern.format(i), box, size, background) for i, t in enumerate(params)]
+    pool = ProcessPoolExecutor if processes else ThreadPoolExecutor
+    with pool(workers) as ex:
+        return list(ex.map(_render, jobs))
+
+
+# %% [markdown]
+# <h4>* Play *</h4>
+# The opening figure of `clifford-2DPGA-matplotlib.py`: three points, the lines joining them, an ideal point and the ideal line.
+
+# %%
+import os
+import time
+import tempfile
+from clifford import Cl
+from pga2array import points, meet, to_multivectors, euclidean, transform
+
+layout, blades = Cl(2,0,1, firstIdx=0)
+rng = np.random.default_rng(0)
+P = points(rng.uniform(-0.8, 0.8, size=(3,2)))
+A, B, C = to_multivectors(P, 2, layout)
+
+canvas = Canvas()
+canvas.add([A, B, C], label='p', color='blue')
+canvas.add(to_multivectors([[0.6, 0.8, 0.]], 2, layout), label='O', color='red')
+canvas.add([B & C, C & A, A & B], label='L', color='green')
+canvas.add(1*blades['e0'], label='I', color='black')
+# line and point options together, for a mix of both
+canvas.add([A, B & C], color='orange', width=2, dash=(6, 3), radius=2)
+folder = tempfile.mkdtemp()
+canvas.save(os.path.join(folder, 'triangle.png'))
+
+# %% [markdown]
+# One hundred frames of 500 rotating lines, written in parallel.
+
+# %%
+angle = rng.uniform(0, 2*np.pi, 500)
+L0 = np.column_stack([np.cos(angle), np.sin(angle), rng.uniform(-1, 1, 500)])
+
+def spin(canvas, t):
+    L = transform(L0, euclidean(t), 1)
+    canvas.lines(L, color='green')
+    canvas.points(meet(L[:-1:2], L[1::2]), color='blue', radius=2)
+
+start = time.perf_counter()
+paths = render_frames(spin, np.linspace(0, np.pi, 100), os.path.join(folder, 'spin{:03d}.png'))
+# seconds per frame
+(time.perf_counter() - start)/len(paths)
@@ -0,0 +1,167 @@
+# ---
+# title: All intersections of many segments in 2D PGA
+# jupyter:
+#   jupytext:
+#     cell_metadata_filter: all,-autoscroll,-collapsed,-scrolled,-trusted,-ExecuteTime
+#     notebook_metadata_filter: kernelspec,jupytext,-jupytext.text_representation.jupytext_version
+#     text_representation:
+#       extension: .py
+#       format_name: percent
+#       format_version: '1.3'
+#   kernelspec:
+#     display_name: Python [conda env:galgebra]
+#     language: python
+#     name: conda-env-galgebra-py
+# ---
+
+# %% [markdown]
+# The notebooks find crossings as meets $\ell_i\wedge\ell_j$ of all pairs, which for $N$ segments is $N^2$ meets even when only a few of them cross.
+# Here the plane is swept in $x$, as in Bentley-Ottmann, but a slab at a time instead of an event at a time, so that everything is done with array operations:
+# * the $x$ range is cut into `slabs` vertical slabs and every segment into its pieces in the slabs it crosses,
+# * two pieces in a slab can only cross if their $y$ ranges overlap; sorting the pieces of all slabs by (slab, lowest $y$), the pieces overlapping a piece and starting above it are one range found by binary search (the sweep within a slab),
+# * the candidate pairs are tested with the orientations of the end points, $A\wedge\ell_{CD}$ and $B\wedge\ell_{CD}$ of opposite signs and $C\wedge\ell_{AB}$ and $D\wedge\ell_{AB}$ too (the $e_{012}$ coefficient of the wedge of a point and a line is the dot product of their rows, as in `add_to_axes`),
+# * the crossing is the meet $\ell_{AB}\wedge\ell_{CD}$; pairs are made unique before the test, since two segments crossing on (or within rounding of) a slab edge overlap in both slabs.
+#
+# The cost is the number of pieces plus the number of candidate pairs, close to the number of crossings when the slabs are narrow compared with the segments' slopes.
+# Segments sharing an end point count as crossing there; collinear overlapping segments (whose meet is ideal) are not reported.
+# The crossings are homogeneous points `(x, y, 1)`, rows of bivector coefficients in the conventions of `pga2array.py` (`to_values(P, 2)` gives the clifford arrays).
+
+# %%
+import numpy as np
+from pga2array import points, join, meet, clip_lines
+
+
+# %%
+def _pieces(S, slabs):
+    # slab, segment and y range of every piece of the segments S (N, 2, 2) in the slabs
+    x0, x1 = S[:,:,0].min(), S[:,:,0].max()
+    width = max((x1 - x0)/slabs, 1e-300)
+    lo = np.minimum(S[:,0], S[:,1])
+    hi = np.maximum(S[:,0], S[:,1])
+    first = np.minimum(((lo[:,0] - x0)/width).astype(np.int64), slabs - 1)
+    last = np.minimum(((hi[:,0] - x0)/width).astype(np.int64), slabs - 1)
+    n = last - first + 1
+    seg = np.repeat(np.arange(len(S)), n)
+    slab = np.repeat(first, n) + np.arange(n.sum()) - np.repeat(np.cumsum(n) - n, n)
+    # the segment between the slab edges, clipped to its own x range
+    a = np.maximum(x0 + slab*width, lo[seg,0])
+    b = np.minimum(x0 + (slab + 1)*width, hi[seg,0])
+    dx = S[seg,1,0] - S[seg,0,0]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        slope = np.where(dx != 0, (S[seg,1,1] - S[seg,0,1])/dx, 0.)
+    ya = S[seg,0,1] + slope*(a - S[seg,0,0])
+    yb = S[seg,0,1] + slope*(b - S[seg,0,0])
+    vertical = dx == 0
+    # padded for the rounding of ya and yb, so that segments crossing on a slab edge overlap in both slabs
+    pad = 1e-12*np.abs(S).max()
+    ylo = np.where(vertical, lo[seg,1], np.minimum(ya, yb)) - pad
+    yhi = np.where(vertical, hi[seg,1], np.maximum(ya, yb)) + pad
+    return slab, seg, ylo, yhi
+
+
+def intersections(S, slabs=None):
+    '''
+    all crossings of the segments S (N, 2, 2)
+    returns the indices i < j of the crossing segments and the crossings (K, 3) as normalized points
+    '''
+    S = np.asarray(S, dtype=float).reshape(-1, 2, 2)
+    slabs = slabs or max(1, int(np.sqrt(len(S))))
+    slab, seg, ylo, yhi = _pieces(S, slabs)
+    # one sorted key for all slabs, with a gap between slabs
+    ymin = ylo.min()
+    span = 2*(yhi.max() - ymin) + 1.
+    order = np.lexsort((ylo, slab))
+    slab, seg, ylo, yhi = slab[order], seg[order], ylo[order], yhi[order]
+    keys = slab*span + (ylo - ymin)
+    # the pieces after each piece that start at or below its top
+    n = np.searchsorted(keys, slab*span + (yhi - ymin), side='right') - np.arange(1, len(keys) + 1)
+    n = np.maximum(n, 0)
+    p = np.repeat(np.arange(len(keys)), n)
+    q = p + 1 + np.arange(n.sum()) - np.repeat(np.cumsum(n) - n, n)
+    i, j = seg[p], seg[q]
+    keep = i != j
+    # a pair with pieces overlapping in two slabs (crossing on the edge between them) is a candidate once
+    pair = np.unique(np.minimum(i, j)[keep]*len(S) + np.maximum(i, j)[keep])
+    i, j = pair//len(S), pair % len(S)
+    # orientations of the end points against the other segment's line
+    A, B = points(S[:,0]), points(S[:,1])
+    L = join(A, B)
+    sa = np.einsum('ni,ni->n', A[i], L[j])
+    sb = np.einsum('ni,ni->n', B[i], L[j])
+    sc = np.einsum('ni,ni->n', A[j], L[i])
+    sd = np.einsum('ni,ni->n', B[j], L[i])
+    P = meet(L[i], L[j])
+    cross = (sa*sb <= 0) & (sc*sd <= 0) & (P[:,2] != 0)
+    return i[cross], j[cross], P[cross]/P[cross,2:]
+
+
+# %%
+def line_intersections(L, box, slabs=None):
+    # crossings of the lines L (N, 3) inside box = (xmin, xmax, ymin, ymax): indices i < j and the points (K, 3)
+    seg, crosses = clip_lines(L, box)
+    index = np.flatnonzero(crosses)
+    i, j, P = intersections(seg, slabs)
+    return index[i], index[j], P
+
+
+# %% [markdown]
+# <h4>* Play *</h4>
+
+# %%
+import time
+import matplotlib.pyplot as plt
+from matplotlib.collections import LineCollection
+
+# %%
+def brute_force(S):
+    # all pairs, for checking
+    A, B = points(S[:,0]), points(S[:,1])
+    L = join(A, B)
+    i, j = np.triu_indices(len(S), 1)
+    P = meet(L[i], L[j])
+    cross = (np.einsum('ni,ni->n', A[i], L[j])*np.einsum('ni,ni->n', B[i], L[j]) <= 0) & \
+            (np.einsum('ni,ni->n', A[j], L[i])*np.einsum('ni,ni->n', B[j], L[i]) <= 0) & (P[:,2] != 0)
+    return i[cross], j[cross], P[cross]/P[cross,2:]
+
+
+# %%
+# 2000 random segments, against all pairs
+rng = np.random.default_rng(0)
+start = rng.uniform(0, 1, (2000, 2))
+S = np.stack([start, start + rng.normal(scale=0.05, size=(2000, 2))], axis=1)
+i, j, P = intersections(S)
+bi, bj, bP = brute_force(S)
+set(zip(i, j)) == set(zip(bi, bj)), len(i)
+
+# %%
+# 3000 segments between integer points, with many shared end points and crossings on slab edges
+G = rng.integers(0, 20, (3000, 2, 2)).astype(float)
+gi, gj, gP = intersections(G)
+gbi, gbj, gbP = brute_force(G)
+set(zip(gi, gj)) == set(zip(gbi, gbj)), len(gi) == len(gbi)
+
+# %%
+fig, ax = plt.subplots(figsize=(6,6))
+ax.set_aspect(1)
+ax.add_collection(LineCollection(S[:300], colors='gray', linewidths=0.5))
+small = (i < 300) & (j < 300)
+ax.plot(P[small,0], P[small,1], '.', color='red', markersize=3)
+ax.axis((0, 1, 0, 1));
+
+# %% [markdown]
+# $3\times 10^5$ short segments, and 2000 lines crossing in a box (more than a million crossings).
+
+# %%
+start = rng.uniform(0, 100, (3*10**5, 2))
+S = np.stack([start, start + rng.normal(scale=0.3, size=(3*10**5, 2))], axis=1)
+t = time.perf_counter()
+i, j, P = intersections(S)
+t_segments = time.perf_counter() - t
+L = join(points(rng.uniform(-1, 1, (2000, 2))), points(rng.uniform(-1, 1, (2000, 2))))
+t = time.perf_counter()
+li, lj, LP = line_intersections(L, (-1, 1, -1, 1))
+t_lines = time.perf_counter() - t
+# all meets inside the box, for checking
+M = meet(L[:,None], L[None])[np.triu_indices(len(L), 1)]
+inside = (np.abs(M[:,:2]) <= np.abs(M[:,2:])).all(axis=1)
+t_segments, len(i), t_lines, len(li), inside.sum()
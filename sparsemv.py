@@ -0,0 +1,387 @@
+# ---
+# title: Sparse multivectors for larger algebras
+# jupyter:
+#   jupytext:
+#     cell_metadata_filter: all,-autoscroll,-collapsed,-scrolled,-trusted,-ExecuteTime
+#     notebook_metadata_filter: kernelspec,jupytext,-jupytext.text_representation.jupytext_version
+#     text_representation:
+#       extension: .py
+#       format_name: percent
+#       format_version: '1.3'
+#   kernelspec:
+#     display_name: Python [conda env:galgebra]
+#     language: python
+#     name: conda-env-galgebra-py
+# ---
+
+# %% [markdown]
+# In the 32-component algebra of `cm3.py` the objects are mostly single grade: a point is 5 coefficients, a sphere $P\wedge Q\wedge R\wedge S$ another 5, and a dense product spends nearly all its $32\times 32$ terms on zeros.
+# In higher dimensions (the "higher dimensional solution spaces" of `linear algebra.py`) dense storage stops being possible at all.
+#
+# A `SparseMV` stores the blades that are present as bitmask keys (bit $i$ for basis vector $i$, as in `gablades.py`) and an array of coefficients.
+# A product only visits the pairs of present blades:
+# * for a diagonal metric the result blade is `a ^ b` and the sign is counted with bit operations on whole arrays of pairs, so no table is needed and any dimension works,
+# * for other metrics (`cm3g`) each pair of blades has a few result terms, looked up in the exact tables of `gablades.canonical_tables`, stored as a sorted list (CSR) per pair.
+#
+# Terms landing on the same blade are summed with `np.unique` and `np.bincount`.
+# When more than `threshold` of the $2^n$ blades are present the result is stored densely instead (an array indexed by the mask), and two dense operands multiply through one `bincount` over all the nonzero structure constants.
+# The default `threshold` depends on the number of blades and comes from the crossover benchmark at the end: in `cm3` (32 blades) both storages cost about the same at the lowest fill tried, 0.05, and dense wins above it, while sparse products stay faster up to a fill of about 0.55 with 64 blades, 0.65 with 128 and 0.8 with 256.
+# Algebras with up to `max_table` blades look the products up in tables; larger ones (diagonal metric only) compute them on the fly.
+
+# %%
+import numpy as np
+from gablades import Algebra, canonical_tables
+
+
+# %%
+def _popcount(x):
+    return np.bitwise_count(x).astype(np.int64)
+
+
+def blade_products(a, b, d, kind='gp'):
+    '''
+    products of canonical blades (mask arrays a, b) for a diagonal metric d
+    returns the result masks and the factors (sign times metric, 0 where the product vanishes)
+    '''
+    a, b = np.broadcast_arrays(np.asarray(a, dtype=np.int64), np.asarray(b, dtype=np.int64))
+    swaps = np.zeros(a.shape, dtype=np.int64)
+    x = a >> 1
+    while x.any():
+        swaps += _popcount(x & b)
+        x = x >> 1
+    c = np.where(swaps & 1, -1., 1.)
+    common = a & b
+    for i, di in enumerate(d):
+        if di != 1:
+            c = c*np.where((common >> i) & 1, di, 1.)
+    if kind == 'op':
+        c = np.where(common == 0, c, 0.)
+    elif kind == 'lc':
+        c = np.where(a & ~b == 0, c, 0.)
+    return a ^ b, c
+
+
+# %%
+max_table = 2**10  # largest algebra (in blades) with product tables; larger ones with a diagonal metric work on the fly
+
+
+def default_threshold(N):
+    # fill ratio where dense products start to win, measured with crossover() for N blades
+    return 0.05 if N <= 32 else 0.5 if N <= 64 else 0.65 if N <= 128 else 0.75
+
+
+class SparseAlgebra:
+    '''
+    an algebra of sparse multivectors; metric and vectors as in gablades.Algebra
+    threshold: the fill ratio above which results are stored densely, default_threshold(2^n) if None
+    tol: results drop the coefficients below tol times their largest one (roundoff that would fill the storage)
+    '''
+    def __init__(self, metric, vectors=None, threshold=None, tol=1e-12):
+        self.blades = Algebra(metric, vectors)
+        self.n = self.blades.n
+        self.N = 2**self.n
+        G = self.blades.metric
+        self.diagonal = all(G[i][j] == 0 for i in range(self.n) for j in range(self.n) if i != j)
+        self.d = [float(G[i][i]) for i in range(self.n)]
+        if self.N > max_table and not self.diagonal:
+            raise ValueError("Algebras of more than {} blades need a diagonal metric".format(max_table))
+        self.threshold = default_threshold(self.N) if threshold is None else threshold
+        self.tol = tol
+        self._tables = {}
+        self._dense = {}
+
+    # constructors
+
+    def mv(self, terms):
+        # {blade name: coefficient}, names as in gablades (e.g. '20' or ('o', 'oo'))
+        masks, signs = zip(*[self.blades.mask(name) for name in terms])
+        return self.sparse(masks, np.array(list(terms.values()), dtype=float)*signs)
+
+    def vector(self, coefs):
+        return self.sparse(1 << np.arange(self.n), coefs)
+
+    def basis(self):
+        return [self.vector(np.eye(self.n)[i]) for i in range(self.n)]
+
+    def sparse(self, keys, coefs):
+        # forced sparse storage (duplicate keys are summed)
+        keys, inv = np.unique(np.asarray(keys, dtype=np.int64), return_inverse=True)
+        coefs = np.bincount(inv.ravel(), weights=np.broadcast_to(np.asarray(coefs, dtype=float), inv.shape).ravel(), minlength=len(keys))
+        nz = coefs != 0
+        return SparseMV(self, keys[nz], coefs[nz])
+
+    def dense(self, coefs):
+        # forced dense storage, coefficients indexed by mask
+        return SparseMV(self, None, np.asarray(coefs, dtype=float).reshape(self.N))
+
+    def from_values(self, values):
+        # coefficients in the clifford blade order of gablades.Algebra
+        coefs = np.zeros(self.N)
+        coefs[self.blades.masks] = values
+        return self.make(np.nonzero(coefs)[0], coefs[coefs != 0])
+
+    def make(self, keys, coefs):
+        # sparse or dense by fill ratio, without the coefficients below tol relative to the largest; keys sorted and unique
+        if len(coefs):
+            keep = np.abs(coefs) > self.tol*np.abs(coefs).max()
+            keys, coefs = keys[keep], coefs[keep]
+        if len(keys) > self.threshold*self.N:
+            out = np.zeros(self.N)
+            out[keys] = coefs
+            return self.dense(out)
+        return SparseMV(self, keys, coefs)
+
+    # products
+
+    def table(self, kind):
+        # (N, N, m) result masks and factors of the products of pairs of blades, at most m terms per pair
+        if kind not in self._tables:
+            N = self.N
+            if self.diagonal:
+                every = np.arange(N)
+                K, C = blade_products(every[:,None], every[None,:], self.d, kind)
+                K, C = K[...,None], C[...,None]
+            else:
+                table = canonical_tables(self.blades.metric)[kind]
+                m = max(len(terms) for terms in table.values())
+                K, C = np.zeros((N, N, m), dtype=np.int64), np.zeros((N, N, m))
+                for (a, b), terms in table.items():
+                    for j, (k, c) in enumerate(terms.items()):
+                        K[a,b,j], C[a,b,j] = k, float(c)
+            self._tables[kind] = K, C
+        return self._tables[kind]
+
+    def _terms(self, kind, ka, kb):
+        # result masks and factors (len(ka), len(kb), m) of the products of the blades ka and kb
+        if self.N > max_table:
+            k, c = blade_products(ka[:,None], kb[None,:], self.d, kind)
+            return k[...,None], c[...,None]
+        K, C = self.table(kind)
+        return K[ka[:,None], kb], C[ka[:,None], kb]
+
+    def _collect(self, k, w):
+        # sum the terms w on the blades k
+        if self.N <= max_table:
+            out = np.bincount(k, weights=w, minlength=self.N)
+            keys = np.flatnonzero(out)
+            return self.make(keys, out[keys])
+        keys, inv = np.unique(k, return_inverse=True)
+        coefs = np.bincount(inv, weights=w, minlength=len(keys))
+        nz = coefs != 0
+        return self.make(keys[nz], coefs[nz])
+
+    def product(self, kind, x, y):
+        if x.keys is None and y.keys is None:
+            if kind not in self._dense:
+                K, C = self.table(kind)
+                a, b, j = np.nonzero(C)
+                self._dense[kind] = K[a,b,j], a, b, C[a,b,j]
+            k, a, b, c = self._dense[kind]
+            return self._collect(k, c*x.coefs[a]*y.coefs[b])
+        ka, ca = x.nonzero()
+        kb, cb = y.nonzero()
+        k, c = self._terms(kind, ka, kb)
+        return self._collect(k.ravel(), (c*ca[:,None,None]*cb[None,:,None]).ravel())
+
+
+# %%
+class SparseMV:
+    '''
+    a multivector stored as sorted blade masks and coefficients, or densely (keys None, coefs indexed by mask)
+    '''
+    __array_priority__ = 100
+
+    def __init__(self, alg, keys, coefs):
+        self.alg = alg
+        self.keys = keys
+        self.coefs = coefs
+
+    @property
+    def fill(self):
+        return (len(self.keys) if self.keys is not None else np.count_nonzero(self.coefs))/self.alg.N
+
+    def nonzero(self):
+        if self.keys is not None:
+            return self.keys, self.coefs
+        keys = np.nonzero(self.coefs)[0]
+        return keys, self.coefs[keys]
+
+    def to_dense(self):
+        if self.keys is None:
+            return self.coefs.copy()
+        out = np.zeros(self.alg.N)
+        out[self.keys] = self.coefs
+        return out
+
+    def values(self):
+        # coefficients in the clifford blade order
+        return self.to_dense()[self.alg.blades.masks]
+
+    def grade(self, r):
+        keys, coefs = self.nonzero()
+        keep = _popcount(keys) == r
+        return self.alg.make(keys[keep], coefs[keep])
+
+    def _combine(self, other, s):
+        ka, ca = self.nonzero()
+        kb, cb = other.nonzero()
+        keys, inv = np.unique(np.concatenate([ka, kb]), return_inverse=True)
+        coefs = np.bincount(inv, weights=np.concatenate([ca, s*cb]), minlength=len(keys))
+        nz = coefs != 0
+        return self.alg.make(keys[nz], coefs[nz])
+
+    def __add__(self, other):
+        return self._combine(other if isinstance(other, SparseMV) else self.alg.sparse([0], other), 1)
+
+    __radd__ = __add__
+
+    def __sub__(self, other):
+        return self._combine(other if isinstance(other, SparseMV) else self.alg.sparse([0], other), -1)
+
+    def __neg__(self):
+        return SparseMV(self.alg, self.keys, -self.coefs)
+
+    def __mul__(self, other):
+        if isinstance(other, SparseMV):
+            return self.alg.product('gp', self, other)
+        return SparseMV(self.alg, self.keys, self.coefs*other)
+
+    def __rmul__(self, other):
+        return SparseMV(self.alg, self.keys, other*self.coefs)
+
+    def __truediv__(self, other):
+        return SparseMV(self.alg, self.keys, self.coefs/other)
+
+    def __xor__(self, other):
+        return self.alg.product('op', self, other)
+
+    def __lshift__(self, other):
+        # left contraction, as in clifford
+        return self.alg.product('lc', self, other)
+
+    def __invert__(self):
+        # reverse
+        keys, coefs = self.nonzero()
+        g = _popcount(keys)
+        return self.alg.make(keys, np.where((g*(g - 1)//2) % 2, -coefs, coefs))
+
+    def __repr__(self):
+        keys, coefs = self.nonzero()
+        alg = self.alg.blades
+        terms = ['{:g}{}'.format(c, '' if k == 0 else ' ' + alg.label(alg.index[k])) for k, c in zip(keys, coefs)]
+        return ' + '.join(terms).replace('+ -', '- ') or '0'
+
+
+# %% [markdown]
+# ## Crossover
+# Time the product of random multivectors with a given fill ratio, stored sparsely and densely.
+
+# %%
+import time
+
+
+def crossover(alg, fills=np.linspace(0.05, 1, 20), kind='gp', repeat=5, seed=0):
+    '''
+    seconds per product (sparse, dense) for each fill ratio, and the first fill ratio where dense wins
+    '''
+    rng = np.random.default_rng(seed)
+    times = []
+    for f in fills:
+        m = max(int(round(f*alg.N)), 1)
+        xs = [(rng.choice(alg.N, m, replace=False), rng.normal(size=m)) for i in range(2)]
+        sparse = [alg.sparse(k, c) for k, c in xs]
+        dense = [alg.dense(x.to_dense()) for x in sparse]
+        alg.product(kind, *dense)  # build the dense tables outside the timing
+        row = []
+        for x, y in (sparse, dense):
+            best = np.inf
+            for r in range(repeat):
+                start = time.perf_counter()
+                alg.product(kind, x, y)
+                best = min(best, time.perf_counter() - start)
+            row.append(best)
+        times.append(row)
+    times = np.array(times)
+    dense_wins = np.nonzero(times[:,1] < times[:,0])[0]
+    return times, (fills[dense_wins[0]] if len(dense_wins) else None)
+
+
+# %% [markdown]
+# <h4>* Play *</h4>
+# The conformal model of `cm3.py`, with basis $o, e_1, e_2, e_3, \infty$.
+
+# %%
+cm3g = '0 0 0 0 -1, 0 1 0 0 0, 0 0 1 0 0, 0 0 0 1 0, -1 0 0 0 0'
+cm3 = SparseAlgebra(cm3g, ['o', 'e1', 'e2', 'e3', 'oo'])
+
+def pt(x):
+    # o + x + x^2/2 oo
+    x = np.asarray(x, dtype=float)
+    return cm3.vector(np.r_[1, x, 0.5*x.dot(x)])
+
+P, Q, R, S = pt([1, 0, 0]), pt([0, 1, 0]), pt([0, 0, 1]), pt([-1, 0, 0])
+sphere = P ^ Q ^ R ^ S
+# a point is null, and a sphere through the unit points
+P*P, sphere, sphere.fill
+
+# %%
+# sparse and dense storage give the same products
+dense = lambda x: cm3.dense(x.to_dense())
+X = P*Q + (P ^ R)
+np.abs((X*sphere).to_dense() - cm3.product('gp', dense(X), dense(sphere)).to_dense()).max()
+
+# %%
+# the wedge of four points, sparse and dense
+start = time.perf_counter()
+for i in range(200):
+    P ^ Q ^ R ^ S
+t_sparse = (time.perf_counter() - start)/200
+Pd, Qd, Rd, Sd = map(dense, [P, Q, R, S])
+start = time.perf_counter()
+for i in range(200):
+    cm3.product('op', cm3.product('op', cm3.product('op', Pd, Qd), Rd), Sd)
+t_dense = (time.perf_counter() - start)/200
+t_sparse, t_dense
+
+# %% [markdown]
+# The crossover, for `cm3` (32 blades, metric not diagonal) and for $\mathbb{R}^8$ (256 blades): the first fill ratio where the dense product is faster, next to the default thresholds.
+
+# %%
+fills = np.linspace(0.05, 1, 20)
+times_cm3, cross_cm3 = crossover(cm3, fills)
+R8 = SparseAlgebra([1]*8)
+times_r8, cross_r8 = crossover(R8, fills)
+cross_cm3, cross_r8, cm3.threshold, R8.threshold
+
+# %%
+import matplotlib.pyplot as plt
+
+fig, axes = plt.subplots(1, 2, figsize=(10, 4))
+for ax, times, title in zip(axes, [times_cm3, times_r8], ['cm3, 32 blades', 'R(8), 256 blades']):
+    ax.semilogy(fills, 1e6*times[:,0], label='sparse')
+    ax.semilogy(fills, 1e6*times[:,1], label='dense')
+    ax.set_xlabel('fill ratio')
+    ax.set_ylabel('microseconds per product')
+    ax.set_title(title)
+    ax.legend()
+
+# %%
+# without tables, products work with a diagonal metric only, so a null pair in 11 dimensions is refused
+G = np.eye(11)
+G[0,0] = G[10,10] = 0
+G[0,10] = G[10,0] = -1
+try:
+    SparseAlgebra(G.tolist())
+except ValueError as err:
+    print(err)
+
+# %%
+# a dimension where dense storage is out of the question: vectors and bivectors of R(20)
+R20 = SparseAlgebra([1]*20)
+rng = np.random.default_rng(1)
+a, b = R20.vector(rng.normal(size=20)), R20.vector(rng.normal(size=20))
+B = a ^ b
+start = time.perf_counter()
+rotated = B*a*~B
+# a sandwiched by the bivector B of its own plane is a vector: only the 20 grade 1 blades are left after dropping roundoff
+time.perf_counter() - start, len(rotated.keys), R20.N
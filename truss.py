@@ -0,0 +1,433 @@
+# ---
+# title: Sparse truss solver
+# jupyter:
+#   jupytext:
+#     cell_metadata_filter: all,-autoscroll,-collapsed,-scrolled,-trusted,-ExecuteTime
+#     notebook_metadata_filter: kernelspec,jupytext,-jupytext.text_representation.jupytext_version
+#     text_representation:
+#       extension: .py
+#       format_name: percent
+#       format_version: '1.3'
+#   kernelspec:
+#     display_name: Python [conda env:galgebra]
+#     language: python
+#     name: conda-env-galgebra-py
+# ---
+
+# %% [markdown]
+# Generalizing Example 3 of `statics.py` to trusses of any size.
+#
+# Each link is a force line $t_k \widehat{A\vee B}$ through its two joints, where $t_k$ is the (unknown) tension.
+# At every free joint the sum of all force lines through it, link forces and applied loads, must vanish.
+# All of the forces at a joint pass through the same point, so the moment ($e_{01}, e_{02}, e_{03}$) part of the sum vanishes as soon as the direction ($e_{23}, e_{13}, e_{12}$) part does, and the direction part gives three linear equations per joint.
+# Stacking them for all joints gives a sparse equilibrium matrix $A$ with $A\,t = -f$, where $f$ holds the loads.
+#
+# Joints in `supports` are fastened to the ground.  They have no equations; instead their reaction forces are computed afterwards from the link tensions, as full force lines.
+#
+# Force lines are arrays of bivector coefficients, in the conventions of `pga3array.py`.
+#
+# Only pin-jointed trusses (links carrying pure tension or compression) are handled; frames with bending moments are not.
+
+# %%
+import numpy as np
+import warnings
+import scipy.sparse as sp
+from scipy.sparse.linalg import splu, lsqr
+from scipy.sparse.csgraph import structural_rank
+from pga3array import points, join_lines, force_lines, force_vectors
+
+
+# %% [markdown]
+# ## Equilibrium matrix
+# Column $k$ of $A$ holds the direction part of link $k$'s force line at each of its two joints: $+\hat{d}_k$ at the first joint (the link pulls it toward the second) and $-\hat{d}_k$ at the second.
+
+# %%
+def equilibrium_matrix(nodes, links, supports=()):
+    # returns sparse A (3 rows per joint, zero rows for supports) and the link force lines
+    nodes = points(nodes)
+    links = np.asarray(links, dtype=int)
+    L = join_lines(nodes[links[:,0]], nodes[links[:,1]])
+    d = force_vectors(L)
+    free = np.ones(len(nodes), dtype=bool)
+    free[list(supports)] = False
+    k = np.arange(len(links))
+    rows, cols, vals = [], [], []
+    for end, sign in ((0, 1.), (1, -1.)):
+        j = links[:,end]
+        keep = free[j]
+        for c in range(3):
+            rows.append(3*j[keep] + c)
+            cols.append(k[keep])
+            vals.append(sign*d[keep,c])
+    A = sp.csr_matrix((np.concatenate(vals), (np.concatenate(rows), np.concatenate(cols))),
+                      shape=(3*len(nodes), len(links)))
+    A.eliminate_zeros()
+    return A, L
+
+
+# %%
+def _free_rows(n_nodes, supports):
+    # equations of the joints not fastened to the ground; loads on supports go to the reactions
+    free = np.ones((n_nodes, 3), dtype=bool)
+    free[list(supports)] = False
+    return free.reshape(-1)
+
+
+# %%
+def load_vector(loads, n_nodes):
+    # loads: (n_nodes, 6) force lines or (n_nodes, 3) force vectors at the joints
+    if loads is None:
+        return np.zeros(3*n_nodes)
+    loads = np.asarray(loads, dtype=float)
+    if loads.shape[-1] == 6:
+        loads = force_vectors(loads)
+    return loads.reshape(-1)
+
+
+# %% [markdown]
+# ## Solving
+# With $m$ links and $n$ equations (empty rows dropped, e.g. the $z$ rows of a planar truss, unless they carry a load):
+# * $m = n$ and $A$ nonsingular: statically determinate, sparse LU.
+# * $m > n$: statically indeterminate.  Statics alone does not fix the tensions; we return the minimum norm solution $t = A^T (A A^T)^{-1}(-f)$.
+# * rank below $n$: a mechanism.  Loads outside the range of $A$ cannot be carried; we return the least squares solution and a nonzero residual.
+#
+# The rank is the structural rank of $A$ (from its sparsity pattern), lowered by the pivots of the LU factors that are below $10^{-12}$ of the largest: the factors of $A$ when it is square, of $AA^T$ or $A^TA$ otherwise.
+# An exactly singular matrix has no factors, and its pivots are those of $A^TA$ (or $AA^T$) shifted by $10^{-14}$ of its largest diagonal entry.
+# A collinear pair of links, for example, has a full sparsity pattern but rank 1.
+
+# %%
+def _classify(A, n_eq, n_links):
+    rank = int(structural_rank(A)) if A.nnz else 0
+    return {'equations': n_eq, 'links': n_links, 'rank': rank,
+            'indeterminate': n_links - rank,  # degree of static indeterminacy
+            'mechanism': n_eq - rank,         # number of independent mechanisms
+            'singular': False}
+
+
+# %%
+def _factor(A):
+    '''
+    LU factors of A if square, else of the smaller of A A^T and A^T A, or None when exactly singular
+    also returns the numerical rank of A from the pivots
+    '''
+    n_eq, n_links = A.shape
+    G = A if n_eq == n_links else A.dot(A.T) if n_eq < n_links else A.T.dot(A)
+    try:
+        lu = splu(G.tocsc())
+        p = np.abs(lu.U.diagonal())
+    except RuntimeError:
+        lu = None
+        G = A.T.dot(A) if n_eq >= n_links else G
+        shift = 1e-14*np.abs(G.diagonal()).max() if G.nnz else 1.
+        p = np.abs(splu((G + shift*sp.identity(G.shape[0])).tocsc()).U.diagonal())
+    rank = int((p > 1e-12*p.max()).sum()) if len(p) else 0
+    return lu, rank
+
+
+def _update_rank(report, rank):
+    # the smaller of the structural and the numerical rank
+    rank = min(report['rank'], rank)
+    report.update(rank=rank, indeterminate=report['links'] - rank, mechanism=report['equations'] - rank)
+
+
+def _solve(A, f, report):
+    n_eq, n_links = A.shape
+    lu, rank = _factor(A)
+    _update_rank(report, rank)
+    t = None
+    if lu is not None and rank == min(n_eq, n_links):
+        if n_eq == n_links:
+            t = lu.solve(f)
+        elif n_eq < n_links:
+            t = A.T.dot(lu.solve(f))
+        else:
+            t = lu.solve(A.T.dot(f))
+    if t is None or not np.all(np.isfinite(t)):
+        # singular: fall back on the iterative least squares solver
+        report['singular'] = True
+        t = lsqr(A, f, atol=1e-12, btol=1e-12)[0]
+    return t
+
+
+# %%
+def solve_truss(nodes, links, supports=(), loads=None):
+    '''
+    tensions in the links of a pin-jointed truss
+    nodes: (n, 2) or (n, 3) joint positions
+    links: (m, 2) pairs of joint indices
+    supports: indices of joints fastened to the ground
+    loads: (n, 6) force lines or (n, 3) force vectors applied at the joints
+    returns tensions (m,), reactions at the supports as (len(supports), 6) force lines, and a report dict
+    '''
+    nodes = points(nodes)
+    A, L = equilibrium_matrix(nodes, links, supports)
+    f = load_vector(loads, len(nodes))
+    free = _free_rows(len(nodes), supports)
+    # equations with links, and loaded ones without (which no link can carry: a mechanism)
+    used = (np.diff(A.indptr) > 0) | ((f != 0) & free)
+    Ar = A[used]
+    report = _classify(Ar, Ar.shape[0], Ar.shape[1])
+    t = _solve(Ar, -f[used], report)
+    report['residual'] = np.linalg.norm((A.dot(t) + f)[free])
+    return t, reactions(nodes, links, supports, t, loads), report
+
+
+# %%
+def reactions(nodes, links, supports, tensions, loads=None):
+    # reaction force lines at the supports: minus the sum of everything else acting there
+    nodes = points(nodes)
+    links = np.asarray(links, dtype=int)
+    supports = np.asarray(supports, dtype=int)
+    L = tensions[:,None]*join_lines(nodes[links[:,0]], nodes[links[:,1]])
+    total = np.zeros((len(nodes), 6))
+    np.add.at(total, links[:,0], L)
+    np.add.at(total, links[:,1], -L)
+    if loads is not None:
+        loads = np.asarray(loads, dtype=float)
+        if loads.shape[-1] == 3:
+            loads = force_lines(nodes, loads)
+        total += loads
+    return -total[supports]
+
+
+# %% [markdown]
+# ## Many load cases on one geometry
+# `TrussFactor` factors the equilibrium system once and then solves a whole `(3*n_nodes, K)` block of load vectors (joint force vectors, flattened as in `load_vector`) per call.
+#
+# The tensions are the minimum norm solution of $A t = -f$, i.e. the solution of the saddle point (KKT) system
+# $$
+# K \begin{pmatrix} t \\ \lambda \end{pmatrix} =
+# \begin{pmatrix} I & A^T \\ A & 0 \end{pmatrix}
+# \begin{pmatrix} t \\ \lambda \end{pmatrix} =
+# \begin{pmatrix} 0 \\ -f \end{pmatrix}.
+# $$
+# For a square (determinate) $A$ we only keep the LU factors of $A$ and apply $K^{-1}$ through them ($t = A^{-1}g$, $\lambda = A^{-T}(r - t)$); otherwise $K$ itself is factored.
+#
+# Adding or removing a link borders $K$ with one row and column:
+# * adding link $a$: a new unknown $t_a$ with border $(0, a)$ and diagonal 1,
+# * removing link $k$: a new multiplier enforcing $t_k = 0$, with border $(e_k, 0)$ and diagonal 0.
+#
+# With all borders collected in $V$ and diagonal $C$, the bordered system is solved with the old factors and the small Schur complement $S = C - V^T K^{-1} V$, so an update costs one extra solve instead of a new factorization.
+# After `max_updates` borders the matrix is refactored.
+#
+# Link indices stay fixed: added links are appended to `links`, and removed links keep their index with zero tension.
+
+# %%
+class TrussFactor:
+    '''
+    factored equilibrium system of one truss geometry, reused for many load cases
+    '''
+    def __init__(self, nodes, links, supports=(), max_updates=32):
+        self.nodes = points(nodes)
+        self.links = np.asarray(links, dtype=int).reshape(-1, 2)
+        self.supports = list(supports)
+        self.active = np.ones(len(self.links), dtype=bool)
+        self.max_updates = max_updates
+        self.refactor()
+
+    def refactor(self):
+        # factor the active links from scratch and drop all updates
+        self._base = np.flatnonzero(self.active)
+        A, _ = equilibrium_matrix(self.nodes, self.links[self._base], self.supports)
+        self._A_full = A
+        self.rows = np.flatnonzero(np.diff(A.indptr) > 0)
+        self.A = A[self.rows].tocsc()
+        n_eq, m = self.A.shape
+        self.report = _classify(self.A, n_eq, m)
+        lu, rank = _factor(self.A)
+        _update_rank(self.report, rank)
+        self._lu = self._kkt = None
+        if n_eq == m and rank == m:
+            self._lu = lu
+        elif rank == n_eq:
+            self._kkt = splu(sp.bmat([[sp.identity(m), self.A.T], [self.A, None]]).tocsc())
+        else:
+            # mechanism: regularize the multiplier block, giving damped least squares tensions
+            self.report['singular'] = True
+            warnings.warn("Equilibrium matrix is singular (mechanism). Using regularized least squares.")
+            self._kkt = splu(sp.bmat([[sp.identity(m), self.A.T],
+                                      [self.A, -1e-10*sp.identity(n_eq)]]).tocsc())
+        self._extra = []   # ('add' or 'remove', link index) for each border
+        self._cols = {}    # full-row columns (rows, values) of added links
+        self.V = np.zeros((m + n_eq, 0))
+        self.W = np.zeros((m + n_eq, 0))
+        self.C = np.zeros(0)
+
+    def _kinv(self, b):
+        # K^-1 b for a block b of shape (m + n_eq, K)
+        if self._lu is None:
+            return self._kkt.solve(b)
+        m = self.A.shape[1]
+        t = self._lu.solve(b[m:])
+        lam = self._lu.solve(b[:m] - t, trans='T')
+        return np.concatenate([t, lam])
+
+    def _border(self, v, c, kind, k):
+        self._extra.append((kind, k))
+        self.V = np.column_stack([self.V, v])
+        self.W = np.column_stack([self.W, self._kinv(v[:,None])])
+        self.C = np.append(self.C, c)
+
+    def _drop_border(self, q):
+        del self._extra[q]
+        self.V = np.delete(self.V, q, axis=1)
+        self.W = np.delete(self.W, q, axis=1)
+        self.C = np.delete(self.C, q)
+
+    def add_link(self, i, j):
+        # add a link between joints i and j, returns its index
+        self.links = np.vstack([self.links, [i, j]])
+        self.active = np.append(self.active, True)
+        k = len(self.links) - 1
+        a, _ = equilibrium_matrix(self.nodes, [[i, j]], self.supports)
+        a = a.tocsc()
+        if not np.isin(a.indices, self.rows).all() or len(self._extra) >= self.max_updates:
+            # the link reaches equations outside the factored system
+            self.refactor()
+            return k
+        self._cols[k] = (a.indices, a.data)
+        v = np.zeros(self.V.shape[0])
+        v[len(self._base) + np.searchsorted(self.rows, a.indices)] = a.data
+        self._border(v, 1., 'add', k)
+        return k
+
+    def remove_link(self, k):
+        if not self.active[k]:
+            raise ValueError("link {} was already removed".format(k))
+        self.active[k] = False
+        if ('add', k) in self._extra:
+            self._drop_border(self._extra.index(('add', k)))
+            del self._cols[k]
+        elif len(self._extra) >= self.max_updates:
+            self.refactor()
+        else:
+            v = np.zeros(self.V.shape[0])
+            v[np.searchsorted(self._base, k)] = 1.
+            self._border(v, 0., 'remove', k)
+
+    def solve(self, F):
+        '''
+        tensions for a block of load vectors F, shape (3*n_nodes,) or (3*n_nodes, K)
+        returns tensions (n_links,) or (n_links, K) and the equilibrium residual of each load case
+        '''
+        F = np.asarray(F, dtype=float)
+        single = F.ndim == 1
+        F = F.reshape(len(F), -1)
+        m = len(self._base)
+        b = np.zeros((self.V.shape[0], F.shape[1]))
+        b[m:] = -F[self.rows]
+        z = self._kinv(b)
+        t = np.zeros((len(self.links), F.shape[1]))
+        if self._extra:
+            S = np.diag(self.C) - self.V.T.dot(self.W)
+            if np.linalg.cond(S) > 1e12:
+                warnings.warn("Update made the truss a mechanism. Using least squares.")
+                y = np.linalg.lstsq(S, -self.V.T.dot(z), rcond=None)[0]
+            else:
+                y = np.linalg.solve(S, -self.V.T.dot(z))
+            z -= self.W.dot(y)
+            for q, (kind, k) in enumerate(self._extra):
+                if kind == 'add':
+                    t[k] = y[q]
+        t[self._base] = z[:m]
+        t[~self.active] = 0
+        # residual of the links actually present
+        r = self._A_full.dot(t[self._base]) + F
+        for k, (rows, vals) in self._cols.items():
+            r[rows] += vals[:,None]*t[k]
+        residual = np.linalg.norm(r[_free_rows(len(self.nodes), self.supports)], axis=0)
+        if single:
+            return t[:,0], residual[0]
+        return t, residual
+
+
+# %% [markdown]
+# ## Example 3 from `statics.py`
+# Joints $A, B, C, D$; links $AB, AC, BC, BD, CD$; $A$ and $B$ fastened; $W = 100\,\mathrm{N}$ at $D$ in the $-y$ direction.
+#
+# Link $AB$ joins two fastened joints, so statics says nothing about it: the truss is indeterminate of degree 1, and the minimum norm solution puts no tension in $AB$.
+
+# %%
+nodes = np.array([[0,0],[1,0],[0.5,np.sqrt(3)/2],[1.5,np.sqrt(3)/2]])
+A_, B_, C_, D_ = range(4)
+links = [(A_,B_),(A_,C_),(B_,C_),(B_,D_),(C_,D_)]
+loads = np.zeros((4,3))
+loads[D_] = [0,-100.,0]
+
+# %%
+tensions, R, report = solve_truss(nodes, links, supports=[A_,B_], loads=loads)
+dict(zip(['AB','AC','BC','BD','CD'], tensions.round(3)))
+
+# %%
+report
+
+# %%
+# total of the reactions and the weight (as force lines) is zero
+R.sum(axis=0) + force_lines(nodes[D_], loads[D_])
+
+# %% [markdown]
+# Two collinear links cannot carry a transverse load at their common joint, whether the $y$ equation of the joint is empty (links along $x$) or not (links along the diagonal): both are mechanisms, with the load left in the residual.
+
+# %%
+line_loads = np.array([[0, 0, 0], [1, -1, 0], [0, 0, 0]])
+(solve_truss([[0, 0], [1, 0], [2, 0]], [[0, 1], [1, 2]], [0, 2], line_loads)[2],
+ solve_truss([[0, 0], [1, 1], [2, 2]], [[0, 1], [1, 2]], [0, 2], line_loads)[2])
+
+# %% [markdown]
+# ## A large cantilever truss
+# Bottom joints $b_i = (i, 0)$, top joints $t_i = (i, 1)$, with chords, verticals and diagonals, fastened at $b_0, t_0$ and loaded at the free end.
+# Each added bay adds 2 joints and 4 links, so the truss is statically determinate.
+
+# %%
+def cantilever(n):
+    i = np.arange(n+1)
+    nodes = np.concatenate([np.column_stack([i, 0*i]), np.column_stack([i, 0*i+1])])
+    b, t = i, i + n + 1
+    links = np.concatenate([
+        np.column_stack([b[:-1], b[1:]]),   # bottom chord
+        np.column_stack([t[:-1], t[1:]]),   # top chord
+        np.column_stack([b[1:], t[1:]]),    # verticals
+        np.column_stack([b[:-1], t[1:]]),   # diagonals
+    ])
+    return nodes, links, [b[0], t[0]]
+
+
+# %%
+nodes, links, supports = cantilever(25000)
+loads = np.zeros((len(nodes),3))
+loads[25000] = [0,-1.,0]
+len(links)
+
+# %%
+# %time tensions, R, report = solve_truss(nodes, links, supports, loads)
+tensions, R, report = solve_truss(nodes, links, supports, loads)
+report
+
+# %%
+# removing a diagonal turns one bay into a mechanism
+tensions, R, report = solve_truss(nodes, np.delete(links, -1, axis=0), supports, loads)
+report
+
+# %% [markdown]
+# ## Many load cases
+# Factor the cantilever once, then solve a block of load cases: a unit downward load at each of the last 100 bottom joints.
+
+# %%
+nodes, links, supports = cantilever(25000)
+# %time truss = TrussFactor(nodes, links, supports)
+truss = TrussFactor(nodes, links, supports)
+
+# %%
+F = np.zeros((3*len(nodes), 100))
+for case in range(100):
+    F[3*(25000 - case) + 1, case] = -1.
+# %time tensions, residual = truss.solve(F)
+tensions, residual = truss.solve(F)
+residual.max()
+
+# %%
+# add a second diagonal in the last bay, then remove the original one, without refactoring
+k = truss.add_link(24999 + 25001, 25000)
+truss.remove_link(len(links) - 1)
+tensions, residual = truss.solve(F)
+residual.max(), tensions[k, :3]
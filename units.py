@@ -0,0 +1,287 @@
+# ---
+# title: Dimensional units for PGA multivectors
+# jupyter:
+#   jupytext:
+#     cell_metadata_filter: all,-autoscroll,-collapsed,-scrolled,-trusted,-ExecuteTime
+#     notebook_metadata_filter: kernelspec,jupytext,-jupytext.text_representation.jupytext_version
+#     text_representation:
+#       extension: .py
+#       format_name: percent
+#       format_version: '1.3'
+#   kernelspec:
+#     display_name: Python [conda env:galgebra]
+#     language: python
+#     name: conda-env-galgebra-py
+# ---
+
+# %% [markdown]
+# Checking the conventions of `PGAunits.md` in code:
+# * basis elements are dimensionless,
+# * all coefficients of a $k$-vector share units, so a multivector carries one dimension per grade,
+# * the products $\wedge$, $\vee$ and the geometric product multiply units (join lines of two points have units of length², etc.),
+# * normalizing divides by the norm _including its units_, so a normalized point or line is dimensionless,
+# * $A\wedge A^\star = I$ with $I$ dimensionless, so the dual has reciprocal units: the dual of a point in length is a hyperplane in 1/length.
+#
+# A dimension is a tuple of exponents of (length, mass, time).
+# `Q(mv, L=1)` wraps a `clifford` multivector in a `Quantity` that propagates the dimension of each grade through the operations and raises `UnitsError` on an inconsistent mix (adding a point in cm to a line, or a product whose terms land on the same grade with different units).
+#
+# In _release_ mode `Q` returns the bare multivector, so there is nothing left to check and code written with `Q` runs at the speed of plain `clifford`.
+# Release mode is switched on with `set_release(True)` or by setting the environment variable `GA_UNITS=release` before importing.
+
+# %%
+import os
+import time
+import numpy as np
+
+# %%
+base = ('L', 'M', 'T')
+dimensionless = (0, 0, 0)
+release = os.environ.get('GA_UNITS', '') == 'release'
+
+
+# %%
+def set_release(flag=True):
+    # Quantities made before switching keep checking
+    global release
+    release = bool(flag)
+
+
+# %%
+class UnitsError(ValueError):
+    pass
+
+
+# %%
+def dim(L=0, M=0, T=0):
+    return (L, M, T)
+
+def _add(a, b):
+    return tuple(x + y for x, y in zip(a, b))
+
+def _neg(a):
+    return tuple(-x for x in a)
+
+def dim_str(d):
+    # (2, 1, -2) --> 'L^2 M T^-2'
+    s = ' '.join(b if x == 1 else '{}^{}'.format(b, x) for b, x in zip(base, d) if x != 0)
+    return s or '1'
+
+
+# %%
+class Quantity:
+    '''
+    a multivector with a dimension for each of its grades
+    dims: a dict {grade: dimension}, or a single dimension shared by all the grades of mv
+    '''
+    __array_priority__ = 100  # keep numpy scalars from broadcasting over us
+
+    def __init__(self, mv, dims=dimensionless):
+        self.mv = mv
+        if isinstance(dims, dict):
+            self.dims = {int(k): d for k, d in dims.items() if k in mv.grades()}
+        else:
+            self.dims = {int(k): tuple(dims) for k in mv.grades()}
+
+    def __repr__(self):
+        return ' + '.join('({})[{}]'.format(self.mv(k), dim_str(d)) for k, d in sorted(self.dims.items())) or '0'
+
+    def dim(self):
+        # the single dimension of a homogeneous quantity
+        ds = set(self.dims.values())
+        if len(ds) > 1:
+            raise UnitsError("Mixed units: {}".format(self))
+        return ds.pop() if ds else dimensionless
+
+    # addition: matching grades must have the same units
+    def __add__(self, other):
+        other = _wrap(other, self.mv)
+        dims = dict(self.dims)
+        for k, d in other.dims.items():
+            if dims.setdefault(k, d) != d:
+                raise UnitsError("Cannot add grade {} parts with units {} and {}".format(k, dim_str(dims[k]), dim_str(d)))
+        return Quantity(self.mv + other.mv, dims)
+
+    __radd__ = __add__
+
+    def __sub__(self, other):
+        return self + (-_wrap(other, self.mv))
+
+    def __rsub__(self, other):
+        return _wrap(other, self.mv) - self
+
+    def __neg__(self):
+        return Quantity(-self.mv, self.dims)
+
+    def __invert__(self):
+        return Quantity(~self.mv, self.dims)
+
+    # products: units multiply, grade pair by grade pair
+    def _product(self, other, op):
+        out = {}
+        for ka, da in self.dims.items():
+            for kb, db in other.dims.items():
+                d = _add(da, db)
+                for k in op(self.mv(ka), other.mv(kb)).grades():
+                    k = int(k)
+                    if out.setdefault(k, d) != d:
+                        raise UnitsError("Product terms of grade {} with units {} and {}".format(k, dim_str(out[k]), dim_str(d)))
+        return Quantity(op(self.mv, other.mv), out)
+
+    def __mul__(self, other):
+        return self._product(_wrap(other, self.mv), lambda a, b: a*b)
+
+    def __rmul__(self, other):
+        return _wrap(other, self.mv)._product(self, lambda a, b: a*b)
+
+    def __xor__(self, other):
+        return self._product(_wrap(other, self.mv), lambda a, b: a ^ b)
+
+    def __rxor__(self, other):
+        return _wrap(other, self.mv)._product(self, lambda a, b: a ^ b)
+
+    def __and__(self, other):
+        return self._product(_wrap(other, self.mv), lambda a, b: a & b)
+
+    def __rand__(self, other):
+        return _wrap(other, self.mv)._product(self, lambda a, b: a & b)
+
+    def __or__(self, other):
+        return self._product(_wrap(other, self.mv), lambda a, b: a | b)
+
+    def __ror__(self, other):
+        return _wrap(other, self.mv)._product(self, lambda a, b: a | b)
+
+    def inv(self):
+        return Quantity(self.mv.inv(), _neg(self.dim()))
+
+    def __truediv__(self, other):
+        return self*_wrap(other, self.mv).inv()
+
+    def __rtruediv__(self, other):
+        return _wrap(other, self.mv)*self.inv()
+
+    # A ^ A* = I with I dimensionless, so the dual has the reciprocal units (points in length, hyperplanes in 1/length)
+    def dual(self):
+        n = self.mv.layout.dims
+        return Quantity(self.mv.dual(), {n - k: _neg(d) for k, d in self.dims.items()})
+
+    def __call__(self, grade):
+        return Quantity(self.mv(grade), {grade: self.dims[grade]} if grade in self.dims else {})
+
+    def normal(self):
+        # dividing by the norm, units included, leaves a dimensionless multivector
+        self.dim()
+        return Quantity(self.mv.normal(), dimensionless)
+
+    def strip(self):
+        return self.mv
+
+
+# %%
+def _wrap(x, like):
+    # plain numbers and multivectors are dimensionless
+    if isinstance(x, Quantity):
+        return x
+    if not hasattr(x, 'layout'):
+        x = like.layout.scalar*x
+    return Quantity(x, dimensionless)
+
+
+# %%
+def Q(mv, L=0, M=0, T=0, dims=None):
+    '''
+    attach units to the multivector mv: Q(p, L=1) for a point in length units
+    with dims={grade: dimension} each grade gets its own units
+    in release mode mv itself is returned
+    '''
+    if release:
+        return mv
+    return Quantity(mv, dim(L, M, T) if dims is None else dims)
+
+
+# %%
+def strip(x):
+    # the bare multivector, in either mode
+    return x.mv if isinstance(x, Quantity) else x
+
+
+# %%
+def units(x):
+    # {grade: dimension string}, empty in release mode
+    return {k: dim_str(d) for k, d in x.dims.items()} if isinstance(x, Quantity) else {}
+
+
+# %% [markdown]
+# ## Checks
+# Example 1 from `statics.py` with units attached: positions in cm, the weight in N (kg m s⁻²).
+
+# %%
+from clifford.pga import layout, e0, e1, e2
+
+N = dim(L=1, M=1, T=-2)
+
+M = Q((e0).dual(), L=1)
+P1 = Q((e0 - 4*e1 + 3*e2).dual(), L=1)
+units(M), units(M & P1), units((M & P1).normal())
+
+# %%
+# force lines: magnitude (N) times a normalized line
+Fg = Q(10*layout.scalar, dims={0: N})*(M & Q((-e2).dual(), L=1)).normal()
+T1 = Q(10/1.2*layout.scalar, dims={0: N})*(M & P1).normal()
+units(Fg + T1)
+
+# %%
+# the dual of a point in cm has the units of a hyperplane, here a line, in 1/cm; adding a line in cm to it is caught
+line = Q(e1 - 4*e0, L=-1)
+units(P1.dual()), units(P1.dual() + line)
+
+# %%
+try:
+    P1.dual() + Q(e1 - 4*e0, L=1)
+except UnitsError as err:
+    print(err)
+
+# %%
+# adding a point in cm to a normalized (dimensionless) point is caught
+try:
+    M + P1.normal()
+except UnitsError as err:
+    print(err)
+
+# %% [markdown]
+# ## Overhead
+# The inner loop of the statics examples (join, normalize, scale and sum force lines) timed with plain `clifford`, with checked quantities, and in release mode.
+
+# %%
+def force_sum(points, anchor, magnitude):
+    total = 0*magnitude*(anchor & points[0]).normal()
+    for p in points:
+        total = total + magnitude*(anchor & p).normal()
+    return total
+
+
+# %%
+def benchmark(n=200, repeat=3):
+    rng = np.random.default_rng(0)
+    raw = [(e0 + x*e1 + y*e2).dual() for x, y in rng.normal(size=(n, 2))]
+    was = release
+    times = {}
+    for mode in ['clifford', 'checked', 'release']:
+        set_release(mode == 'release')
+        if mode == 'clifford':
+            args = raw, (e0).dual(), 10*layout.scalar
+        else:
+            args = [Q(p, L=1) for p in raw], Q((e0).dual(), L=1), Q(10*layout.scalar, dims={0: N})
+        best = np.inf
+        for i in range(repeat):
+            start = time.perf_counter()
+            force_sum(*args)
+            best = min(best, time.perf_counter() - start)
+        times[mode] = best/n
+    set_release(was)
+    return times
+
+
+# %%
+# seconds per force line; release mode matches plain clifford
+benchmark()
@@ -0,0 +1,173 @@
+# ---
+# title: Force systems in 3D PGA
+# jupyter:
+#   jupytext:
+#     cell_metadata_filter: all,-autoscroll,-collapsed,-scrolled,-trusted,-ExecuteTime
+#     notebook_metadata_filter: kernelspec,jupytext,-jupytext.text_representation.jupytext_version
+#     text_representation:
+#       extension: .py
+#       format_name: percent
+#       format_version: '1.3'
+#   kernelspec:
+#     display_name: Python [conda env:galgebra]
+#     language: python
+#     name: conda-env-galgebra-py
+# ---
+
+# %% [markdown]
+# In `statics.py` every force is a bivector $\bar{F} = F\,\mathbf{r}\vee\mathbf{u}$ and equilibrium means the sum of all the force bivectors vanishes.
+# Here a whole system of forces is one `(N, 6)` array of bivector coefficients (conventions of `pga3array.py`), so the sum is a single `np.sum`.
+#
+# The sum of a force system is a general bivector $B$, a _wrench_, which is not necessarily a line.
+# It splits into a force along its central axis $\ell$ plus a couple about that axis,
+# $$ B = \ell + h\,\ell_\infty, $$
+# where $\ell_\infty$ is the ideal line (pure couple) with the same direction as $\ell$ and $h$ is the pitch.
+# In terms of the algebra $B\cdot B = -\lVert F\rVert^2$ and $B\wedge B = 2h\lVert F\rVert^2 e_{0123}$, so $h = -\dfrac{B\wedge B}{2\,B\cdot B}$.
+# In vector terms, with resultant force $\mathbf{F}$ and moment $\mathbf{M}$ about the origin, $h = \mathbf{F}\cdot\mathbf{M}/\lVert\mathbf{F}\rVert^2$ and the axis passes through $\mathbf{F}\times\mathbf{M}/\lVert\mathbf{F}\rVert^2$.
+#
+# For several bodies, each force carries a body ID and the sums per body are segment reductions (`np.add.reduceat`) over the forces sorted by body.
+
+# %%
+import numpy as np
+from pga3array import force_lines, force_vectors, moments, from_multivectors
+
+
+# %%
+def central_axis(B):
+    '''
+    decompose wrenches B (..., 6) into central axis force lines (..., 6) and pitches (...)
+    pure couples (no force) have pitch inf and return the couple itself as an ideal line
+    '''
+    B = np.asarray(B, dtype=float)
+    F = force_vectors(B)
+    M = moments(B)
+    F2 = np.einsum('...i,...i->...', F, F)
+    couple = F2 == 0
+    with np.errstate(divide='ignore', invalid='ignore'):
+        h = np.where(couple, np.inf, np.einsum('...i,...i->...', F, M)/F2)
+    axis = B.copy()
+    axis[...,0:3] = M - np.where(couple, 0, h)[...,None]*F
+    return axis, h
+
+
+# %%
+def axis_point(B):
+    # point of the central axis closest to the origin
+    F = force_vectors(B)
+    return np.cross(F, moments(B))/np.einsum('...i,...i->...', F, F)[...,None]
+
+
+# %%
+class ForceSystem:
+    '''
+    N forces as force lines, an (N, 6) array of bivector coefficients, with an optional body ID per force
+    '''
+    def __init__(self, lines, body=None):
+        self.lines = np.asarray(lines, dtype=float).reshape(-1, 6)
+        self.body = None if body is None else np.asarray(body, dtype=int)
+        self._order = None
+
+    @classmethod
+    def from_forces(cls, p, F, body=None):
+        # forces F (N, 3) applied at points p (N, 3)
+        return cls(force_lines(p, F), body)
+
+    @classmethod
+    def from_multivectors(cls, mvs, body=None):
+        # list of clifford.pga bivectors, e.g. [F, Fg, W]
+        return cls(from_multivectors(mvs), body)
+
+    def __len__(self):
+        return len(self.lines)
+
+    def __add__(self, other):
+        if (self.body is None) != (other.body is None):
+            raise ValueError("Cannot combine force systems with and without body IDs")
+        body = None if self.body is None else np.concatenate([self.body, other.body])
+        return ForceSystem(np.concatenate([self.lines, other.lines]), body)
+
+    def resultant(self):
+        # total wrench of all forces (einsum is ~3x faster than sum(axis=0) on tall arrays)
+        return np.einsum('ij->j', self.lines)
+
+    def _sorted(self):
+        # forces sorted by body, computed once (skipped if the IDs are already sorted)
+        if self._order is None:
+            if np.all(self.body[1:] >= self.body[:-1]):
+                self._order = slice(None)
+            else:
+                self._order = np.argsort(self.body, kind='stable')
+        return self.lines[self._order], self.body[self._order]
+
+    def by_body(self, n_bodies=None):
+        # total wrench on each body, shape (n_bodies, 6)
+        if self.body is None:
+            return self.resultant()[None,:]
+        lines, body = self._sorted()
+        if n_bodies is None:
+            n_bodies = body[-1] + 1 if len(body) else 0
+        out = np.zeros((n_bodies, 6))
+        if len(body) == 0:
+            return out
+        starts = np.flatnonzero(np.r_[True, body[1:] != body[:-1]])
+        out[body[starts]] = np.add.reduceat(lines, starts, axis=0)
+        return out
+
+    def central_axes(self, n_bodies=None):
+        # central axis and pitch of the wrench on each body
+        return central_axis(self.by_body(n_bodies))
+
+    def in_equilibrium(self, tol=1e-9, n_bodies=None):
+        # True for bodies whose wrench vanishes, relative to the size of the forces on them
+        W = self.by_body(n_bodies)
+        if self.body is None:
+            scale = np.abs(self.lines).sum()
+        else:
+            lines, body = self._sorted()
+            scale = np.zeros(len(W))
+            np.add.at(scale, body, np.abs(lines).sum(axis=1))
+        return np.abs(W).sum(axis=1) <= tol*np.maximum(scale, 1.)
+
+
+# %% [markdown]
+# ## Example 1 from `statics.py`
+# The 1 kg mass held by two strings: the tensions $T_1 = T_2 = 8.33\,\mathrm{N}$ along the string lines balance gravity.
+
+# %%
+from clifford.pga import *
+
+M = (e0).dual()
+P1 = (e0 - 4*e1 + 3*e2).dual()
+P2 = (e0 + 4*e1 + 3*e2).dual()
+Fg = 1*10*(M & ((-e2).dual()))
+T = 10/1.2
+forces = ForceSystem.from_multivectors([T*(M & P1).normal(), T*(M & P2).normal(), Fg])
+forces.resultant(), forces.in_equilibrium()
+
+# %% [markdown]
+# ## A single wrench
+# A force along $z$ through $(1,-1,0)$ plus a couple about $z$: the central axis is the force line and the pitch is the ratio of couple to force.
+
+# %%
+B = force_lines([1.,-1.,0.], [0.,0.,2.]) + [0, 0, 1.4, 0, 0, 0]
+central_axis(B)
+
+# %% [markdown]
+# ## Many bodies
+# $10^6$ random forces on $10^4$ bodies.
+
+# %%
+rng = np.random.default_rng(0)
+N, n_bodies = 10**6, 10**4
+body = np.sort(rng.integers(n_bodies, size=N))
+forces = ForceSystem.from_forces(rng.normal(size=(N,3)), rng.normal(size=(N,3)), body)
+
+# %%
+# %timeit forces.by_body(n_bodies)
+axes, pitch = forces.central_axes(n_bodies)
+pitch[:5]
+
+# %%
+# adding the opposite of each body's wrench balances every body
+balance = ForceSystem(-forces.by_body(n_bodies), np.arange(n_bodies))
+(forces + balance).in_equilibrium(n_bodies=n_bodies).all()